@@ -11,6 +11,8 @@ def get_requirements():
 
 setup(
     install_requires=get_requirements(),
+    # Optional exporter of the training metrics, pip install .[wandb]
+    extras_require={"wandb": ["wandb==0.15.10", "tensorboard==2.14.0"]},
     setup_requires=["setuptools_scm"],
     include_package_data=True,
 )
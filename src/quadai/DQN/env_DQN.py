@@ -8,9 +8,7 @@ This is a gym environment based on drone_game (see Human/drone_game.py for detai
 It is to be used with a DQN agent
 The goal is to reach randomly positoned targets
 """
-import os
-from math import sin, cos, pi, sqrt
-from random import randrange
+from math import pi, sqrt
 
 import numpy as np
 import gym
@@ -19,44 +17,64 @@ from gym import spaces
 import pygame
 from pygame.locals import *
 
+from quadai import assets, physics
+from quadai.physics import X, Y, ANGLE
+from quadai.render_cache import rotation_cache, text_cache
+from quadai.targets import TargetStream
+
 
 class droneEnv(gym.Env):
-    def __init__(self, render_every_frame, mouse_target):
+    def __init__(
+        self,
+        render_every_frame,
+        mouse_target,
+        integrator: str = "euler",
+        dt: float = 1.0,
+        action_repeat: int = 5,
+        seed: int = None,
+    ):
+        """
+        Args:
+            render_every_frame (bool): Render every physics substep
+            mouse_target (bool): Makes the target follow the mouse
+            integrator (str): Integrator of the physics, "euler" (semi-implicit), "rk2" or "rk4"
+            dt (float): Duration of a physics substep in frames (1 frame is 1/60 s)
+            action_repeat (int): Physics substeps per action
+            seed (int): Seed of the targets, None draws one from the random module
+        """
         super(droneEnv, self).__init__()
 
         self.render_every_frame = render_every_frame
         # Makes the target follow the mouse
         self.mouse_target = mouse_target
 
-        # Initialize Pygame, load sprites
-        pygame.init()
-        self.screen = pygame.display.set_mode((800, 800))
-        self.FramePerSec = pygame.time.Clock()
-
-        self.player = pygame.image.load(os.path.join("assets/sprites/drone_old.png"))
-        self.player.convert()
-
-        self.target = pygame.image.load(os.path.join("assets/sprites/target_old.png"))
-        self.target.convert()
-
-        pygame.font.init()
-        self.myfont = pygame.font.SysFont("Comic Sans MS", 20)
+        # Pygame and the sprites are loaded on the first render (see init_render)
+        self.screen = None
+        self.FramePerSec = None
+        self.player = None
+        self.target = None
+        self.myfont = None
 
         # Physics constants
         self.FPS = 60
-        self.gravity = 0.08
+        self.gravity = physics.GRAVITY
         self.thruster_amplitude = 0.04
         self.diff_amplitude = 0.0006
         self.thruster_mean = 0.04
-        self.mass = 1
-        self.arm = 25
+        self.mass = physics.MASS
+        self.arm = physics.ARM
+
+        # Physics configuration, an action lasts action_repeat * dt frames
+        physics.check_integrator(integrator)
+        self.integrator = integrator
+        self.dt = dt
+        self.action_repeat = action_repeat
 
-        # Initialize variables
-        (self.a, self.ad, self.add) = (0, 0, 0)
-        (self.x, self.xd, self.xdd) = (400, 0, 0)
-        (self.y, self.yd, self.ydd) = (400, 0, 0)
-        self.xt = randrange(200, 600)
-        self.yt = randrange(200, 600)
+        # Initialize variables, every target of the environment is new
+        self.targets = TargetStream(seed)
+        self.target_index = 0
+        self.state = physics.new_state(1)
+        self.next_target()
 
         # Initialize game variables
         self.target_counter = 0
@@ -71,13 +89,53 @@ class droneEnv(gym.Env):
         # 8 observations: angle_to_up, velocity, angle_velocity, distance_to_target, angle_to_target, angle_target_and_velocity, distance_to_target
         self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(7,))
 
+    def init_render(self):
+        """
+        Initializes Pygame and loads the sprites, done lazily so that the
+        environment can be created headless and pickled for subprocess workers
+        """
+        pygame.init()
+        self.screen = pygame.display.set_mode((800, 800))
+        self.FramePerSec = pygame.time.Clock()
+
+        self.player = assets.load_image("sprites/drone_old.png")
+        self.target = assets.load_image("sprites/target_old.png")
+
+        pygame.font.init()
+        self.myfont = pygame.font.SysFont("Comic Sans MS", 20)
+
+    def __getstate__(self):
+        # Pygame objects cannot be pickled, they are reloaded on the next render
+        state = self.__dict__.copy()
+        for key in ["screen", "FramePerSec", "player", "target", "myfont"]:
+            state[key] = None
+        return state
+
+    def next_target(self) -> None:
+        """
+        Moves the target to the next position of the target stream
+        """
+        (self.xt, self.yt) = self.targets[self.target_index]
+        self.target_index += 1
+
+    def seed(self, seed: int = None) -> list:
+        """
+        Restarts the targets from a seed
+
+        Args:
+            seed (int): Seed of the targets, None draws one from the random module
+
+        Returns:
+            list: The seed used
+        """
+        self.targets = TargetStream(seed)
+        self.target_index = 0
+        return [self.targets.seed]
+
     def reset(self):
         # Reset variables
-        (self.a, self.ad, self.add) = (0, 0, 0)
-        (self.x, self.xd, self.xdd) = (400, 0, 0)
-        (self.y, self.yd, self.ydd) = (400, 0, 0)
-        self.xt = randrange(200, 600)
-        self.yt = randrange(200, 600)
+        self.state = physics.new_state(1)
+        self.next_target()
 
         self.target_counter = 0
         self.reward = 0
@@ -99,20 +157,17 @@ class droneEnv(gym.Env):
             - angle_target_and_velocity : angle between the to_target vector and the velocity vector
             - distance_to_target : distance to the target
         """
-        angle_to_up = self.a / 180 * pi
-        velocity = sqrt(self.xd**2 + self.yd**2)
-        angle_velocity = self.ad
-        distance_to_target = (
-            sqrt((self.xt - self.x) ** 2 + (self.yt - self.y) ** 2) / 500
-        )
-        angle_to_target = np.arctan2(self.yt - self.y, self.xt - self.x)
+        (x, y, a, xd, yd, ad) = self.state[0].tolist()
+        angle_to_up = a / 180 * pi
+        velocity = sqrt(xd**2 + yd**2)
+        angle_velocity = ad
+        distance_to_target = sqrt((self.xt - x) ** 2 + (self.yt - y) ** 2) / 500
+        angle_to_target = np.arctan2(self.yt - y, self.xt - x)
         # Angle between the to_target vector and the velocity vector
-        angle_target_and_velocity = np.arctan2(
-            self.yt - self.y, self.xt - self.x
-        ) - np.arctan2(self.yd, self.xd)
-        distance_to_target = (
-            sqrt((self.xt - self.x) ** 2 + (self.yt - self.y) ** 2) / 500
+        angle_target_and_velocity = np.arctan2(self.yt - y, self.xt - x) - np.arctan2(
+            yd, xd
         )
+        distance_to_target = sqrt((self.xt - x) ** 2 + (self.yt - y) ** 2) / 500
         return np.array(
             [
                 angle_to_up,
@@ -130,17 +185,15 @@ class droneEnv(gym.Env):
         self.reward = 0.0
         action = int(action)
 
-        # Act every 5 frames
-        for _ in range(5):
-            self.time += 1 / 60
+        # Act every action_repeat substeps
+        for _ in range(self.action_repeat):
+            self.time += self.dt / 60
 
             if self.mouse_target is True:
+                if self.screen is None:
+                    self.init_render()
                 self.xt, self.yt = pygame.mouse.get_pos()
 
-            # Initialize accelerations
-            self.xdd = 0
-            self.ydd = self.gravity
-            self.add = 0
             thruster_left = self.thruster_mean
             thruster_right = self.thruster_mean
 
@@ -160,32 +213,28 @@ class droneEnv(gym.Env):
                 thruster_right += self.diff_amplitude
 
             # Calculating accelerations with Newton's laws of motions
-            self.xdd += (
-                -(thruster_left + thruster_right) * sin(self.a * pi / 180) / self.mass
+            physics.step(
+                self.state,
+                thruster_left,
+                thruster_right,
+                self.gravity,
+                self.mass,
+                self.arm,
+                self.dt,
+                self.integrator,
             )
-            self.ydd += (
-                -(thruster_left + thruster_right) * cos(self.a * pi / 180) / self.mass
-            )
-            self.add += self.arm * (thruster_right - thruster_left) / self.mass
-
-            self.xd += self.xdd
-            self.yd += self.ydd
-            self.ad += self.add
-            self.x += self.xd
-            self.y += self.yd
-            self.a += self.ad
 
-            dist = sqrt((self.x - self.xt) ** 2 + (self.y - self.yt) ** 2)
+            (x, y) = (self.state[0, X], self.state[0, Y])
+            dist = sqrt((x - self.xt) ** 2 + (y - self.yt) ** 2)
 
-            # Reward per step survived
-            self.reward += 1 / 60
+            # Reward per step survived, rewards are per frame
+            self.reward += self.dt / 60
             # Penalty according to the distance to target
-            self.reward -= dist / (100 * 60)
+            self.reward -= dist * self.dt / (100 * 60)
 
             if dist < 50:
                 # Reward if close to target
-                self.xt = randrange(200, 600)
-                self.yt = randrange(200, 600)
+                self.next_target()
                 self.reward += 100
 
             # If out of time
@@ -216,6 +265,8 @@ class droneEnv(gym.Env):
 
     def render(self, mode):
         # Pygame rendering
+        if self.screen is None:
+            self.init_render()
         pygame.event.get()
         self.screen.fill(0)
         self.screen.blit(
@@ -225,21 +276,25 @@ class droneEnv(gym.Env):
                 self.yt - int(self.target.get_height() / 2),
             ),
         )
-        player_copy = pygame.transform.rotate(self.player, self.a)
+        (x, y, a) = self.state[0, : ANGLE + 1].tolist()
+        player_copy = rotation_cache.rotate(self.player, a)
         self.screen.blit(
             player_copy,
             (
-                self.x - int(player_copy.get_width() / 2),
-                self.y - int(player_copy.get_height() / 2),
+                x - int(player_copy.get_width() / 2),
+                y - int(player_copy.get_height() / 2),
             ),
         )
 
-        textsurface = self.myfont.render(
-            "Collected: " + str(self.target_counter), False, (255, 255, 255)
+        textsurface = text_cache.render(
+            self.myfont,
+            "Collected: " + str(self.target_counter),
+            False,
+            (255, 255, 255),
         )
         self.screen.blit(textsurface, (20, 20))
-        textsurface3 = self.myfont.render(
-            "Time: " + str(int(self.time)), False, (255, 255, 255)
+        textsurface3 = text_cache.render(
+            self.myfont, "Time: " + str(int(self.time)), False, (255, 255, 255)
         )
         self.screen.blit(textsurface3, (20, 50))
 
@@ -1,49 +1,61 @@
 """
 Train a DQN agent using sb3 on the droneEnv environment
+
+The logs are written to a local metrics file (see quadai/metrics.py), --wandb
+also sends them to wandb
 """
 
+import argparse
 import os
 
 from stable_baselines3 import DQN
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.callbacks import CheckpointCallback
-import wandb
-from wandb.integration.sb3 import WandbCallback
 
 from env_DQN import droneEnv
-
-run = wandb.init(
-    project="quadai",
-    sync_tensorboard=True,
-    monitor_gym=True,
-)
-
-# Create log dir
-log_dir = "tmp/"
-os.makedirs(log_dir, exist_ok=True)
-
-# Create and wrap the environment
-env = droneEnv(False, False)
-env = Monitor(env, log_dir)
-
-# Create DQN agent
-model = DQN("MlpPolicy", env, verbose=1, tensorboard_log=log_dir)
-
-# Create checkpoint callback
-checkpoint_callback = CheckpointCallback(
-    save_freq=100000, save_path=log_dir, name_prefix="rl_model_v0"
-)
-
-# Train the agent
-model.learn(
-    total_timesteps=10000000,
-    callback=[
-        checkpoint_callback,
-        WandbCallback(
-            gradient_save_freq=100000,
-            model_save_path=f"models/{run.id}",
-            model_save_freq=100000,
-            verbose=2,
-        ),
-    ],
-)
+from quadai.sb3_metrics import setup_metrics, wandb_callback
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a DQN agent on droneEnv")
+    parser.add_argument("--timesteps", type=int, default=10000000)
+    parser.add_argument(
+        "--metrics", default="tmp/metrics.qmet", help="Local metrics file"
+    )
+    parser.add_argument(
+        "--wandb", action="store_true", help="Also log the training to wandb"
+    )
+    args = parser.parse_args()
+
+    # Create log dir
+    log_dir = "tmp/"
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Create and wrap the environment
+    env = droneEnv(False, False)
+    env = Monitor(env, log_dir)
+
+    # Create checkpoint callback
+    checkpoint_callback = CheckpointCallback(
+        save_freq=100000, save_path=log_dir, name_prefix="rl_model_v0"
+    )
+    callbacks = [checkpoint_callback]
+    # The wandb run must start before the tensorboard writer it syncs
+    if args.wandb:
+        (_, callback) = wandb_callback("quadai", 100000, 100000, config=vars(args))
+        callbacks.append(callback)
+
+    # Create DQN agent, its logs go to the metrics file
+    model = DQN("MlpPolicy", env, verbose=1)
+    (metrics, episode_callback) = setup_metrics(
+        model, args.metrics, tensorboard_dir=log_dir if args.wandb else None
+    )
+    callbacks.append(episode_callback)
+
+    # Train the agent
+    model.learn(total_timesteps=args.timesteps, callback=callbacks)
+    metrics.close()
+
+
+if __name__ == "__main__":
+    main()
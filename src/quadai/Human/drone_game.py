@@ -10,10 +10,11 @@ This is used as a base to create a simulation environment
 """
 
 import pygame
-import os
 from pygame.locals import *
-from math import sin, cos, pi, sqrt
-from random import randrange
+from math import sqrt
+
+from quadai import assets, physics
+from quadai.targets import TargetStream
 
 # Game constants
 FPS = 60
@@ -21,16 +22,16 @@ WIDTH = 800
 HEIGHT = 800
 
 # Physics constants
-gravity = 0.08
+gravity = physics.GRAVITY
 # Propeller force for UP and DOWN
 thruster_amplitude = 0.04
 # Propeller force for LEFT and RIGHT rotations
 diff_amplitude = 0.003
 # By default, thruster will apply a force of thruster_mean
 thruster_mean = 0.04
-mass = 1
+mass = physics.MASS
 # Length from center of mass to propeller
-arm = 25
+arm = physics.ARM
 
 # Initialize Pygame, load sprites
 FramePerSec = pygame.time.Clock()
@@ -39,65 +40,26 @@ pygame.init()
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 
 # Loading player and target sprites
-player_width = 80
 player_animation_speed = 0.3
-player = []
-for i in range(1, 5):
-    image = pygame.image.load(
-        os.path.join(
-            "assets/balloon-flat-asset-pack/png/objects/drone-sprites/drone-"
-            + str(i)
-            + ".png"
-        )
-    )
-    image.convert()
-    player.append(
-        pygame.transform.scale(image, (player_width, int(player_width * 0.30)))
-    )
-
-target_width = 30
+player = assets.drone_animation()
 target_animation_speed = 0.1
-target = []
-for i in range(1, 8):
-    image = pygame.image.load(
-        os.path.join(
-            "assets/balloon-flat-asset-pack/png/balloon-sprites/red-plain/red-plain-"
-            + str(i)
-            + ".png"
-        )
-    )
-    image.convert()
-    target.append(
-        pygame.transform.scale(image, (target_width, int(target_width * 1.73)))
-    )
+target = assets.balloon_animation()
 
 # Loading background sprites
-cloud1 = pygame.image.load(
-    os.path.join("assets/balloon-flat-asset-pack/png/background-elements/cloud-1.png")
-)
-cloud2 = pygame.image.load(
-    os.path.join("assets/balloon-flat-asset-pack/png/background-elements/cloud-2.png")
-)
-sun = pygame.image.load(
-    os.path.join("assets/balloon-flat-asset-pack/png/background-elements/sun.png")
-)
-cloud1.set_alpha(124)
+(cloud1, cloud2, sun) = assets.background_sprites()
 (x_cloud1, y_cloud1, speed_cloud1) = (150, 200, 0.3)
-cloud2.set_alpha(124)
 (x_cloud2, y_cloud2, speed_cloud2) = (400, 500, -0.2)
-sun.set_alpha(124)
 
 # Loading fonts
-pygame.font.init()
-info_font = pygame.font.Font("assets/fonts/Roboto-Regular.ttf", 30)
-respawn_font = pygame.font.Font("assets/fonts/Roboto-Bold.ttf", 90)
+info_font = assets.load_font("fonts/Roboto-Regular.ttf", 30)
+respawn_font = assets.load_font("fonts/Roboto-Bold.ttf", 90)
 
 # Initialize physics variables
-(angle, angular_speed, angular_acceleration) = (0, 0, 0)
-(x_position, x_speed, x_acceleration) = (400, 0, 0)
-(y_position, y_speed, y_acceleration) = (400, 0, 0)
-x_target = randrange(200, 600)
-y_target = randrange(200, 600)
+drone = physics.new_state(1)
+(x_position, y_position, angle) = (400, 400, 0)
+targets = TargetStream()
+target_index = 0
+(x_target, y_target) = targets[target_index]
 
 # Initialize game variables
 target_counter = 0
@@ -131,11 +93,6 @@ while True:
     step += 1
 
     if dead == False:
-        # Initialize accelerations
-        x_acceleration = 0
-        y_acceleration = gravity
-        angular_acceleration = 0
-
         # Calculate propeller force in function of input
         thruster_left = thruster_mean
         thruster_right = thruster_mean
@@ -151,32 +108,17 @@ while True:
         if pressed_keys[K_RIGHT]:
             thruster_right -= diff_amplitude
 
-        # Calculate accelerations according to Newton's laws of motion
-        x_acceleration += (
-            -(thruster_left + thruster_right) * sin(angle * pi / 180) / mass
-        )
-        y_acceleration += (
-            -(thruster_left + thruster_right) * cos(angle * pi / 180) / mass
-        )
-        angular_acceleration += arm * (thruster_right - thruster_left) / mass
-
-        # Calculate speed
-        x_speed += x_acceleration
-        y_speed += y_acceleration
-        angular_speed += angular_acceleration
-
-        # Calculate position
-        x_position += x_speed
-        y_position += y_speed
-        angle += angular_speed
+        # Calculate accelerations, speed and position according to Newton's laws of motion
+        physics.step(drone, thruster_left, thruster_right, gravity, mass, arm)
+        (x_position, y_position, angle) = drone[0, : physics.ANGLE + 1].tolist()
 
         # Calculate distance to target
         dist = sqrt((x_position - x_target) ** 2 + (y_position - y_target) ** 2)
 
         # If target reached, respawn target
         if dist < 50:
-            x_target = randrange(200, 600)
-            y_target = randrange(200, 600)
+            target_index += 1
+            (x_target, y_target) = targets[target_index]
             target_counter += 1
 
         # If to far, die and respawn after timer
@@ -201,9 +143,8 @@ while True:
         # Respawn
         if respawn_timer < 0:
             dead = False
-            (angle, angular_speed, angular_acceleration) = (0, 0, 0)
-            (x_position, x_speed, x_acceleration) = (400, 0, 0)
-            (y_position, y_speed, y_acceleration) = (400, 0, 0)
+            drone = physics.new_state(1)
+            (x_position, y_position, angle) = (400, 400, 0)
 
     # Ending conditions
     if time > time_limit:
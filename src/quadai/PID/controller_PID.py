@@ -9,6 +9,8 @@ Learned from this tutorial on Youtube:
 https://www.youtube.com/watch?v=ZMI_kpNUgJM&ab_channel=OrionAerospace
 """
 
+import numpy as np
+
 
 class PID:
     def __init__(self, KP, KI, KD, saturation_max, saturation_min):
@@ -32,3 +34,66 @@ class PID:
         elif output < self.saturation_min and self.saturation_min is not None:
             output = self.saturation_min
         return output
+
+
+class PIDBank:
+    """
+    Many independent PID controllers computed at once with NumPy arrays
+    Controller i behaves exactly like PID(kp[i], ki[i], kd[i], saturation_max[i], saturation_min[i])
+    """
+
+    def __init__(self, n, KP, KI, KD, saturation_max, saturation_min):
+        """
+        Args:
+            n (int): Number of controllers
+            KP, KI, KD: Gains, scalars or (n,) arrays
+            saturation_max, saturation_min: Output bounds, scalars or (n,) arrays, None for no bound
+        """
+        self.n = n
+        self.kp = np.array(np.broadcast_to(KP, n), dtype=np.float64)
+        self.ki = np.array(np.broadcast_to(KI, n), dtype=np.float64)
+        self.kd = np.array(np.broadcast_to(KD, n), dtype=np.float64)
+        if saturation_max is None:
+            saturation_max = np.inf
+        if saturation_min is None:
+            saturation_min = -np.inf
+        self.saturation_max = np.array(
+            np.broadcast_to(saturation_max, n), dtype=np.float64
+        )
+        self.saturation_min = np.array(
+            np.broadcast_to(saturation_min, n), dtype=np.float64
+        )
+        self.error_last = np.zeros(n)
+        self.integral_error = np.zeros(n)
+
+    def reset(self, indices=slice(None)):
+        """
+        Clears the memory of the selected controllers
+
+        Args:
+            indices: Indices of the controllers, all of them by default
+        """
+        self.error_last[indices] = 0
+        self.integral_error[indices] = 0
+
+    def compute(self, error, dt):
+        """
+        Computes the outputs of every controller
+
+        Args:
+            error (np.ndarray): The (n,) errors
+            dt (float): Time step, scalar or (n,) array
+
+        Returns:
+            np.ndarray: The (n,) saturated outputs
+        """
+        error = np.asarray(error, dtype=np.float64)
+        derivative_error = (error - self.error_last) / dt
+        self.integral_error += error * dt
+        output = (
+            self.kp * error + self.ki * self.integral_error + self.kd * derivative_error
+        )
+        self.error_last = error.copy()
+        np.minimum(output, self.saturation_max, out=output)
+        np.maximum(output, self.saturation_min, out=output)
+        return output
@@ -0,0 +1,149 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is an asynchronous successive halving (ASHA) scheduler for the hyperparameter sweep
+Configurations are trained up to rungs of increasing steps, a configuration
+is promoted to the next rung once it is in the top 1 / reduction_factor of
+the configurations evaluated at its rung. Free workers take the best promotable
+configuration or else start a new one, so nobody waits for a rung to fill up
+and the configurations that are never promoted are stopped early.
+Once nothing can reach a rung anymore, its best configuration is promoted even
+if the rung holds less than reduction_factor configurations.
+"""
+
+from math import isnan
+
+
+def rung_steps(min_steps: int, max_steps: int, reduction_factor: int = 3) -> list:
+    """
+    Args:
+        min_steps (int): Steps of the first rung
+        max_steps (int): Steps of the last rung, the full budget
+        reduction_factor (int): Ratio of the steps of two successive rungs
+
+    Returns:
+        list: Steps of each rung, e.g. [50000, 150000, 500000], a last rung
+            less than reduction_factor times the previous one replaces it
+    """
+    if min_steps <= 0 or reduction_factor < 2:
+        raise ValueError("min_steps must be positive and reduction_factor at least 2")
+    rungs = []
+    steps = min_steps
+    while steps < max_steps:
+        rungs.append(steps)
+        steps *= reduction_factor
+    if rungs and max_steps < rungs[-1] * reduction_factor:
+        rungs.pop()
+    rungs.append(max_steps)
+    return rungs
+
+
+class ASHAScheduler:
+    """
+    Decides which configuration to train next and up to which rung
+
+    The scheduler does not train anything: next_job gives a (name, rung) job
+    to run and report gives back the score of the configuration at that rung.
+    """
+
+    def __init__(self, names: list, rungs: list, reduction_factor: int = 3):
+        """
+        Args:
+            names (list): Names of the configurations, started in this order
+            rungs (list): Steps of each rung, see rung_steps
+            reduction_factor (int): 1 / reduction_factor of each rung is promoted
+        """
+        self.rungs = rungs
+        self.reduction_factor = reduction_factor
+        self.pending = list(names)
+        # Rung to name to score, the higher the better
+        self.scores = [{} for _ in rungs]
+        # Rung to names promoted from it
+        self.promoted = [set() for _ in rungs]
+        # Name to rung of the jobs given by next_job and not reported yet
+        self.jobs = {}
+
+    def ranking(self, rung: int) -> list:
+        """
+        Args:
+            rung (int): Index of the rung
+
+        Returns:
+            list: Names evaluated at the rung from the best to the worst, NaN last
+        """
+        scores = self.scores[rung]
+        return sorted(
+            scores,
+            key=lambda name: float("inf") if isnan(scores[name]) else -scores[name],
+        )
+
+    def promotable(self, rung: int) -> list:
+        """
+        Args:
+            rung (int): Index of the rung
+
+        Returns:
+            list: Names in the top of the rung not promoted yet, from the best
+        """
+        top = len(self.scores[rung]) // self.reduction_factor
+        if top == 0 and self.closed(rung):
+            top = 1
+        return [
+            name for name in self.ranking(rung)[:top] if name not in self.promoted[rung]
+        ]
+
+    def closed(self, rung: int) -> bool:
+        """
+        Args:
+            rung (int): Index of the rung
+
+        Returns:
+            bool: True if no configuration can be evaluated at the rung anymore
+        """
+        if self.pending or any(job <= rung for job in self.jobs.values()):
+            return False
+        return not any(self.promotable(lower) for lower in range(rung))
+
+    def next_job(self):
+        """
+        Returns:
+            tuple: (name, rung) of the next job, None if no job can start now
+        """
+        # Promotions to the highest rungs first
+        for rung in reversed(range(len(self.rungs) - 1)):
+            candidates = self.promotable(rung)
+            if candidates:
+                name = candidates[0]
+                self.promoted[rung].add(name)
+                self.jobs[name] = rung + 1
+                return (name, rung + 1)
+        if self.pending:
+            name = self.pending.pop(0)
+            self.jobs[name] = 0
+            return (name, 0)
+        return None
+
+    def report(self, name: str, rung: int, score: float) -> None:
+        """
+        Records the score of a configuration trained up to a rung
+
+        Args:
+            name (str): Name of the configuration
+            rung (int): Index of the rung
+            score (float): Score at the rung, e.g. the mean episode reward
+        """
+        self.scores[rung][name] = score
+        self.jobs.pop(name, None)
+        if name in self.pending:
+            self.pending.remove(name)
+        if rung > 0:
+            self.promoted[rung - 1].add(name)
+
+    def fail(self, name: str) -> None:
+        """
+        Forgets a running job that failed, its configuration is not retried
+        """
+        self.jobs.pop(name, None)
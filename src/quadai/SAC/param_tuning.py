@@ -1,17 +1,41 @@
 """
-Train an SAC agent using sb3 on the droneEnv environment
+Tune the hyperparameters of an SAC agent on the droneEnv environment
+
+Each hyperparameter is varied one at a time around the defaults.
+Configurations are trained concurrently over a process pool, every run is stored
+in OUTPUT_DIR/<hash of the config>/ with its checkpoints and its monitor logs,
+finished runs are skipped and interrupted runs resume from their last checkpoint.
+With --asha, the worst configurations are stopped early (see asha.py).
+
+Example:
+python param_tuning.py --threads-per-worker 2 --output-dir sweeps/
+python param_tuning.py --asha --min-steps 50000 --reduction-factor 3
 """
 
+import argparse
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
 
 import numpy as np
 from stable_baselines3 import SAC
-from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.callbacks import CheckpointCallback
-import wandb
-from wandb.integration.sb3 import WandbCallback
+from stable_baselines3.common.monitor import (
+    LoadMonitorResultsError,
+    Monitor,
+    load_results,
+)
+from stable_baselines3.common.callbacks import BaseCallback
 
+from asha import ASHAScheduler, rung_steps
 from env_SAC import droneEnv
+from quadai.sb3_metrics import setup_metrics, wandb_callback
 
 params = ["gamma", "learning_rate", "buffer_size", "tau", "batch_size"]
 gamma_range = []
@@ -28,83 +52,513 @@ ranges = [
 ]
 defaults = [0.99, 0.0003, 50000, 0.005, 64]
 
-for i in range(len(params)):
-    for j in range(len(ranges[i])):
-        # Set hyperparameters
-        gamma = defaults[0]
-        learning_rate = defaults[1]
-        buffer_size = defaults[2]
-        tau = defaults[3]
-        batch_size = defaults[4]
-
-        if params[i] == "gamma":
-            gamma = ranges[i][j]
-        elif params[i] == "learning_rate":
-            learning_rate = ranges[i][j]
-        elif params[i] == "buffer_size":
-            buffer_size = ranges[i][j]
-        elif params[i] == "tau":
-            tau = ranges[i][j]
-        elif params[i] == "batch_size":
-            batch_size = ranges[i][j]
-
-        run = wandb.init(
-            # CHANGE THIS to quadai-params
-            project="quadai-params",
-            sync_tensorboard=True,
-            monitor_gym=True,
-            name=f"{params[i]}_{ranges[i][j]}",
-            config={
-                "gamma": gamma,
-                "learning_rate": learning_rate,
-                "buffer_size": buffer_size,
-                "tau": tau,
-                "batch_size": batch_size,
-            },
-        )
 
-        # Create log dir
-        log_dir = "tmp/"
-        os.makedirs(log_dir, exist_ok=True)
+def sweep_configs(timesteps: int = 500000, seed: int = 0) -> list:
+    """
+    Configurations of the sweep, each hyperparameter varied alone
+
+    Args:
+        timesteps (int): Training steps of each configuration
+        seed (int): Seed of the agents and of the targets
+
+    Returns:
+        list: (name, config) of each configuration
+    """
+    configs = []
+    for i in range(len(params)):
+        for j in range(len(ranges[i])):
+            config = dict(zip(params, defaults))
+            config[params[i]] = ranges[i][j]
+            config.update(timesteps=timesteps, seed=seed)
+            configs.append((f"{params[i]}_{ranges[i][j]}", config))
+    return configs
+
+
+def config_hash(config: dict) -> str:
+    """
+    Args:
+        config (dict): Configuration of a run
+
+    Returns:
+        str: Identifier of the configuration, the same across sweeps and machines
+    """
+    text = json.dumps(config, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def write_json(path: str, data: dict) -> None:
+    """
+    Writes a JSON file atomically, a crash leaves the previous file or the new one
+    """
+    with open(path + ".tmp", "w") as file:
+        json.dump(data, file, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def read_json(path: str):
+    """
+    Returns:
+        The content of the JSON file, None if it does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def mean_episode_reward(run_dir: str, last: int = 100) -> float:
+    """
+    Args:
+        run_dir (str): Directory of the run
+        last (int): Number of episodes averaged
+
+    Returns:
+        float: Mean reward of the last episodes logged by Monitor, NaN if none
+    """
+    try:
+        rewards = load_results(run_dir)["r"].to_numpy()
+    except LoadMonitorResultsError:
+        return float("nan")
+    if len(rewards) == 0:
+        return float("nan")
+    return float(np.mean(rewards[-last:]))
+
 
-        # Create and wrap the environment
-        env = droneEnv(False, False)
-        env = Monitor(env, log_dir)
+def truncate_monitor(run_dir: str, episodes: int) -> None:
+    """
+    Drops the episodes logged after the last checkpoint, they are played again
 
+    Args:
+        run_dir (str): Directory of the run
+        episodes (int): Episodes logged at the last checkpoint
+    """
+    path = os.path.join(run_dir, "monitor.csv")
+    if not os.path.exists(path):
+        return
+    with open(path) as file:
+        lines = file.readlines()
+    # A JSON line and the CSV header come before the episodes
+    with open(path, "w") as file:
+        file.writelines(lines[: 2 + episodes])
+
+
+def count_episodes(run_dir: str) -> int:
+    with open(os.path.join(run_dir, "monitor.csv")) as file:
+        return max(sum(1 for _ in file) - 2, 0)
+
+
+class ResumeCheckpointCallback(BaseCallback):
+    """
+    Saves the model, its replay buffer and the progress of a run every save_freq steps
+    """
+
+    def __init__(self, run_dir: str, save_freq: int):
+        """
+        Args:
+            run_dir (str): Directory of the run
+            save_freq (int): Steps between two checkpoints
+        """
+        super().__init__()
+        self.run_dir = run_dir
+        self.save_freq = save_freq
+
+    def _on_step(self) -> bool:
+        if self.num_timesteps % self.save_freq == 0:
+            save_checkpoint(self.model, self.run_dir)
+        return True
+
+
+def save_checkpoint(model: SAC, run_dir: str) -> None:
+    """
+    Saves a run so that it can be resumed, the progress file is written last
+
+    Args:
+        model (SAC): The trained agent
+        run_dir (str): Directory of the run
+    """
+    model_path = os.path.join(run_dir, "checkpoint")
+    model.save(model_path + ".tmp.zip")
+    os.replace(model_path + ".tmp.zip", model_path + ".zip")
+    buffer_path = os.path.join(run_dir, "replay_buffer.pkl")
+    model.save_replay_buffer(buffer_path + ".tmp")
+    os.replace(buffer_path + ".tmp", buffer_path)
+    write_json(
+        os.path.join(run_dir, "progress.json"),
+        {"timesteps": model.num_timesteps, "episodes": count_episodes(run_dir)},
+    )
+
+
+def train(
+    name: str,
+    config: dict,
+    run_dir: str,
+    checkpoint_freq: int = 50000,
+    use_wandb: bool = False,
+    timesteps: int = None,
+) -> dict:
+    """
+    Trains a configuration until timesteps, from its last checkpoint if any
+
+    Args:
+        name (str): Name of the run
+        config (dict): Hyperparameters of SAC, timesteps and seed
+        run_dir (str): Directory of the run
+        checkpoint_freq (int): Steps between two checkpoints
+        use_wandb (bool): Log the run to wandb
+        timesteps (int): Steps trained at the end of the call, config["timesteps"]
+            if None, e.g. a rung of the ASHA scheduler
+
+    Returns:
+        dict: Result of the run, see run_config
+    """
+    if timesteps is None:
+        timesteps = config["timesteps"]
+    os.makedirs(run_dir, exist_ok=True)
+    write_json(os.path.join(run_dir, "config.json"), dict(config, name=name))
+    progress = read_json(os.path.join(run_dir, "progress.json"))
+    if progress is None:
+        progress = {"timesteps": 0, "episodes": 0}
+    truncate_monitor(run_dir, progress["episodes"])
+
+    # Create and wrap the environment, episodes logged before a crash are kept
+    env = droneEnv(False, False, seed=config["seed"])
+    env = Monitor(env, run_dir, override_existing=progress["timesteps"] == 0)
+
+    if progress["timesteps"] > 0:
+        model = SAC.load(os.path.join(run_dir, "checkpoint.zip"), env=env)
+        model.load_replay_buffer(os.path.join(run_dir, "replay_buffer.pkl"))
+    else:
         # Create SAC agent
         model = SAC(
             "MlpPolicy",
             env,
-            verbose=2,
-            tensorboard_log=log_dir,
-            gamma=gamma,
-            learning_rate=learning_rate,
-            buffer_size=buffer_size,
-            tau=tau,
-            batch_size=batch_size,
+            verbose=0,
+            gamma=config["gamma"],
+            learning_rate=config["learning_rate"],
+            buffer_size=config["buffer_size"],
+            tau=config["tau"],
+            batch_size=config["batch_size"],
+            seed=config["seed"],
         )
 
-        # Create checkpoint callback
-        checkpoint_callback = CheckpointCallback(
-            save_freq=100000, save_path=log_dir, name_prefix="rl_model_lr"
+    # The wandb run must start before the tensorboard writer it syncs
+    callbacks = [ResumeCheckpointCallback(run_dir, checkpoint_freq)]
+    if use_wandb:
+        (run, callback) = wandb_callback(
+            # CHANGE THIS to quadai-params
+            "quadai-params",
+            # CHANGE THIS TO 5000
+            gradient_save_freq=5000,
+            model_save_freq=100000,
+            name=name,
+            id=config_hash(config),
+            resume="allow",
+            config=config,
         )
+        callbacks.append(callback)
+
+    # The logs go to the metrics file of the run, wandb syncs the tensorboard logs
+    (metrics, episode_callback) = setup_metrics(
+        model,
+        os.path.join(run_dir, "metrics.qmet"),
+        tensorboard_dir=run_dir if use_wandb else None,
+        verbose=0,
+    )
+    callbacks.append(episode_callback)
 
-        # Train the agent
+    # Train the agent
+    start = time.perf_counter()
+    # A crash can happen between the last checkpoint and the result file
+    if timesteps > progress["timesteps"]:
         model.learn(
-            # CHANGE THIS TO 500000
-            total_timesteps=500000,
-            callback=[
-                checkpoint_callback,
-                WandbCallback(
-                    # CHANGE THIS TO 5000
-                    gradient_save_freq=5000,
-                    model_save_path=f"models/{run.id}",
-                    model_save_freq=100000,
-                    verbose=2,
-                ),
-            ],
+            total_timesteps=timesteps - progress["timesteps"],
+            callback=callbacks,
+            reset_num_timesteps=progress["timesteps"] == 0,
         )
+        save_checkpoint(model, run_dir)
 
-        # Close
-        env.close()
+    # Close
+    env.close()
+    metrics.close()
+    if use_wandb:
         run.finish()
+    return {
+        "name": name,
+        "config": config,
+        "timesteps": model.num_timesteps,
+        "mean_reward": mean_episode_reward(run_dir),
+        "resumed_from": progress["timesteps"],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def init_worker(threads: int) -> None:
+    """
+    Pins the torch intra-op threads of a worker process
+
+    Args:
+        threads (int): Threads per worker
+    """
+    import torch
+
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    torch.set_num_threads(threads)
+
+
+def run_config(task: tuple) -> dict:
+    """
+    Trains a configuration of the sweep and stores its result
+
+    Args:
+        task (tuple): (name, config, run_dir, checkpoint_freq, use_wandb, timesteps)
+
+    Returns:
+        dict: name, config, timesteps, mean_reward (mean reward of the last 100 episodes),
+            resumed_from (steps of the checkpoint the run started from) and seconds
+    """
+    (name, config, run_dir, checkpoint_freq, use_wandb, timesteps) = task
+    result = train(name, config, run_dir, checkpoint_freq, use_wandb, timesteps)
+    write_json(os.path.join(run_dir, f"result_{result['timesteps']}.json"), result)
+    if result["timesteps"] >= config["timesteps"]:
+        write_json(os.path.join(run_dir, "result.json"), result)
+    return result
+
+
+def default_workers(threads_per_worker: int) -> int:
+    """
+    Args:
+        threads_per_worker (int): Torch threads of each worker
+
+    Returns:
+        int: Number of workers fitting in the cores available to this process
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    return max(cores // threads_per_worker, 1)
+
+
+def run_sweep(
+    configs: list,
+    output_dir: str,
+    workers: int = None,
+    threads_per_worker: int = 1,
+    checkpoint_freq: int = 50000,
+    use_wandb: bool = False,
+) -> list:
+    """
+    Trains the configurations without a stored result over a process pool
+
+    Args:
+        configs (list): (name, config) of each configuration, see sweep_configs
+        output_dir (str): Directory of the runs, OUTPUT_DIR/<config hash>/
+        workers (int): Number of processes, all the cores by default
+        threads_per_worker (int): Torch threads of each worker
+        checkpoint_freq (int): Steps between two checkpoints of a run
+        use_wandb (bool): Log the runs to wandb
+
+    Returns:
+        list: Results of every configuration, see run_config
+    """
+    if workers is None:
+        workers = default_workers(threads_per_worker)
+    results = {}
+    tasks = []
+    for name, config in configs:
+        run_dir = os.path.join(output_dir, config_hash(config))
+        result = read_json(os.path.join(run_dir, "result.json"))
+        if result is not None:
+            print(f"{name}: done, mean reward {result['mean_reward']:.1f}")
+            results[name] = result
+        else:
+            tasks.append((name, config, run_dir, checkpoint_freq, use_wandb, None))
+
+    if tasks:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            initializer=init_worker,
+            initargs=(threads_per_worker,),
+        ) as executor:
+            futures = {executor.submit(run_config, task): task[0] for task in tasks}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as error:
+                    # Other configurations go on, the failed one runs again next time
+                    print(f"{name}: failed, {error!r}")
+                    continue
+                print(
+                    f"{name}: mean reward {results[name]['mean_reward']:.1f}"
+                    f" in {results[name]['seconds']:.0f} s"
+                )
+    return [results[name] for name, _ in configs if name in results]
+
+
+def run_asha(
+    configs: list,
+    output_dir: str,
+    min_steps: int = 50000,
+    reduction_factor: int = 3,
+    workers: int = None,
+    threads_per_worker: int = 1,
+    checkpoint_freq: int = 50000,
+    use_wandb: bool = False,
+) -> list:
+    """
+    Trains the configurations with early stopping by the ASHA scheduler (see asha.py)
+
+    Configurations are scored by the mean episode reward logged by Monitor at
+    each rung, the rungs reached before an interruption are not trained again.
+
+    Args:
+        configs (list): (name, config) of each configuration, see sweep_configs
+        output_dir (str): Directory of the runs, OUTPUT_DIR/<config hash>/
+        min_steps (int): Steps of the first rung
+        reduction_factor (int): Ratio of the steps of two successive rungs,
+            1 / reduction_factor of each rung is promoted
+        workers (int): Number of processes, all the cores by default
+        threads_per_worker (int): Torch threads of each worker
+        checkpoint_freq (int): Steps between two checkpoints of a run
+        use_wandb (bool): Log the runs to wandb
+
+    Returns:
+        list: Result of every configuration at the highest rung it reached
+    """
+    if workers is None:
+        workers = default_workers(threads_per_worker)
+    configs = dict(configs)
+    max_steps = max(config["timesteps"] for config in configs.values())
+    rungs = rung_steps(min_steps, max_steps, reduction_factor)
+    run_dirs = {
+        name: os.path.join(output_dir, config_hash(config))
+        for name, config in configs.items()
+    }
+
+    scheduler = ASHAScheduler(list(configs), rungs, reduction_factor)
+    results = {}
+    for name in configs:
+        for rung, steps in enumerate(rungs):
+            result = read_json(os.path.join(run_dirs[name], f"result_{steps}.json"))
+            if result is not None:
+                scheduler.report(name, rung, result["mean_reward"])
+                results[name] = result
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(threads_per_worker,),
+    ) as executor:
+        futures = {}
+        while True:
+            # Free workers take the next promotion or a new configuration
+            while len(futures) < workers:
+                job = scheduler.next_job()
+                if job is None:
+                    break
+                (name, rung) = job
+                task = (
+                    name,
+                    configs[name],
+                    run_dirs[name],
+                    checkpoint_freq,
+                    use_wandb,
+                    rungs[rung],
+                )
+                futures[executor.submit(run_config, task)] = job
+            if not futures:
+                break
+
+            (finished, _) = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                (name, rung) = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    # The configuration runs again next time
+                    print(f"{name}: failed, {error!r}")
+                    scheduler.fail(name)
+                    continue
+                scheduler.report(name, rung, result["mean_reward"])
+                results[name] = result
+                print(
+                    f"{name}: rung {rung} ({rungs[rung]} steps),"
+                    f" mean reward {result['mean_reward']:.1f}"
+                    f" in {result['seconds']:.0f} s"
+                )
+
+    trained = sum(result["timesteps"] for result in results.values())
+    print(
+        f"Trained {trained} steps, {trained / (max_steps * len(configs)):.0%}"
+        " of the full sweep"
+    )
+    return [results[name] for name in configs if name in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the hyperparameters of SAC")
+    parser.add_argument("--output-dir", default="sweeps/")
+    parser.add_argument("--timesteps", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--checkpoint-freq", type=int, default=50000)
+    parser.add_argument(
+        "--wandb", action="store_true", help="Also log the runs to wandb"
+    )
+    parser.add_argument(
+        "--asha",
+        action="store_true",
+        help="Stop the worst configurations early with successive halving",
+    )
+    parser.add_argument(
+        "--min-steps", type=int, default=50000, help="Steps of the first ASHA rung"
+    )
+    parser.add_argument(
+        "--reduction-factor",
+        type=int,
+        default=3,
+        help="1 / reduction factor of each ASHA rung is promoted",
+    )
+    args = parser.parse_args()
+
+    configs = sweep_configs(args.timesteps, args.seed)
+    if args.asha:
+        results = run_asha(
+            configs,
+            args.output_dir,
+            args.min_steps,
+            args.reduction_factor,
+            args.workers,
+            args.threads_per_worker,
+            args.checkpoint_freq,
+            args.wandb,
+        )
+    else:
+        results = run_sweep(
+            configs,
+            args.output_dir,
+            args.workers,
+            args.threads_per_worker,
+            args.checkpoint_freq,
+            args.wandb,
+        )
+    # Configurations stopped early come after the ones trained longer
+    results.sort(
+        key=lambda result: (
+            -result["timesteps"],
+            -np.nan_to_num(result["mean_reward"], nan=-np.inf),
+        )
+    )
+    print("")
+    for result in results:
+        print(
+            f"{result['name']:<24} {result['timesteps']:>8} steps"
+            f" mean reward {result['mean_reward']:10.1f}"
+        )
+    write_json(os.path.join(args.output_dir, "summary.json"), {"results": results})
+
+
+if __name__ == "__main__":
+    main()
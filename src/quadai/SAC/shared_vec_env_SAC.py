@@ -0,0 +1,286 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a multi-process version of droneVecEnv (see SAC/vec_env_SAC.py for details)
+Each worker process simulates a slice of the drones with its own droneVecEnv.
+Actions, observations, rewards and dones are exchanged through shared memory,
+the pipes to the workers only carry short commands.
+"""
+
+import multiprocessing as mp
+import random
+import traceback
+
+import numpy as np
+from gym import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from quadai.SAC.vec_env_SAC import droneVecEnv
+
+OBS_SIZE = 7
+ACTION_SIZE = 2
+
+
+def shared_arrays(buffers: dict, num_envs: int) -> tuple:
+    """
+    NumPy views of the shared buffers
+
+    Args:
+        buffers (dict): Shared buffers created by droneSharedVecEnv
+        num_envs (int): Total number of drones
+
+    Returns:
+        tuple: (actions, observations, rewards, dones, terminal_observations)
+    """
+    return (
+        np.frombuffer(buffers["actions"], dtype=np.float32).reshape(
+            num_envs, ACTION_SIZE
+        ),
+        np.frombuffer(buffers["obs"], dtype=np.float32).reshape(num_envs, OBS_SIZE),
+        np.frombuffer(buffers["rewards"], dtype=np.float32),
+        np.frombuffer(buffers["dones"], dtype=np.bool_),
+        np.frombuffer(buffers["terminal_obs"], dtype=np.float32).reshape(
+            num_envs, OBS_SIZE
+        ),
+    )
+
+
+def worker(
+    remote, parent_remote, buffers: dict, num_envs: int, start: int, stop: int, kwargs
+) -> None:
+    """
+    Loop of a worker process, steps the drones start to stop - 1 on command
+
+    Args:
+        remote (Connection): Pipe to the main process
+        parent_remote (Connection): Other end of the pipe, closed in the worker
+        buffers (dict): Shared buffers created by droneSharedVecEnv
+        num_envs (int): Total number of drones
+        start (int): First drone of the worker
+        stop (int): Last drone of the worker, excluded
+        kwargs (dict): Arguments of the droneVecEnv of the worker
+    """
+    parent_remote.close()
+    (actions, obs, rewards, dones, terminal_obs) = shared_arrays(buffers, num_envs)
+    try:
+        env = droneVecEnv(stop - start, **kwargs)
+        while True:
+            (command, data) = remote.recv()
+            if command == "step":
+                (
+                    obs[start:stop],
+                    rewards[start:stop],
+                    dones[start:stop],
+                    infos,
+                ) = env.step(actions[start:stop])
+                for i in np.flatnonzero(dones[start:stop]):
+                    terminal_obs[start + i] = infos[i]["terminal_observation"]
+                remote.send(None)
+            elif command == "reset":
+                obs[start:stop] = env.reset()
+                remote.send(None)
+            elif command == "seed":
+                remote.send(env.seed(data))
+            elif command == "get_attr":
+                remote.send(env.get_attr(*data))
+            elif command == "set_attr":
+                remote.send(env.set_attr(*data))
+            elif command == "env_method":
+                (method_name, args, kwargs, indices) = data
+                result = env.env_method(method_name, *args, indices=indices, **kwargs)
+                # The method may have reset drones, e.g. reset
+                obs[start:stop] = env.get_obs()
+                remote.send(result)
+            elif command == "close":
+                remote.close()
+                break
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        remote.send(RuntimeError(traceback.format_exc()))
+
+
+class droneSharedVecEnv(VecEnv):
+    """
+    droneVecEnv split over worker processes
+
+    Worker i simulates envs_per_worker drones with the targets of the seed seed + i.
+    Finished sub-environments are reset automatically like in droneVecEnv.
+    """
+
+    def __init__(
+        self,
+        n_workers: int,
+        envs_per_worker: int = 1,
+        seed: int = None,
+        start_method: str = None,
+        **kwargs,
+    ):
+        """
+        Args:
+            n_workers (int): Number of worker processes
+            envs_per_worker (int): Drones simulated by each worker
+            seed (int): Seed of the targets, None draws one from the random module
+            start_method (str): Start method of the processes, see multiprocessing,
+                the default of the platform if None
+            **kwargs: integrator, dt and action_repeat, see droneVecEnv
+        """
+        num_envs = n_workers * envs_per_worker
+        action_space = spaces.Box(low=-1, high=1, shape=(ACTION_SIZE,))
+        observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(OBS_SIZE,))
+        super().__init__(num_envs, observation_space, action_space)
+
+        context = mp.get_context(start_method)
+        # Lock-free buffers, the pipes already order the accesses
+        # Actions stay float32 like the ones of sb3, see droneVecEnv.step
+        self.buffers = {
+            "actions": context.RawArray("f", num_envs * ACTION_SIZE),
+            "obs": context.RawArray("f", num_envs * OBS_SIZE),
+            "rewards": context.RawArray("f", num_envs),
+            "dones": context.RawArray("b", num_envs),
+            "terminal_obs": context.RawArray("f", num_envs * OBS_SIZE),
+        }
+        (
+            self.actions,
+            self.obs,
+            self.rewards,
+            self.dones,
+            self.terminal_obs,
+        ) = shared_arrays(self.buffers, num_envs)
+
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.slices = [
+            (i * envs_per_worker, (i + 1) * envs_per_worker) for i in range(n_workers)
+        ]
+        self.remotes = []
+        self.processes = []
+        for i, (start, stop) in enumerate(self.slices):
+            (remote, work_remote) = context.Pipe()
+            process = context.Process(
+                target=worker,
+                args=(
+                    work_remote,
+                    remote,
+                    self.buffers,
+                    num_envs,
+                    start,
+                    stop,
+                    dict(kwargs, seed=seed + i),
+                ),
+                daemon=True,
+            )
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.closed = False
+
+    def send(self, command: str, data=None, remotes: list = None) -> list:
+        """
+        Sends a command to the workers and waits for their replies
+
+        Args:
+            command (str): Command of the worker loop
+            data: Argument of the command
+            remotes (list): Pipes of the workers, all of them by default
+
+        Returns:
+            list: Replies of the workers
+        """
+        remotes = self.remotes if remotes is None else remotes
+        for remote in remotes:
+            remote.send((command, data))
+        replies = [remote.recv() for remote in remotes]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def reset(self) -> np.ndarray:
+        self.send("reset")
+        return self.obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.actions[:] = np.asarray(actions).reshape(self.num_envs, ACTION_SIZE)
+        for remote in self.remotes:
+            remote.send(("step", None))
+
+    def step_wait(self):
+        for remote in self.remotes:
+            reply = remote.recv()
+            if isinstance(reply, Exception):
+                raise reply
+        # The buffers are overwritten by the next step, sb3 keeps the arrays
+        dones = self.dones.copy()
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self.terminal_obs[i].copy()
+        return self.obs.copy(), self.rewards.copy(), dones, infos
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def seed(self, seed: int = None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        seeds = []
+        for i, remote in enumerate(self.remotes):
+            seeds += self.send("seed", seed + i, [remote])[0]
+        return seeds
+
+    def worker_indices(self, indices) -> list:
+        """
+        Args:
+            indices: Indices of sub-environments, see VecEnv
+
+        Returns:
+            list: (worker, local indices) of the workers simulating them
+        """
+        indices = list(self._get_indices(indices))
+        workers = []
+        for worker_index, (start, stop) in enumerate(self.slices):
+            local = [i - start for i in indices if start <= i < stop]
+            if local:
+                workers.append((worker_index, local))
+        return workers
+
+    def get_attr(self, attr_name: str, indices=None):
+        values = []
+        for worker_index, local in self.worker_indices(indices):
+            values += self.send(
+                "get_attr", (attr_name, local), [self.remotes[worker_index]]
+            )[0]
+        return values
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        for worker_index, local in self.worker_indices(indices):
+            self.send(
+                "set_attr", (attr_name, value, local), [self.remotes[worker_index]]
+            )
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs):
+        """
+        Calls a method of the droneVecEnv of the workers simulating the selected
+        sub-environments, see droneVecEnv.env_method
+        """
+        results = []
+        for worker_index, local in self.worker_indices(indices):
+            results += self.send(
+                "env_method",
+                (method_name, method_args, method_kwargs, local),
+                [self.remotes[worker_index]],
+            )[0]
+        return results
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
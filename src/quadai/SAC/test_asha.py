@@ -0,0 +1,78 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a helpful way to test the ASHA scheduler (see asha.py) on the sweep grid
+Workers are simulated, a job takes a time proportional to the steps it trains
+and the score of a configuration is fixed, drawn once at random.
+"""
+
+import heapq
+
+import numpy as np
+from asha import ASHAScheduler, rung_steps
+from param_tuning import sweep_configs
+
+n_workers = 4
+reduction_factor = 3
+
+
+def simulate(scheduler: ASHAScheduler, reports: list, max_reports: int = None):
+    """
+    Runs the jobs of the scheduler on simulated workers
+
+    Args:
+        scheduler (ASHAScheduler): The scheduler
+        reports (list): (name, rung) of each report, appended to
+        max_reports (int): Stop after this number of reports like after a crash,
+            the running jobs are lost
+    """
+    running = []
+    time = 0
+    while True:
+        while len(running) < n_workers:
+            job = scheduler.next_job()
+            if job is None:
+                break
+            (name, rung) = job
+            # Resumed from the checkpoint of the previous rung
+            previous = rungs[rung - 1] if rung > 0 else 0
+            heapq.heappush(running, (time + rungs[rung] - previous, name, rung))
+        if not running or len(reports) == max_reports:
+            return
+        (time, name, rung) = heapq.heappop(running)
+        scheduler.report(name, rung, scores[name])
+        reports.append((name, rung))
+
+
+names = [name for name, _ in sweep_configs()]
+rng = np.random.default_rng(0)
+scores = dict(zip(names, rng.permutation(len(names)).astype(float)))
+best = max(names, key=scores.get)
+max_steps = sweep_configs()[0][1]["timesteps"]
+rungs = rung_steps(50000, max_steps, reduction_factor)
+print("Configurations:", len(names), "rungs:", rungs)
+
+# Uninterrupted sweep
+reports = []
+simulate(ASHAScheduler(names, rungs, reduction_factor), reports)
+full = [name for name, rung in reports if rung == len(rungs) - 1]
+trained = sum(rungs[rung] - (rungs[rung - 1] if rung else 0) for _, rung in reports)
+print("Configurations trained to", max_steps, "steps:", full)
+print("Best configuration reaches the full budget:", best in full)
+print(f"Steps trained: {trained / (max_steps * len(names)):.0%} of the full sweep")
+print("Every job reported once:", len(reports) == len(set(reports)))
+
+# Sweep interrupted after 10 reports then resumed from the stored results
+reports = []
+simulate(ASHAScheduler(names, rungs, reduction_factor), reports, max_reports=10)
+stored = list(reports)
+scheduler = ASHAScheduler(names, rungs, reduction_factor)
+for name, rung in stored:
+    scheduler.report(name, rung, scores[name])
+simulate(scheduler, reports)
+resumed = [name for name, rung in reports if rung == len(rungs) - 1]
+print("Resumed sweep, best configuration reaches the full budget:", best in resumed)
+print("No stored result trained again:", len(reports) == len(set(reports)))
@@ -0,0 +1,86 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a helpful way to test the metrics file (see quadai/metrics.py)
+Values are written and read back, then the file is cut in the middle of a block
+like after a crash and appended to again.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import quadai.metrics
+from quadai.metrics import MetricsLogger, read_metrics
+
+path = os.path.join(tempfile.mkdtemp(), "metrics.qmet")
+
+# Two sessions, each one closes with a block of its own
+n_steps = 1000
+for session in range(2):
+    with MetricsLogger(path, flush_rows=64) as metrics:
+        for step in range(session * n_steps // 2, (session + 1) * n_steps // 2):
+            metrics.record("train/loss", 1 / (step + 1), step)
+            if step % 10 == 0:
+                metrics.record_many(
+                    {"episode/reward": step * 0.5, "episode/length": 10}, step
+                )
+
+read = read_metrics(path)
+(steps, values) = read["train/loss"]
+print(
+    "Round trip:",
+    sorted(read) == ["episode/length", "episode/reward", "train/loss"]
+    and np.array_equal(steps, np.arange(n_steps))
+    and np.array_equal(values, 1 / (np.arange(n_steps) + 1))
+    and np.array_equal(read["episode/reward"][1], np.arange(0, n_steps, 10) * 0.5),
+)
+
+# Cut the last block in the middle, it is ignored by the readers
+size = os.path.getsize(path)
+with open(path, "r+b") as file:
+    file.truncate(size - 100)
+cut = read_metrics(path)
+(cut_steps, _) = cut["train/loss"]
+print(
+    "Cut block ignored:",
+    0 < len(cut_steps) < n_steps
+    and np.array_equal(cut_steps, np.arange(len(cut_steps))),
+)
+
+# The logger truncates the cut block, the new values are readable after it
+with MetricsLogger(path) as metrics:
+    metrics.record("train/loss", -1.0, n_steps)
+(steps, values) = read_metrics(path)["train/loss"]
+print(
+    "Appended after the cut block:",
+    len(steps) == len(cut_steps) + 1 and steps[-1] == n_steps and values[-1] == -1.0,
+)
+
+# Values recorded while a block is written must be written by close()
+path = os.path.join(tempfile.mkdtemp(), "metrics.qmet")
+encode_block = quadai.metrics.encode_block
+writing = threading.Event()
+
+
+def slow_encode_block(buffers: dict) -> bytes:
+    writing.set()
+    time.sleep(0.2)
+    return encode_block(buffers)
+
+
+quadai.metrics.encode_block = slow_encode_block
+metrics = MetricsLogger(path)
+metrics.record("a", 1.0, 1)
+metrics.flush()
+writing.wait()
+metrics.record("a", 2.0, 2)
+metrics.close()
+quadai.metrics.encode_block = encode_block
+(steps, values) = read_metrics(path)["a"]
+print("Recorded during a flush then closed:", steps.tolist() == [1, 2])
@@ -0,0 +1,71 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a helpful way to test shared_vec_env_SAC against vec_env_SAC
+Worker i of droneSharedVecEnv must behave like a droneVecEnv of seed seed + i.
+"""
+
+import numpy as np
+from shared_vec_env_SAC import droneSharedVecEnv
+from vec_env_SAC import droneVecEnv
+
+n_workers = 2
+envs_per_worker = 4
+
+if __name__ == "__main__":
+    shared_env = droneSharedVecEnv(n_workers, envs_per_worker, seed=0)
+    vec_envs = [droneVecEnv(envs_per_worker, seed=i) for i in range(n_workers)]
+
+    shared_obs = shared_env.reset()
+    obs = np.concatenate([vec_env.reset() for vec_env in vec_envs])
+    print("Same observations after reset:", np.array_equal(obs, shared_obs))
+
+    # Random actions, the workers draw their targets like the droneVecEnv slices
+    rng = np.random.default_rng(0)
+    n_steps = 3000
+    compared, mismatches = (0, 0)
+    for step in range(n_steps):
+        actions = rng.uniform(-1, 1, size=(n_workers * envs_per_worker, 2))
+        actions = actions.astype(np.float32)
+        (shared_obs, shared_rewards, shared_dones, shared_infos) = shared_env.step(
+            actions
+        )
+        for w, vec_env in enumerate(vec_envs):
+            (start, stop) = (w * envs_per_worker, (w + 1) * envs_per_worker)
+            (vec_obs, vec_rewards, vec_dones, vec_infos) = vec_env.step(
+                actions[start:stop]
+            )
+            for i in range(envs_per_worker):
+                compared += 1
+                same = (
+                    np.array_equal(vec_obs[i], shared_obs[start + i])
+                    and vec_rewards[i] == shared_rewards[start + i]
+                    and vec_dones[i] == shared_dones[start + i]
+                )
+                if vec_dones[i]:
+                    same = same and np.array_equal(
+                        vec_infos[i]["terminal_observation"],
+                        shared_infos[start + i]["terminal_observation"],
+                    )
+                if not same:
+                    mismatches += 1
+    print("Steps compared:", compared, "mismatches:", mismatches)
+
+    # env_method is forwarded to the worker owning each sub-environment
+    shared_obs = shared_env.env_method("reset", indices=[1, 5])
+    obs = vec_envs[0].env_method("reset", indices=[1]) + vec_envs[1].env_method(
+        "reset", indices=[1]
+    )
+    print(
+        "Same observations after env_method reset:",
+        np.array_equal(np.array(obs), np.array(shared_obs))
+        and np.array_equal(
+            shared_env.get_attr("xt"),
+            [x for vec_env in vec_envs for x in vec_env.get_attr("xt")],
+        ),
+    )
+    print("Seeds:", shared_env.env_method("seed", 7, indices=[0, 4]))
+    shared_env.close()
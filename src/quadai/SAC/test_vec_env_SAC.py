@@ -0,0 +1,57 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a helpful way to test vec_env_SAC against env_SAC
+"""
+
+import numpy as np
+from env_SAC import droneEnv
+from vec_env_SAC import droneVecEnv
+
+n_envs = 8
+vec_env = droneVecEnv(n_envs, seed=0)
+envs = [droneEnv(False, False) for _ in range(n_envs)]
+
+
+def sync_targets():
+    """Copies the targets of the vectorized env into the scalar envs"""
+    for i, env in enumerate(envs):
+        env.xt, env.yt = (vec_env.xt[i], vec_env.yt[i])
+
+
+vec_obs = vec_env.reset()
+obs = np.array([env.reset() for env in envs])
+sync_targets()
+vec_obs = vec_env.get_obs()
+obs = np.array([env.get_obs() for env in envs])
+print("Same observations after reset:", np.array_equal(obs, vec_obs))
+
+# Random actions, steps where a target is reached are skipped
+# because both envs draw new targets from different random generators
+rng = np.random.default_rng(0)
+n_steps = 1000
+compared, mismatches = (0, 0)
+for step in range(n_steps):
+    actions = rng.uniform(-1, 1, size=(n_envs, 2)).astype(np.float32)
+    vec_obs, vec_rewards, vec_dones, infos = vec_env.step(actions)
+    for i, env in enumerate(envs):
+        obs, reward, done, info = env.step(actions[i])
+        if done:
+            vec_obs_i = infos[i]["terminal_observation"]
+            env.reset()
+        else:
+            vec_obs_i = vec_obs[i]
+        if reward < 50 and vec_rewards[i] < 50:
+            compared += 1
+            if not (
+                np.array_equal(obs, vec_obs_i)
+                and np.float32(reward) == vec_rewards[i]
+                and done == vec_dones[i]
+            ):
+                mismatches += 1
+        env.xt, env.yt = (vec_env.xt[i], vec_env.yt[i])
+
+print("Steps compared:", compared, "mismatches:", mismatches)
@@ -1,49 +1,288 @@
 """
 Train an SAC agent using sb3 on the droneEnv environment
+
+Experience is collected by one droneEnv in the main process by default,
+or by --workers processes sharing their buffers (see shared_vec_env_SAC.py)
+The logs are written to a local metrics file (see quadai/metrics.py), --wandb
+also sends them to wandb
+
+Example:
+python train_SAC.py --workers 4 --envs-per-worker 2 --gradient-ratio 0.5
+python train_SAC.py --workers 4 --compare 20000
 """
 
+import argparse
 import os
+import time
+from math import isclose
 
 from stable_baselines3 import SAC
 from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.callbacks import CheckpointCallback
-import wandb
-from wandb.integration.sb3 import WandbCallback
+from stable_baselines3.common.vec_env import VecMonitor
+from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback
 
 from env_SAC import droneEnv
+from shared_vec_env_SAC import droneSharedVecEnv
+from quadai.sb3_metrics import setup_metrics, wandb_callback
+
+# Wall-clock time of the runs is reported at this number of steps
+REPORT_STEPS = 5000000
+
+
+def make_env(workers: int, envs_per_worker: int, log_dir: str, seed: int = None):
+    """
+    Creates the monitored training environment
+
+    Args:
+        workers (int): Number of worker processes, 0 for a single droneEnv
+            in the main process
+        envs_per_worker (int): Drones simulated by each worker
+        log_dir (str): Directory of the monitor logs
+        seed (int): Seed of the targets
+
+    Returns:
+        The environment, a gym env or a VecEnv
+    """
+    if workers == 0:
+        return Monitor(droneEnv(False, False, seed=seed), log_dir)
+    return VecMonitor(droneSharedVecEnv(workers, envs_per_worker, seed=seed), log_dir)
+
+
+def training_schedule(gradient_ratio: float, n_envs: int) -> tuple:
+    """
+    SAC settings doing gradient_ratio gradient steps per collected transition
+
+    Args:
+        gradient_ratio (float): Gradient steps per transition, e.g. 0.25
+        n_envs (int): Transitions collected per environment step
+
+    Returns:
+        tuple: (train_freq, gradient_steps) arguments of SAC
+
+    Raises:
+        ValueError: If the ratio is not n or 1 / n gradient steps per environment
+            step, e.g. 0.3 with 4 environments
+    """
+    if gradient_ratio <= 0:
+        raise ValueError(f"gradient_ratio must be positive, got {gradient_ratio}")
+    steps = gradient_ratio * n_envs
+    if steps >= 1:
+        schedule = (1, round(steps))
+    else:
+        # Less than one gradient step per environment step
+        schedule = (round(1 / steps), 1)
+    (train_freq, gradient_steps) = schedule
+    effective = gradient_steps / (train_freq * n_envs)
+    if not isclose(effective, gradient_ratio, rel_tol=1e-6):
+        raise ValueError(
+            f"gradient_ratio {gradient_ratio} cannot be reached with {n_envs}"
+            f" environments, it would be rounded to {effective:g}"
+        )
+    return schedule
+
+
+class ThroughputCallback(BaseCallback):
+    """
+    Reports the collected steps per second and the projected training time
+    """
+
+    def __init__(
+        self,
+        total_timesteps: int,
+        report_freq: int = 10000,
+        report_steps: int = REPORT_STEPS,
+        verbose: int = 1,
+    ):
+        """
+        Args:
+            total_timesteps (int): Steps of the training
+            report_freq (int): Steps between two reports
+            report_steps (int): Steps of the projected wall-clock time
+            verbose (int): Print the reports if 1
+        """
+        super().__init__(verbose)
+        self.total_timesteps = total_timesteps
+        self.report_freq = report_freq
+        self.report_steps = report_steps
+        self.start = None
+        self.next_report = report_freq
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.num_timesteps / (time.perf_counter() - self.start)
+
+    def _on_training_start(self) -> None:
+        self.start = time.perf_counter()
+
+    def _on_step(self) -> bool:
+        if self.num_timesteps < self.next_report:
+            return True
+        self.next_report += self.report_freq
+        fps = self.steps_per_second
+        eta = (self.total_timesteps - self.num_timesteps) / fps
+        self.logger.record("time/steps_per_second", fps)
+        self.logger.record("time/eta_hours", eta / 3600)
+        self.logger.record("time/projected_hours", self.report_steps / fps / 3600)
+        if self.verbose > 0:
+            print(
+                f"{self.num_timesteps} steps, {fps:.0f} steps/s, ETA {eta / 3600:.1f} h,"
+                f" {self.report_steps} steps in {self.report_steps / fps / 3600:.1f} h"
+            )
+        return True
+
 
-run = wandb.init(
-    project="quadai",
-    sync_tensorboard=True,
-    monitor_gym=True,
-)
-
-# Create log dir
-log_dir = "tmp/"
-os.makedirs(log_dir, exist_ok=True)
-
-# Create and wrap the environment
-env = droneEnv(False, False)
-env = Monitor(env, log_dir)
-
-# Create SAC agent
-model = SAC("MlpPolicy", env, verbose=1, tensorboard_log=log_dir)
-
-# Create checkpoint callback
-checkpoint_callback = CheckpointCallback(
-    save_freq=100000, save_path=log_dir, name_prefix="rl_model_v2"
-)
-
-# Train the agent
-model.learn(
-    total_timesteps=10000000,
-    callback=[
-        checkpoint_callback,
-        WandbCallback(
-            gradient_save_freq=100000,
-            model_save_path=f"models/{run.id}",
-            model_save_freq=100000,
-            verbose=2,
+def create_model(
+    env, n_envs: int, gradient_ratio: float, log_dir: str, verbose: int = 1
+) -> SAC:
+    (train_freq, gradient_steps) = training_schedule(gradient_ratio, n_envs)
+    return SAC(
+        "MlpPolicy",
+        env,
+        verbose=verbose,
+        tensorboard_log=log_dir,
+        train_freq=train_freq,
+        gradient_steps=gradient_steps,
+    )
+
+
+def measure(
+    workers: int,
+    envs_per_worker: int,
+    gradient_ratio: float,
+    steps: int,
+    log_dir: str,
+) -> float:
+    """
+    Trains a throwaway agent to measure the training throughput of a setup
+
+    Args:
+        workers (int): Number of worker processes, 0 for a single droneEnv
+        envs_per_worker (int): Drones simulated by each worker
+        gradient_ratio (float): Gradient steps per collected transition
+        steps (int): Steps of the measure
+        log_dir (str): Directory of the monitor logs
+
+    Returns:
+        float: Steps per second, the first 1000 steps are excluded
+    """
+    env = make_env(workers, envs_per_worker, log_dir)
+    n_envs = envs_per_worker * workers if workers > 0 else 1
+    model = create_model(env, n_envs, gradient_ratio, None, verbose=0)
+    # Warm up, SAC only trains after learning_starts steps
+    model.learn(total_timesteps=max(model.learning_starts, 1000))
+    callback = ThroughputCallback(steps, verbose=0)
+    model.learn(total_timesteps=steps, callback=callback, reset_num_timesteps=True)
+    env.close()
+    return callback.steps_per_second
+
+
+def compare(
+    workers: int, envs_per_worker: int, gradient_ratio: float, steps: int, log_dir: str
+) -> None:
+    """
+    Prints the projected wall-clock time of a setup against the single droneEnv baseline
+
+    Args:
+        workers (int): Number of worker processes
+        envs_per_worker (int): Drones simulated by each worker
+        gradient_ratio (float): Gradient steps per collected transition
+        steps (int): Steps of each measure
+        log_dir (str): Directory of the monitor logs
+    """
+    baseline = measure(0, 1, 1.0, steps, log_dir)
+    parallel = measure(workers, envs_per_worker, gradient_ratio, steps, log_dir)
+    rows = [
+        ("single droneEnv", baseline),
+        (
+            f"{workers} workers x {envs_per_worker} envs, ratio {gradient_ratio}",
+            parallel,
         ),
-    ],
-)
+    ]
+    print(f"Projected wall-clock time to {REPORT_STEPS} steps:")
+    for label, fps in rows:
+        print(
+            f"  {label:<36} {fps:7.0f} steps/s {REPORT_STEPS / fps / 3600:6.1f} h"
+            f"  ({fps / baseline:.2f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train an SAC agent on droneEnv")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Worker processes collecting experience, 0 for a single droneEnv",
+    )
+    parser.add_argument("--envs-per-worker", type=int, default=1)
+    parser.add_argument(
+        "--gradient-ratio",
+        type=float,
+        default=1.0,
+        help="Gradient steps per collected transition",
+    )
+    parser.add_argument("--timesteps", type=int, default=10000000)
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the targets")
+    parser.add_argument(
+        "--compare",
+        type=int,
+        default=None,
+        metavar="STEPS",
+        help="Measure the throughput against the single droneEnv for STEPS steps and exit",
+    )
+    parser.add_argument(
+        "--metrics", default="tmp/metrics.qmet", help="Local metrics file"
+    )
+    parser.add_argument(
+        "--wandb", action="store_true", help="Also log the training to wandb"
+    )
+    args = parser.parse_args()
+
+    # Create log dir
+    log_dir = "tmp/"
+    os.makedirs(log_dir, exist_ok=True)
+
+    if args.compare is not None:
+        compare(
+            args.workers,
+            args.envs_per_worker,
+            args.gradient_ratio,
+            args.compare,
+            log_dir,
+        )
+        return
+
+    # Create and wrap the environment
+    env = make_env(args.workers, args.envs_per_worker, log_dir, args.seed)
+    n_envs = args.workers * args.envs_per_worker if args.workers > 0 else 1
+
+    # Callbacks count environment steps, each one collects n_envs transitions
+    save_freq = max(100000 // n_envs, 1)
+
+    # Create checkpoint callback
+    checkpoint_callback = CheckpointCallback(
+        save_freq=save_freq, save_path=log_dir, name_prefix="rl_model_v2"
+    )
+    callbacks = [checkpoint_callback, ThroughputCallback(args.timesteps)]
+    # The wandb run must start before the tensorboard writer it syncs
+    if args.wandb:
+        (_, callback) = wandb_callback(
+            "quadai", save_freq, save_freq, config=vars(args)
+        )
+        callbacks.append(callback)
+
+    # Create SAC agent, its logs go to the metrics file
+    model = create_model(env, n_envs, args.gradient_ratio, None)
+    (metrics, episode_callback) = setup_metrics(
+        model, args.metrics, tensorboard_dir=log_dir if args.wandb else None
+    )
+    callbacks.append(episode_callback)
+
+    # Train the agent
+    model.learn(total_timesteps=args.timesteps, callback=callbacks)
+    metrics.close()
+    env.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a vectorized version of droneEnv (see SAC/env_SAC.py for details)
+It simulates N drones at once with NumPy arrays and plugs into sb3 as a VecEnv
+Observations and rewards are the same as the ones of droneEnv
+"""
+
+from math import pi
+
+import numpy as np
+from gym import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from quadai import physics
+from quadai.physics import X, Y, ANGLE, X_SPEED, Y_SPEED, ANGULAR_SPEED
+from quadai.targets import TargetStream
+
+
+class droneVecEnv(VecEnv):
+    """
+    N independent droneEnv simulated with array operations
+
+    Finished sub-environments are reset automatically, the last observation
+    of the episode is stored in info["terminal_observation"] as sb3 expects.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        seed: int = None,
+        integrator: str = "euler",
+        dt: float = 1.0,
+        action_repeat: int = 5,
+    ):
+        """
+        Args:
+            num_envs (int): Number of drones
+            seed (int): Seed of the targets, None draws one from the random module
+            integrator (str): Integrator of the physics, see droneEnv
+            dt (float): Duration of a physics substep in frames
+            action_repeat (int): Physics substeps per action
+        """
+        # 2 action thrust amplitude and thrust difference in float values between -1 and 1
+        action_space = spaces.Box(low=-1, high=1, shape=(2,))
+        # 7 observations: angle_to_up, velocity, angle_velocity, distance_to_target, angle_to_target, angle_target_and_velocity, distance_to_target
+        observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(7,))
+        super().__init__(num_envs, observation_space, action_space)
+
+        # Physics constants
+        self.FPS = 60
+        self.gravity = physics.GRAVITY
+        self.thruster_amplitude = 0.04
+        self.diff_amplitude = 0.003
+        self.thruster_mean = 0.04
+        self.mass = physics.MASS
+        self.arm = physics.ARM
+
+        # Physics configuration, an action lasts action_repeat * dt frames
+        physics.check_integrator(integrator)
+        self.integrator = integrator
+        self.dt = dt
+        self.action_repeat = action_repeat
+        self.time_limit = 20
+
+        # Target k of sub-environment i is target k * num_envs + i of the stream
+        self.targets = TargetStream(seed)
+        self.target_index = np.zeros(num_envs, dtype=np.int64)
+        self.actions = np.zeros((num_envs, 2), dtype=np.float32)
+
+        # Initialize variables
+        self.state = physics.new_state(num_envs)
+        self.xt = np.zeros(num_envs)
+        self.yt = np.zeros(num_envs)
+        self.target_counter = np.zeros(num_envs, dtype=np.int64)
+        self.time = np.zeros(num_envs)
+        self.reward = np.zeros(num_envs)
+        self.reset_envs(np.arange(num_envs))
+
+    def reset_envs(self, indices: np.ndarray) -> None:
+        """
+        Resets the selected sub-environments
+
+        Args:
+            indices (np.ndarray): Indices of the sub-environments to reset
+        """
+        self.state[indices] = physics.new_state(len(indices))
+        self.next_targets(indices)
+
+        self.target_counter[indices] = 0
+        self.reward[indices] = 0
+        self.time[indices] = 0
+
+    def next_targets(self, indices: np.ndarray) -> None:
+        """
+        Moves the targets of the selected sub-environments to their next position
+
+        Args:
+            indices (np.ndarray): Indices of the sub-environments
+        """
+        targets = self.targets.batch(
+            self.target_index[indices] * self.num_envs + indices
+        )
+        (self.xt[indices], self.yt[indices]) = targets.T
+        self.target_index[indices] += 1
+
+    def reset(self) -> np.ndarray:
+        self.reset_envs(np.arange(self.num_envs))
+        return self.get_obs()
+
+    def get_obs(self) -> np.ndarray:
+        """
+        Calculates the observations of every sub-environment
+
+        Returns:
+            np.ndarray: The (num_envs, 7) normalized observations, see droneEnv.get_obs
+        """
+        (x, y, a) = (self.state[:, X], self.state[:, Y], self.state[:, ANGLE])
+        (xd, yd) = (self.state[:, X_SPEED], self.state[:, Y_SPEED])
+        angle_to_up = a / 180 * pi
+        velocity = np.sqrt(xd**2 + yd**2)
+        angle_velocity = self.state[:, ANGULAR_SPEED]
+        distance_to_target = np.sqrt((self.xt - x) ** 2 + (self.yt - y) ** 2) / 500
+        angle_to_target = np.arctan2(self.yt - y, self.xt - x)
+        # Angle between the to_target vector and the velocity vector
+        angle_target_and_velocity = angle_to_target - np.arctan2(yd, xd)
+        return np.stack(
+            [
+                angle_to_up,
+                velocity,
+                angle_velocity,
+                distance_to_target,
+                angle_to_target,
+                angle_target_and_velocity,
+                distance_to_target,
+            ],
+            axis=1,
+        ).astype(np.float32)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        # The thrusts are computed in the dtype of the actions (float32 from sb3)
+        # like the scalar droneEnv does
+        self.actions = np.asarray(actions).reshape(self.num_envs, 2)
+
+    def step_wait(self):
+        self.reward[:] = 0.0
+        action0, action1 = (self.actions[:, 0], self.actions[:, 1])
+
+        thruster_left = self.thruster_mean + action0 * self.thruster_amplitude
+        thruster_right = self.thruster_mean + action0 * self.thruster_amplitude
+        thruster_left += action1 * self.diff_amplitude
+        thruster_right -= action1 * self.diff_amplitude
+
+        # Sub-environments stop moving as soon as their episode ends
+        done = np.zeros(self.num_envs, dtype=bool)
+
+        # Act every action_repeat substeps
+        for _ in range(self.action_repeat):
+            active = ~done
+            if not active.any():
+                break
+
+            self.time[active] += self.dt / 60
+
+            # Calculating accelerations with Newton's laws of motions
+            if active.all():
+                physics.step(
+                    self.state,
+                    thruster_left,
+                    thruster_right,
+                    self.gravity,
+                    self.mass,
+                    self.arm,
+                    self.dt,
+                    self.integrator,
+                )
+            else:
+                state = self.state[active]
+                physics.step(
+                    state,
+                    thruster_left[active],
+                    thruster_right[active],
+                    self.gravity,
+                    self.mass,
+                    self.arm,
+                    self.dt,
+                    self.integrator,
+                )
+                self.state[active] = state
+
+            dist = np.sqrt(
+                (self.state[:, X] - self.xt) ** 2 + (self.state[:, Y] - self.yt) ** 2
+            )
+
+            # Reward per step survived, rewards are per frame
+            self.reward[active] += self.dt / 60
+            # Penalty according to the distance to target
+            self.reward[active] -= dist[active] * self.dt / (100 * 60)
+
+            # Reward if close to target
+            reached = np.flatnonzero(active & (dist < 50))
+            if len(reached) > 0:
+                self.next_targets(reached)
+                self.reward[reached] += 100
+
+            # If out of time
+            out_of_time = active & (self.time > self.time_limit)
+            # If too far from target (crash)
+            crashed = active & ~out_of_time & (dist > 1000)
+            self.reward[crashed] -= 1000
+
+            done |= out_of_time | crashed
+
+        obs = self.get_obs()
+        rewards = self.reward.astype(np.float32)
+        infos = [{} for _ in range(self.num_envs)]
+
+        # Auto-reset finished sub-environments
+        finished = np.flatnonzero(done)
+        if len(finished) > 0:
+            for i in finished:
+                infos[i]["terminal_observation"] = obs[i].copy()
+            self.reset_envs(finished)
+            obs[finished] = self.get_obs()[finished]
+
+        return obs, rewards, done, infos
+
+    def close(self) -> None:
+        pass
+
+    def seed(self, seed: int = None):
+        self.targets = TargetStream(seed)
+        self.target_index[:] = 0
+        return [self.targets.seed for _ in range(self.num_envs)]
+
+    def get_attr(self, attr_name: str, indices=None):
+        value = getattr(self, attr_name)
+        indices = self._get_indices(indices)
+        if isinstance(value, np.ndarray) and len(value) == self.num_envs:
+            return [value[i] for i in indices]
+        return [value for _ in indices]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        current = getattr(self, attr_name)
+        if isinstance(current, np.ndarray) and len(current) == self.num_envs:
+            current[list(self._get_indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs):
+        """
+        Calls a method of droneVecEnv, e.g. seed, results per sub-environment
+        (arrays or lists of num_envs items) are split by index like in get_attr
+
+        reset only resets the selected sub-environments and returns their observations.
+        """
+        indices = list(self._get_indices(indices))
+        if method_name == "reset":
+            self.reset_envs(np.array(indices, dtype=np.int64))
+            obs = self.get_obs()
+            return [obs[i] for i in indices]
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        if isinstance(result, (list, np.ndarray)) and len(result) == self.num_envs:
+            return [result[i] for i in indices]
+        return [result for _ in indices]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -8,30 +8,105 @@ This is the main game where you can compete with AI agents
 Collect as many balloons within the time limit
 """
 
-import sys
+import argparse
+
+from quadai import startup
 import quadai
 from quadai.balloon import balloon
 from quadai.snowglobe import snowglobe
 
+startup.mark("quadai imported")
+
 
-def main(game: str = "balloon") -> None:
+def main(
+    game: str = "balloon",
+    profile: str = None,
+    speed: float = 1.0,
+    spectate: bool = False,
+    record: str = None,
+    particles: bool = True,
+) -> None:
     """
     Runs the selected game.
 
     Args:
         game (str): The game to run (balloon, snowglobe)
+        profile (str): Path of the frame profiler trace (.csv or .json), None to disable
+        speed (float): Speed of the balloon match relative to real time
+        spectate (bool): Only AI players compete in the balloon match
+        record (str): Path of a recording of the game, None to disable
+        particles (bool): Record the snow particles of the snowglobe game
     """
     if game == "balloon":
-        balloon()
+        balloon(profile, speed, spectate, record)
     elif game == "snowglobe":
-        snowglobe()
+        snowglobe(profile, record, particles)
     else:
         print(f"Unknown tracking library: {game} (expected: balloon or snowglobe)")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="quadai", description=quadai.__doc__)
+    parser.add_argument(
+        "game", nargs="?", default="balloon", help="balloon (default) or snowglobe"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="print the import and startup times when the first frame is shown",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile.csv",
+        default=None,
+        metavar="PATH",
+        help="record the frame timings and write them to PATH (.csv or .json) on exit",
+    )
+    parser.add_argument(
+        "--spectate",
+        action="store_true",
+        help="balloon: watch the AI players without playing",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="balloon: speed of the match relative to real time (default 1)",
+    )
+    parser.add_argument(
+        "--record",
+        nargs="?",
+        const="recording.qrec",
+        default=None,
+        metavar="PATH",
+        help="record the game to PATH (recording.qrec by default)",
+    )
+    parser.add_argument(
+        "--no-particles",
+        action="store_true",
+        help="snowglobe: do not record the snow particles",
+    )
+    parser.add_argument(
+        "--play",
+        default=None,
+        metavar="PATH",
+        help="play a recording instead of a game, --speed applies",
+    )
+    args = parser.parse_args()
+
+    startup.enabled = args.startup_report
     print(f"Hello world from {quadai.__name__} ({quadai.__doc__})")
-    if len(sys.argv) > 1:
-        main(sys.argv[1])
+    if args.play is not None:
+        from quadai.playback import play
+
+        play(args.play, args.speed)
     else:
-        main()
+        main(
+            args.game,
+            args.profile,
+            args.speed,
+            args.spectate,
+            args.record,
+            not args.no_particles,
+        )
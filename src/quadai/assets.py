@@ -0,0 +1,229 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the asset cache shared by the games and the environments
+Images and fonts are loaded once per process. Images are converted to the display
+format (convert_alpha) as soon as a window exists.
+The scaled animation sprites are baked on disk in an atlas (one PNG and its JSON index)
+that later starts load instead of decoding and scaling every sprite again.
+"""
+
+import hashlib
+import json
+import os
+
+import pygame
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
+# The atlas is written to the user cache, the package folder may be read-only
+CACHE_DIR = os.environ.get(
+    "QUADAI_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "quadai")
+)
+
+BACKGROUND_DIR = "balloon-flat-asset-pack/png/background-elements"
+DRONE_FRAMES = [
+    f"balloon-flat-asset-pack/png/objects/drone-sprites/drone-{i}.png"
+    for i in range(1, 5)
+]
+BALLOON_FRAMES = [
+    f"balloon-flat-asset-pack/png/balloon-sprites/red-plain/red-plain-{i}.png"
+    for i in range(1, 8)
+]
+
+# Scaled animation frames baked in the atlas, at the sizes used by the games
+ATLAS_SPRITES = [(path, (80, int(80 * 0.30))) for path in DRONE_FRAMES] + [
+    (path, (30, int(30 * 1.73))) for path in BALLOON_FRAMES
+]
+
+# (path, size) to surface, converted to the display format once possible
+images = {}
+converted = set()
+# (path, size) to font
+fonts = {}
+# Sprites read from the atlas, (path, size) to surface
+atlas = {}
+
+
+def asset_path(path: str) -> str:
+    """
+    Args:
+        path (str): Path relative to the assets folder
+
+    Returns:
+        str: Absolute path of the asset
+    """
+    return os.path.join(ASSETS_DIR, path)
+
+
+def display_ready() -> bool:
+    return pygame.display.get_init() and pygame.display.get_surface() is not None
+
+
+def finish(key: tuple, surface: pygame.Surface) -> pygame.Surface:
+    """
+    Converts a cached surface to the display format if a window exists
+
+    Args:
+        key (tuple): Key of the surface in images
+        surface (pygame.Surface): The surface
+
+    Returns:
+        pygame.Surface: The surface to use
+    """
+    if key not in converted and display_ready():
+        surface = surface.convert_alpha()
+        images[key] = surface
+        converted.add(key)
+    return surface
+
+
+def load_image(path: str, size: tuple = None) -> pygame.Surface:
+    """
+    Loads an image once per process, optionally scaled
+    The surface is shared, settings like set_alpha apply to every user
+
+    Args:
+        path (str): Path relative to the assets folder
+        size (tuple): (width, height) to scale to, None for the original size
+
+    Returns:
+        pygame.Surface: The image
+    """
+    key = (path, size)
+    if key not in images:
+        if key in atlas:
+            images[key] = atlas[key]
+        elif size is not None:
+            images[key] = pygame.transform.scale(load_image(path), size)
+        else:
+            images[key] = pygame.image.load(asset_path(path))
+    return finish(key, images[key])
+
+
+def load_font(path: str, size: int) -> pygame.font.Font:
+    """
+    Loads a font once per process
+
+    Args:
+        path (str): Path relative to the assets folder
+        size (int): Size of the font
+
+    Returns:
+        pygame.font.Font: The font
+    """
+    key = (path, size)
+    if key not in fonts:
+        pygame.font.init()
+        fonts[key] = pygame.font.Font(asset_path(path), size)
+    return fonts[key]
+
+
+def load_animation(paths: list, width: int, ratio: float) -> list:
+    """
+    Loads the frames of an animation scaled to a width, from the atlas if baked
+
+    Args:
+        paths (list): Paths of the frames relative to the assets folder
+        width (int): Width of the frames
+        ratio (float): Height of the frames relative to their width
+
+    Returns:
+        list: The frames
+    """
+    load_atlas()
+    return [load_image(path, (width, int(width * ratio))) for path in paths]
+
+
+def drone_animation(width: int = 80) -> list:
+    """
+    Returns:
+        list: The 4 frames of the drone
+    """
+    return load_animation(DRONE_FRAMES, width, 0.30)
+
+
+def balloon_animation(width: int = 30) -> list:
+    """
+    Returns:
+        list: The 7 frames of the balloon
+    """
+    return load_animation(BALLOON_FRAMES, width, 1.73)
+
+
+def background_sprites() -> tuple:
+    """
+    Returns:
+        tuple: The two clouds and the sun, with the transparency of the games
+    """
+    sprites = tuple(
+        load_image(f"{BACKGROUND_DIR}/{name}.png")
+        for name in ("cloud-1", "cloud-2", "sun")
+    )
+    for sprite in sprites:
+        sprite.set_alpha(124)
+    return sprites
+
+
+def atlas_name() -> str:
+    """
+    Names the atlas after its content, a source changing on disk gives a new atlas
+
+    Returns:
+        str: File name of the atlas without extension
+    """
+    digest = hashlib.sha1(pygame.version.ver.encode())
+    for path, size in ATLAS_SPRITES:
+        stat = os.stat(asset_path(path))
+        digest.update(f"{path}:{size}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return "atlas-" + digest.hexdigest()[:16]
+
+
+def load_atlas() -> None:
+    """
+    Reads the scaled sprites from the atlas on disk, baking it on the first run
+    """
+    if len(atlas) > 0:
+        return
+    name = atlas_name()
+    image_path = os.path.join(CACHE_DIR, name + ".png")
+    index_path = os.path.join(CACHE_DIR, name + ".json")
+
+    try:
+        with open(index_path) as file:
+            rects = json.load(file)
+        sheet = pygame.image.load(image_path)
+        for entry, rect in zip(ATLAS_SPRITES, rects):
+            # Copied so that the sprites do not keep the whole sheet alive
+            atlas[entry] = sheet.subsurface(rect).copy()
+        return
+    except (OSError, ValueError, pygame.error):
+        atlas.clear()
+
+    # Sprites side by side in a single row
+    sprites = []
+    rects = []
+    x = 0
+    for path, size in ATLAS_SPRITES:
+        sprite = pygame.transform.scale(load_image(path), size)
+        sprites.append(sprite)
+        rects.append([x, 0, size[0], size[1]])
+        x += size[0]
+    sheet = pygame.Surface(
+        (x, max(sprite.get_height() for sprite in sprites)), pygame.SRCALPHA
+    )
+    for entry, sprite, rect in zip(ATLAS_SPRITES, sprites, rects):
+        # Copies the pixels as they are instead of blending them on the empty sheet
+        sheet.blit(sprite, rect[:2], special_flags=pygame.BLEND_RGBA_MAX)
+        atlas[entry] = sprite
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pygame.image.save(sheet, image_path)
+        # The index is written last so that a partial atlas is never read
+        with open(index_path, "w") as file:
+            json.dump(rects, file)
+    except (OSError, pygame.error):
+        pass
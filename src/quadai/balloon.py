@@ -7,381 +7,287 @@ https://github.com/AlexandreSajus/Quadcopter-AI
 This is the main game where you can compete with AI agents
 Collect as many balloons within the time limit
 """
-import os
-from random import randrange
-from math import sin, cos, pi, sqrt
-
 import numpy as np
 import pygame
 from pygame.locals import *
-from quadai.player import HumanPlayer, PIDPlayer, SACPlayer
-
 
-def correct_path(current_path):
-    """
-    This function is used to get the correct path to the assets folder
-    """
-    return os.path.join(os.path.dirname(__file__), current_path)
+from quadai import assets, startup
+from quadai.match import BalloonMatch
+from quadai.player import HumanPlayer, PIDPlayer, SACPlayer
+from quadai.compositor import Compositor, MovingLayer
+from quadai.profiler import FrameProfiler
+from quadai.recording import Recorder, balloon_metadata, record_balloon_step
+from quadai.render_cache import rotation_cache, text_cache
+from quadai.timestep import FixedTimestep
 
 
-def balloon():
+class BalloonRenderer:
     """
-    Runs the balloon game.
+    Draws the frames of a balloon match (see match.py) on a pygame surface
     """
-    # Game constants
-    FPS = 60
-    WIDTH = 800
-    HEIGHT = 800
-
-    # Physics constants
-    gravity = 0.08
-    # Propeller force for UP and DOWN
-    thruster_amplitude = 0.04
-    # Propeller force for LEFT and RIGHT rotations
-    diff_amplitude = 0.003
-    # By default, thruster will apply angle force of thruster_mean
-    thruster_mean = 0.04
-    mass = 1
-    # Length from center of mass to propeller
-    arm = 25
-
-    # Initialize Pygame, load sprites
-    FramePerSec = pygame.time.Clock()
 
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-
-    # Loading player and target sprites
-    player_width = 80
-    player_animation_speed = 0.3
-    player_animation = []
-    for i in range(1, 5):
-        image = pygame.image.load(
-            correct_path(
-                os.path.join(
-                    "assets/balloon-flat-asset-pack/png/objects/drone-sprites/drone-"
-                    + str(i)
-                    + ".png"
-                )
-            )
-        )
-        image.convert()
-        player_animation.append(
-            pygame.transform.scale(image, (player_width, int(player_width * 0.30)))
-        )
-
-    target_width = 30
-    target_animation_speed = 0.1
-    target_animation = []
-    for i in range(1, 8):
-        image = pygame.image.load(
-            correct_path(
-                os.path.join(
-                    "assets/balloon-flat-asset-pack/png/balloon-sprites/red-plain/red-plain-"
-                    + str(i)
-                    + ".png"
-                )
-            )
-        )
-        image.convert()
-        target_animation.append(
-            pygame.transform.scale(image, (target_width, int(target_width * 1.73)))
+    def __init__(self, screen: pygame.Surface, profiler: FrameProfiler = None):
+        """
+        Loads the sprites and the fonts, pygame must be initialized
+
+        Args:
+            screen (pygame.Surface): Surface to draw on, usually the window
+            profiler (FrameProfiler): Times the background, sprites and text sections
+        """
+        self.screen = screen
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+        (self.width, self.height) = screen.get_size()
+
+        # Loading player and target sprites, shared with the other games
+        self.player_animation_speed = 0.3
+        self.player_animation = assets.drone_animation()
+        self.target_animation_speed = 0.1
+        self.target_animation = assets.balloon_animation()
+
+        # Loading background sprites
+        (self.cloud1, self.cloud2, self.sun) = assets.background_sprites()
+
+        # The sky, the clouds and the sun are composited once in a background layer
+        self.compositor = Compositor(
+            screen,
+            (131, 176, 181),
+            [
+                MovingLayer(self.cloud1, 150, 200, 0.3),
+                MovingLayer(self.cloud2, 400, 500, -0.2),
+            ],
+            lambda background: background.blit(self.sun, (630, -100)),
         )
 
-    # Loading background sprites
-    cloud1 = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/cloud-1.png"
-            )
+        # Loading fonts
+        self.name_font = assets.load_font("fonts/Roboto-Bold.ttf", 20)
+        self.name_hud_font = assets.load_font("fonts/Roboto-Bold.ttf", 15)
+        self.time_font = assets.load_font("fonts/Roboto-Bold.ttf", 30)
+        self.score_font = assets.load_font("fonts/Roboto-Regular.ttf", 20)
+        self.respawn_timer_font = assets.load_font("fonts/Roboto-Bold.ttf", 90)
+        self.respawning_font = assets.load_font("fonts/Roboto-Regular.ttf", 15)
+
+    def update_display(self) -> None:
+        """
+        Shows the frame, only updating the areas that changed
+        """
+        self.compositor.update()
+
+    def display_info(self, player, position: int) -> None:
+        """
+        Displays the name and the score of a player in the top HUD
+
+        Args:
+            player (Player): The player
+            position (int): x position of the info
+        """
+        compositor = self.compositor
+        name_text = text_cache.render(
+            self.name_font, player.name, True, (255, 255, 255)
         )
-    )
-    cloud2 = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/cloud-2.png"
-            )
-        )
-    )
-    sun = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/sun.png"
-            )
+        compositor.blit(name_text, (position, 20))
+        target_text = text_cache.render(
+            self.score_font,
+            "Score : " + str(player.target_counter),
+            True,
+            (255, 255, 255),
         )
-    )
-    cloud1.set_alpha(124)
-    (x_cloud1, y_cloud1, speed_cloud1) = (150, 200, 0.3)
-    cloud2.set_alpha(124)
-    (x_cloud2, y_cloud2, speed_cloud2) = (400, 500, -0.2)
-    sun.set_alpha(124)
-
-    # Loading fonts
-    pygame.font.init()
-    name_font = pygame.font.Font(correct_path("assets/fonts/Roboto-Bold.ttf"), 20)
-    name_hud_font = pygame.font.Font(correct_path("assets/fonts/Roboto-Bold.ttf"), 15)
-    time_font = pygame.font.Font(correct_path("assets/fonts/Roboto-Bold.ttf"), 30)
-    score_font = pygame.font.Font(correct_path("assets/fonts/Roboto-Regular.ttf"), 20)
-    respawn_timer_font = pygame.font.Font(
-        correct_path("assets/fonts/Roboto-Bold.ttf"), 90
-    )
-    respawning_font = pygame.font.Font(
-        correct_path("assets/fonts/Roboto-Regular.ttf"), 15
-    )
-
-    # Function to display info about a player
-
-    def display_info(position):
-        name_text = name_font.render(player.name, True, (255, 255, 255))
-        screen.blit(name_text, (position, 20))
-        target_text = score_font.render(
-            "Score : " + str(player.target_counter), True, (255, 255, 255)
-        )
-        screen.blit(target_text, (position, 45))
+        compositor.blit(target_text, (position, 45))
         if player.dead == True:
-            respawning_text = respawning_font.render(
-                "Respawning...", True, (255, 255, 255)
+            respawning_text = text_cache.render(
+                self.respawning_font, "Respawning...", True, (255, 255, 255)
             )
-            screen.blit(respawning_text, (position, 70))
-
-    # Initialize game variables
-    time = 0
-    step = 0
-    time_limit = 100
-    respawn_timer_max = 3
-
-    players = [HumanPlayer(), PIDPlayer(), SACPlayer()]
-
-    # Generate 100 targets
-    targets = []
-    for i in range(100):
-        targets.append((randrange(200, 600), randrange(200, 600)))
-
-    # Game loop
-    while True:
-        pygame.event.get()
-
-        # Display background
-        screen.fill((131, 176, 181))
-
-        x_cloud1 += speed_cloud1
-        if x_cloud1 > WIDTH:
-            x_cloud1 = -cloud1.get_width()
-        screen.blit(cloud1, (x_cloud1, y_cloud1))
-
-        x_cloud2 += speed_cloud2
-        if x_cloud2 < -cloud2.get_width():
-            x_cloud2 = WIDTH
-        screen.blit(cloud2, (x_cloud2, y_cloud2))
-
-        screen.blit(sun, (630, -100))
-
-        time += 1 / 60
-        step += 1
+            compositor.blit(respawning_text, (position, 70))
+
+    def draw(
+        self, match: BalloonMatch, previous: np.ndarray = None, alpha: float = 1.0
+    ) -> None:
+        """
+        Draws the current frame of a match
+        The players can be drawn between their previous and current poses
+
+        Args:
+            match (BalloonMatch): The match
+            previous (np.ndarray): Poses of the players before the last step (see
+                BalloonMatch.poses), None to draw the current poses
+            alpha (float): Interpolation factor, 0 for the previous poses and 1 for
+                the current ones
+        """
+        # Sprites are drawn through the compositor to track the changed areas
+        compositor = self.compositor
+        profiler = self.profiler
+        step = match.step_count
+        compositor.begin_frame()
+        profiler.lap("background")
+
+        # Players dead before or after the last step are not interpolated (NaN)
+        blended = None
+        if previous is not None and alpha < 1:
+            blended = previous + (match.poses() - previous) * alpha
 
         # For each player
-        for player_index, player in enumerate(players):
-            if player.dead == False:
-                # Initialize accelerations
-                player.x_acceleration = 0
-                player.y_acceleration = gravity
-                player.angular_acceleration = 0
-
-                # Calculate propeller force in function of input
-                if player.name == "DQN" or player.name == "PID":
-                    thruster_left, thruster_right = player.act(
-                        [
-                            targets[player.target_counter][0] - player.x_position,
-                            player.x_speed,
-                            targets[player.target_counter][1] - player.y_position,
-                            player.y_speed,
-                            player.angle,
-                            player.angular_speed,
-                        ]
-                    )
-                elif player.name == "SAC":
-                    angle_to_up = player.angle / 180 * pi
-                    velocity = sqrt(player.x_speed**2 + player.y_speed**2)
-                    angle_velocity = player.angular_speed
-                    distance_to_target = (
-                        sqrt(
-                            (targets[player.target_counter][0] - player.x_position) ** 2
-                            + (targets[player.target_counter][1] - player.y_position)
-                            ** 2
-                        )
-                        / 500
-                    )
-                    angle_to_target = np.arctan2(
-                        targets[player.target_counter][1] - player.y_position,
-                        targets[player.target_counter][0] - player.x_position,
-                    )
-                    # Angle between the to_target vector and the velocity vector
-                    angle_target_and_velocity = np.arctan2(
-                        targets[player.target_counter][1] - player.y_position,
-                        targets[player.target_counter][0] - player.x_position,
-                    ) - np.arctan2(player.y_speed, player.x_speed)
-                    distance_to_target = (
-                        sqrt(
-                            (targets[player.target_counter][0] - player.x_position) ** 2
-                            + (targets[player.target_counter][1] - player.y_position)
-                            ** 2
-                        )
-                        / 500
-                    )
-                    thruster_left, thruster_right = player.act(
-                        np.array(
-                            [
-                                angle_to_up,
-                                velocity,
-                                angle_velocity,
-                                distance_to_target,
-                                angle_to_target,
-                                angle_target_and_velocity,
-                                distance_to_target,
-                            ]
-                        ).astype(np.float32)
-                    )
-                else:
-                    thruster_left, thruster_right = player.act([])
-
-                # Calculate accelerations according to Newton's laws of motion
-                player.x_acceleration += (
-                    -(thruster_left + thruster_right)
-                    * sin(player.angle * pi / 180)
-                    / mass
-                )
-                player.y_acceleration += (
-                    -(thruster_left + thruster_right)
-                    * cos(player.angle * pi / 180)
-                    / mass
-                )
-                player.angular_acceleration += (
-                    arm * (thruster_right - thruster_left) / mass
+        for player_index, player in enumerate(match.players):
+            # Display respawn timer
+            if player.dead and player.name == "Human":
+                respawn_text = text_cache.render(
+                    self.respawn_timer_font,
+                    str(int(player.respawn_timer) + 1),
+                    True,
+                    (255, 255, 255),
+                    alpha=124,
                 )
-
-                # Calculate speed
-                player.x_speed += player.x_acceleration
-                player.y_speed += player.y_acceleration
-                player.angular_speed += player.angular_acceleration
-
-                # Calculate position
-                player.x_position += player.x_speed
-                player.y_position += player.y_speed
-                player.angle += player.angular_speed
-
-                # Calculate distance to target
-                dist = sqrt(
-                    (player.x_position - targets[player.target_counter][0]) ** 2
-                    + (player.y_position - targets[player.target_counter][1]) ** 2
-                )
-
-                # If target reached, respawn target
-                if dist < 50:
-                    player.target_counter += 1
-
-                # If to far, die and respawn after timer
-                elif dist > 1000:
-                    player.dead = True
-                    player.respawn_timer = respawn_timer_max
-            else:
-                # Display respawn timer
-                if player.name == "Human":
-                    respawn_text = respawn_timer_font.render(
-                        str(int(player.respawn_timer) + 1), True, (255, 255, 255)
-                    )
-                    respawn_text.set_alpha(124)
-                    screen.blit(
-                        respawn_text,
-                        (
-                            WIDTH / 2 - respawn_text.get_width() / 2,
-                            HEIGHT / 2 - respawn_text.get_height() / 2,
-                        ),
-                    )
-
-                player.respawn_timer -= 1 / 60
-                # Respawn
-                if player.respawn_timer < 0:
-                    player.dead = False
+                compositor.blit(
+                    respawn_text,
                     (
-                        player.angle,
-                        player.angular_speed,
-                        player.angular_acceleration,
-                    ) = (
-                        0,
-                        0,
-                        0,
-                    )
-                    (player.x_position, player.x_speed, player.x_acceleration) = (
-                        400,
-                        0,
-                        0,
-                    )
-                    (player.y_position, player.y_speed, player.y_acceleration) = (
-                        400,
-                        0,
-                        0,
-                    )
+                        self.width / 2 - respawn_text.get_width() / 2,
+                        self.height / 2 - respawn_text.get_height() / 2,
+                    ),
+                )
+                profiler.lap("text")
 
             # Display target and player
-            target_sprite = target_animation[
-                int(step * target_animation_speed) % len(target_animation)
+            target = match.target_of(player)
+            target_sprite = self.target_animation[
+                int(step * self.target_animation_speed) % len(self.target_animation)
             ]
             target_sprite.set_alpha(player.alpha)
-            screen.blit(
+            compositor.blit(
                 target_sprite,
                 (
-                    targets[player.target_counter][0]
-                    - int(target_sprite.get_width() / 2),
-                    targets[player.target_counter][1]
-                    - int(target_sprite.get_height() / 2),
+                    target[0] - int(target_sprite.get_width() / 2),
+                    target[1] - int(target_sprite.get_height() / 2),
                 ),
             )
 
-            player_sprite = player_animation[
-                int(step * player_animation_speed) % len(player_animation)
+            (x, y, angle) = (player.x_position, player.y_position, player.angle)
+            if blended is not None and not np.isnan(blended[player_index, 0]):
+                (x, y, angle) = blended[player_index].tolist()
+            player_sprite = self.player_animation[
+                int(step * self.player_animation_speed) % len(self.player_animation)
             ]
-            player_copy = pygame.transform.rotate(player_sprite, player.angle)
-            player_copy.set_alpha(player.alpha)
-            screen.blit(
+            player_copy = rotation_cache.rotate(player_sprite, angle, player.alpha)
+            compositor.blit(
                 player_copy,
                 (
-                    player.x_position - int(player_copy.get_width() / 2),
-                    player.y_position - int(player_copy.get_height() / 2),
+                    x - int(player_copy.get_width() / 2),
+                    y - int(player_copy.get_height() / 2),
                 ),
             )
+            profiler.lap("sprites")
 
             # Display player name
-            name_hud_text = name_hud_font.render(player.name, True, (255, 255, 255))
-            screen.blit(
+            name_hud_text = text_cache.render(
+                self.name_hud_font, player.name, True, (255, 255, 255)
+            )
+            compositor.blit(
                 name_hud_text,
                 (
-                    player.x_position - int(name_hud_text.get_width() / 2),
-                    player.y_position - 30 - int(name_hud_text.get_height() / 2),
+                    x - int(name_hud_text.get_width() / 2),
+                    y - 30 - int(name_hud_text.get_height() / 2),
                 ),
             )
 
             # Display player info
-            if player_index == 0:
-                display_info(20)
-            elif player_index == 1:
-                display_info(130)
-            elif player_index == 2:
-                display_info(240)
-            elif player_index == 3:
-                display_info(350)
-
-            time_text = time_font.render(
-                "Time : " + str(int(time_limit - time)), True, (255, 255, 255)
-            )
-            screen.blit(time_text, (670, 30))
+            if player_index < 4:
+                self.display_info(player, 20 + 110 * player_index)
+            profiler.lap("text")
+
+        time_text = text_cache.render(
+            self.time_font,
+            "Time : " + str(int(match.time_limit - match.time)),
+            True,
+            (255, 255, 255),
+        )
+        compositor.blit(time_text, (670, 30))
+        profiler.lap("text")
+
+
+def balloon(
+    profile: str = None,
+    speed: float = 1.0,
+    spectate: bool = False,
+    record: str = None,
+):
+    """
+    Runs the balloon game.
+    Press F3 to show the frame profiler
+
+    The match advances in fixed 1/60 s steps whatever the frame rate,
+    frames are drawn between the last two steps and skipped when late.
+
+    Args:
+        profile (str): Path of a .csv or .json frame trace written at the end,
+            the profiler records from the start if given
+        speed (float): Speed of the match relative to real time
+        spectate (bool): Only AI players compete
+        record (str): Path of a recording of the match (see recording.py), None to disable
+    """
+    # Game constants
+    FPS = 60
+    WIDTH = 800
+    HEIGHT = 800
+
+    # Create the players first, their models load in the background
+    # while the window and the assets initialize
+    players = [PIDPlayer(), SACPlayer()]
+    if not spectate:
+        players.insert(0, HumanPlayer())
+
+    # Initialize Pygame, load sprites
+    FramePerSec = pygame.time.Clock()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    startup.mark("window opened")
+
+    profiler = FrameProfiler(enabled=profile is not None)
+    renderer = BalloonRenderer(screen, profiler)
+    startup.mark("assets loaded")
+
+    # Initialize game variables, the match holds the rules and the physics
+    match = BalloonMatch(players, time_limit=100, profiler=profiler)
+    timestep = FixedTimestep(step_rate=FPS, speed=speed, render_rate=FPS)
+    previous = None
+    recorder = None
+    if record is not None:
+        recorder = Recorder(record, balloon_metadata(match))
+
+    # Game loop
+    while True:
+        profiler.start_frame()
+        for event in pygame.event.get():
+            if event.type == KEYDOWN and event.key == K_F3:
+                profiler.toggle_overlay()
+        profiler.lap("events")
+
+        for _ in range(timestep.advance()):
+            previous = match.poses()
+            match.step()
+            if recorder is not None:
+                record_balloon_step(recorder, match)
+            if match.done:
+                break
+        profiler.lap("record")
 
         # Ending conditions
-        if time > time_limit:
+        if match.done:
             break
 
-        pygame.display.update()
+        if timestep.should_render():
+            renderer.draw(match, previous, timestep.alpha)
+            renderer.compositor.mark(profiler.draw_overlay(screen))
+            profiler.lap("overlay")
+            renderer.update_display()
+            profiler.lap("display update")
+        profiler.end_frame()
+        startup.first_frame()
+        # Caps the frame rate, the match follows the real time anyway
         FramePerSec.tick(FPS)
 
+    if recorder is not None:
+        recorder.close()
+    if profile is not None:
+        profiler.dump(profile)
+
     # Print scores and who won
     print("")
     scores = []
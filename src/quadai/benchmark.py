@@ -0,0 +1,364 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the benchmark suite of the simulation and inference hot paths
+Every benchmark is seeded and timed over several repeats, results are saved as JSON
+
+Run the suite and compare it to a previous run with:
+python -m quadai.benchmark --output new.json --compare old.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from math import cos, sin
+
+import numpy as np
+
+
+def timed(function, number: int) -> float:
+    """
+    Calls a function several times with the garbage collector disabled
+
+    Args:
+        function (callable): Function without arguments
+        number (int): Number of calls
+
+    Returns:
+        float: Total time in seconds
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure(function, repeats: int = 5, min_time: float = 0.2, number: int = None):
+    """
+    Times a function like timeit: the number of calls per repeat is calibrated
+    so that a repeat lasts at least min_time
+
+    Args:
+        function (callable): Function without arguments
+        repeats (int): Number of repeats
+        min_time (float): Minimum duration of a repeat in seconds
+        number (int): Calls per repeat, calibrated if None
+
+    Returns:
+        dict: Per call statistics in microseconds over the repeats
+    """
+    function()
+    if number is None:
+        number = 1
+        while True:
+            elapsed = timed(function, number)
+            if elapsed >= min_time:
+                break
+            number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    per_call = [timed(function, number) / number * 1e6 for _ in range(repeats)]
+    return {
+        "median_us": statistics.median(per_call),
+        "min_us": min(per_call),
+        "mean_us": statistics.mean(per_call),
+        "stdev_us": statistics.stdev(per_call) if repeats > 1 else 0.0,
+        "calls": number,
+        "repeats": repeats,
+    }
+
+
+def seed_everything(seed: int = 0) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+
+# Each benchmark prepares its objects and returns the function to time
+
+
+def bench_env_step(algorithm: str):
+    if algorithm == "SAC":
+        from quadai.SAC.env_SAC import droneEnv
+
+        action = np.array([0.5, -0.2], dtype=np.float32)
+    else:
+        from quadai.DQN.env_DQN import droneEnv
+
+        action = 1
+    env = droneEnv(False, False)
+    env.reset()
+
+    def step():
+        (_, _, done, _) = env.step(action)
+        if done:
+            env.reset()
+
+    return step
+
+
+def bench_env_get_obs(algorithm: str):
+    if algorithm == "SAC":
+        from quadai.SAC.env_SAC import droneEnv
+    else:
+        from quadai.DQN.env_DQN import droneEnv
+    env = droneEnv(False, False)
+    env.reset()
+    return env.get_obs
+
+
+def new_balloon_match():
+    from quadai.match import BalloonMatch
+    from quadai.player import PIDPlayer, SACPlayer
+
+    players = [PIDPlayer(), SACPlayer()]
+    # Wait for the model so that its loading is not timed
+    players[1].action_value
+    return BalloonMatch(players, seed=0)
+
+
+def bench_balloon_frame(rendered: bool):
+    import pygame
+
+    match = new_balloon_match()
+    renderer = None
+    if rendered:
+        from quadai.balloon import BalloonRenderer
+
+        pygame.init()
+        renderer = BalloonRenderer(pygame.display.set_mode((800, 800)))
+
+    def frame():
+        nonlocal match
+        if match.done:
+            match = new_balloon_match()
+        match.step()
+        if renderer is not None:
+            renderer.draw(match)
+            renderer.update_display()
+
+    return frame
+
+
+def bench_snowglobe_frame(n_particles: int):
+    import pygame
+    from quadai.snowglobe import Snowglobe
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 800))
+    game = Snowglobe(n_particles, seed=0)
+
+    def frame():
+        # The target circles inside the snowglobe like a moving mouse
+        angle = game.step_count / 60
+        game.step(400 + 200 * cos(angle), 400 + 200 * sin(angle))
+        game.draw(screen)
+        game.update_display()
+
+    return frame
+
+
+def bench_pid_compute():
+    from quadai.PID.controller_PID import PID
+
+    pid = PID(2.5, 0, 1.5, 100, -100)
+    errors = np.random.default_rng(0).normal(0, 100, 1000).tolist()
+    index = 0
+
+    def compute():
+        nonlocal index
+        pid.compute(errors[index % 1000], 1 / 60)
+        index += 1
+
+    return compute
+
+
+def bench_pid_player_act():
+    from quadai.player import PIDPlayer
+
+    player = PIDPlayer()
+    obs = [120.0, 0.5, -80.0, -0.3, 4.0, 0.1]
+    return lambda: player.act(obs)
+
+
+def bench_sac_player_act(player_class):
+    player = player_class()
+    obs = np.array([0.1, 0.5, 0.01, 0.4, 1.2, 0.3, 0.4], dtype=np.float32)
+    player.action_value
+    return lambda: player.act(obs)
+
+
+def bench_model_load(numpy: bool):
+    import quadai.player as player_module
+    from quadai.numpy_policy import NumpyActor
+
+    if numpy:
+        path = os.path.join(
+            os.path.dirname(player_module.__file__),
+            "models/sac_model_v2_5000000_steps.npz",
+        )
+        return lambda: NumpyActor(path)
+    path = os.path.join(
+        os.path.dirname(player_module.__file__), "models/sac_model_v2_5000000_steps.zip"
+    )
+    # Imports sb3 and torch once, then bypasses the model cache
+    player_module.read_model(path)
+    return lambda: player_module.read_model(path)
+
+
+def get_benchmarks() -> dict:
+    """
+    Returns:
+        dict: Name of each benchmark mapped to its setup function and fixed number of calls
+    """
+    from quadai.player import SACPlayer, NumpySACPlayer
+
+    benchmarks = {
+        "sac_env_step": (lambda: bench_env_step("SAC"), None),
+        "sac_env_get_obs": (lambda: bench_env_get_obs("SAC"), None),
+        "dqn_env_step": (lambda: bench_env_step("DQN"), None),
+        "dqn_env_get_obs": (lambda: bench_env_get_obs("DQN"), None),
+        "balloon_frame_headless": (lambda: bench_balloon_frame(False), None),
+        "balloon_frame_rendered": (lambda: bench_balloon_frame(True), None),
+        "pid_compute": (bench_pid_compute, None),
+        "pid_player_act": (bench_pid_player_act, None),
+        "sac_player_act": (lambda: bench_sac_player_act(SACPlayer), None),
+        "numpy_sac_player_act": (lambda: bench_sac_player_act(NumpySACPlayer), None),
+        "sac_model_load": (lambda: bench_model_load(False), 1),
+        "numpy_sac_model_load": (lambda: bench_model_load(True), None),
+    }
+    for n_particles in (1800, 18000, 180000):
+        benchmarks[f"snowglobe_frame_{n_particles}"] = (
+            lambda n_particles=n_particles: bench_snowglobe_frame(n_particles),
+            None,
+        )
+    return benchmarks
+
+
+def run(names: list, repeats: int = 5, min_time: float = 0.2) -> dict:
+    """
+    Runs the selected benchmarks
+
+    Args:
+        names (list): Names of the benchmarks, see get_benchmarks
+        repeats (int): Number of repeats per benchmark
+        min_time (float): Minimum duration of a repeat in seconds
+
+    Returns:
+        dict: Metadata of the run and statistics of each benchmark
+    """
+    benchmarks = get_benchmarks()
+    results = {}
+    for name in names:
+        (setup, number) = benchmarks[name]
+        seed_everything()
+        function = setup()
+        results[name] = measure(function, repeats, min_time, number)
+        print(
+            f"{name:<28}{results[name]['median_us']:>14.1f} us"
+            f"  (+/- {results[name]['stdev_us']:.1f}, {results[name]['calls']} calls)"
+        )
+    return {"metadata": get_metadata(), "results": results}
+
+
+def get_metadata() -> dict:
+    metadata = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+    }
+    for module in ("pygame", "torch", "stable_baselines3"):
+        if module in sys.modules:
+            metadata[module] = getattr(sys.modules[module], "__version__", None)
+    return metadata
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints the speed ratio of each benchmark against a previous run
+
+    Args:
+        results (dict): Current run
+        baseline (dict): Previous run
+        threshold (float): Relative slowdown of the median reported as a regression
+
+    Returns:
+        list: Names of the regressed benchmarks
+    """
+    regressions = []
+    print("")
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, current in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median_us"]
+        ratio = current["median_us"] / before
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<28}{before:>12.1f}{current['median_us']:>12.1f}{ratio:>8.2f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the quadai benchmark suite")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results")
+    parser.add_argument("--compare", default=None, help="JSON results to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown reported as a regression (default 0.1)",
+    )
+    parser.add_argument(
+        "--filter", default="", help="Only run the benchmarks containing this"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument(
+        "--display", action="store_true", help="Open a window for rendered benchmarks"
+    )
+    args = parser.parse_args()
+
+    if not args.display:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    # Single threaded torch gives stable timings
+    import torch
+
+    torch.set_num_threads(1)
+
+    names = [name for name in get_benchmarks() if args.filter in name]
+    results = run(names, args.repeats, args.min_time)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"Results saved to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
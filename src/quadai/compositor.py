@@ -0,0 +1,170 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a layered renderer with dirty-rect display updates
+The background (sky, moving clouds and static decorations) is composited once
+in its own surface and only recomposited where a cloud moved.
+Each frame, the background is restored under the previous sprites, the sprites are
+drawn again and only the changed rects are sent to pygame.display.update.
+"""
+
+import pygame
+
+
+class MovingLayer:
+    """
+    A background sprite moving horizontally and wrapping around the screen
+    """
+
+    def __init__(self, surface: pygame.Surface, x: float, y: float, speed: float):
+        """
+        Args:
+            surface (pygame.Surface): The sprite
+            x (float): Initial x position
+            y (float): y position
+            speed (float): Horizontal speed in pixels per frame
+        """
+        self.surface = surface
+        (self.x, self.y, self.speed) = (x, y, speed)
+
+    @property
+    def rect(self) -> pygame.Rect:
+        # pygame truncates float blit positions
+        return self.surface.get_rect(topleft=(int(self.x), int(self.y)))
+
+    def move(self, width: int) -> None:
+        """
+        Moves the sprite by one frame, it reappears on the other side of the screen
+
+        Args:
+            width (int): Width of the screen
+        """
+        self.x += self.speed
+        if self.speed > 0 and self.x > width:
+            self.x = -self.surface.get_width()
+        elif self.speed < 0 and self.x < -self.surface.get_width():
+            self.x = width
+
+
+class Compositor:
+    """
+    Draws the frames of a game on the screen with as few pixels changed as possible
+
+    Usage per frame: begin_frame(), blit() the sprites (or mark() what was drawn
+    directly on the screen), then update() instead of pygame.display.update()
+    """
+
+    def __init__(
+        self,
+        screen: pygame.Surface,
+        color: tuple,
+        layers: list = (),
+        decorate=None,
+    ):
+        """
+        Args:
+            screen (pygame.Surface): The window surface
+            color (tuple): RGB color of the sky
+            layers (list): MovingLayer drawn over the sky, in order
+            decorate (callable): Draws the static elements over the layers, called
+                with the background surface (e.g. the sun)
+        """
+        self.screen = screen
+        self.color = color
+        self.layers = list(layers)
+        self.decorate = decorate
+
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.compose(self.background.get_rect())
+
+        # Rects drawn on the screen during the previous and the current frames
+        self.previous = []
+        self.dirty = []
+        # The whole screen is drawn on the first frame
+        self.full_update = True
+
+    def compose(self, rect: pygame.Rect) -> None:
+        """
+        Draws the background layers inside a rect of the background surface
+
+        Args:
+            rect (pygame.Rect): Area to draw
+        """
+        background = self.background
+        background.set_clip(rect)
+        background.fill(self.color)
+        for layer in self.layers:
+            background.blit(layer.surface, (layer.x, layer.y))
+        if self.decorate is not None:
+            self.decorate(background)
+        background.set_clip(None)
+
+    def begin_frame(self) -> None:
+        """
+        Moves the layers and erases the sprites of the previous frame
+        """
+        width = self.screen.get_width()
+        for layer in self.layers:
+            before = layer.rect
+            layer.move(width)
+            after = layer.rect
+            if after != before:
+                # Both positions are recomposited, after a wrap they are far apart
+                for rect in (before, after):
+                    rect = rect.clip(self.background.get_rect())
+                    if rect.width > 0 and rect.height > 0:
+                        self.compose(rect)
+                        self.previous.append(rect)
+
+        if self.full_update:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.background, rect, rect)
+        self.dirty = []
+
+    def blit(self, surface: pygame.Surface, position) -> pygame.Rect:
+        """
+        Draws a sprite on the screen for this frame
+
+        Args:
+            surface (pygame.Surface): The sprite
+            position (tuple): Top left corner
+
+        Returns:
+            pygame.Rect: The changed area
+        """
+        rect = self.screen.blit(surface, position)
+        self.dirty.append(rect)
+        return rect
+
+    def mark(self, rect: pygame.Rect) -> None:
+        """
+        Declares an area drawn directly on the screen for this frame
+
+        Args:
+            rect (pygame.Rect): The changed area, None is ignored
+        """
+        if rect is not None:
+            self.dirty.append(rect)
+
+    def update(self) -> None:
+        """
+        Shows the frame, only the areas that changed since the previous frame are updated
+        """
+        if self.full_update:
+            pygame.display.update()
+            self.full_update = False
+        else:
+            pygame.display.update(self.previous + self.dirty)
+        self.previous = self.dirty
+        self.dirty = []
+
+    def invalidate(self) -> None:
+        """
+        Redraws and updates the whole screen on the next frame (e.g. after a resize)
+        """
+        self.full_update = True
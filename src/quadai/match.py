@@ -0,0 +1,337 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the headless engine of the balloon game (see balloon.py)
+It simulates a match without display or throttling, as fast as possible
+
+Example:
+from quadai.match import run_match
+from quadai.player import PIDPlayer, SACPlayer
+results = run_match([PIDPlayer(), SACPlayer()], seed=0)
+"""
+
+import time
+from math import pi, sqrt
+
+import numpy as np
+
+from quadai import physics
+from quadai.player import act_batch
+from quadai.profiler import FrameProfiler
+from quadai.targets import TargetStream
+
+FPS = 60
+
+
+def generate_targets(seed: int = None, n_targets: int = 100) -> list:
+    """
+    Draws the first targets of a match, the same targets for a same seed
+
+    Args:
+        seed (int): Seed of the targets, None for random targets
+        n_targets (int): Number of targets
+
+    Returns:
+        list: (x, y) positions of the targets
+    """
+    return TargetStream(seed).take(0, n_targets)
+
+
+def get_pid_obs(player, target):
+    """
+    Calculates the observations of a PID or DQN player
+
+    Args:
+        player (Player): The player
+        target (tuple): Position of the target of the player
+
+    Returns:
+        list: error_x, x_speed, error_y, y_speed, angle, angular_speed
+    """
+    return [
+        target[0] - player.x_position,
+        player.x_speed,
+        target[1] - player.y_position,
+        player.y_speed,
+        player.angle,
+        player.angular_speed,
+    ]
+
+
+def get_sac_obs(player, target):
+    """
+    Calculates the observations of a SAC player, the same as droneEnv.get_obs
+
+    Args:
+        player (Player): The player
+        target (tuple): Position of the target of the player
+
+    Returns:
+        np.ndarray: The normalized observations
+    """
+    angle_to_up = player.angle / 180 * pi
+    velocity = sqrt(player.x_speed**2 + player.y_speed**2)
+    angle_velocity = player.angular_speed
+    distance_to_target = (
+        sqrt(
+            (target[0] - player.x_position) ** 2 + (target[1] - player.y_position) ** 2
+        )
+        / 500
+    )
+    angle_to_target = np.arctan2(
+        target[1] - player.y_position, target[0] - player.x_position
+    )
+    # Angle between the to_target vector and the velocity vector
+    angle_target_and_velocity = np.arctan2(
+        target[1] - player.y_position, target[0] - player.x_position
+    ) - np.arctan2(player.y_speed, player.x_speed)
+    return np.array(
+        [
+            angle_to_up,
+            velocity,
+            angle_velocity,
+            distance_to_target,
+            angle_to_target,
+            angle_target_and_velocity,
+            distance_to_target,
+        ]
+    ).astype(np.float32)
+
+
+class BalloonMatch:
+    """
+    State and rules of a balloon match
+
+    Every player chases its own copy of the same target sequence.
+    A player reaching its target gets the next one, a player further than
+    1000 pixels from its target dies and respawns at the center after a timer.
+    """
+
+    def __init__(
+        self,
+        players: list,
+        seed: int = None,
+        time_limit: float = 100,
+        targets: list = None,
+        respawn_timer_max: float = 3,
+        profiler: FrameProfiler = None,
+    ):
+        """
+        Args:
+            players (list): Players of the match (see player.py)
+            seed (int): Seed of the targets, ignored if targets are given
+            time_limit (float): Duration of the match in seconds
+            targets (list): (x, y) positions of the targets indexed by the number
+                of targets reached, an unbounded TargetStream of the seed by default
+            respawn_timer_max (float): Time to respawn after a death in seconds
+            profiler (FrameProfiler): Times the sections of step and the act latency of each player
+        """
+        self.players = players
+        self.time_limit = time_limit
+        self.respawn_timer_max = respawn_timer_max
+        self.targets = targets if targets is not None else TargetStream(seed)
+
+        # Physics constants
+        self.gravity = physics.GRAVITY
+        self.mass = physics.MASS
+        self.arm = physics.ARM
+
+        self.time = 0
+        self.step_count = 0
+        # Thrusts of the last step, zero for dead players
+        self.thrusts = np.zeros((len(players), 2))
+        self.deaths = [0 for _ in players]
+        # Time at which each target was reached, per player
+        self.target_times = [[] for _ in players]
+
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+        self.act_labels = {
+            id(player): f"act {player_index}:{player.name}"
+            for player_index, player in enumerate(players)
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.time > self.time_limit
+
+    def poses(self) -> np.ndarray:
+        """
+        Snapshot of the players used to interpolate the rendering between two steps
+
+        Returns:
+            np.ndarray: The (n_players, 3) x, y and angle of each player, NaN for dead players
+        """
+        poses = np.array(
+            [
+                [player.x_position, player.y_position, player.angle]
+                for player in self.players
+            ],
+            dtype=np.float64,
+        ).reshape(len(self.players), 3)
+        poses[[player.dead for player in self.players]] = np.nan
+        return poses
+
+    def target_of(self, player) -> tuple:
+        """
+        Args:
+            player (Player): A player of the match
+
+        Returns:
+            tuple: Position of the current target of the player
+        """
+        return self.targets[player.target_counter]
+
+    def compute_thrusts(self, alive_players: list) -> list:
+        """
+        Calculates the propeller thrusts of the alive players
+        Model-driven players are batched to run one forward pass per model
+
+        Args:
+            alive_players (list): Players that are not dead
+
+        Returns:
+            list: Left and right propeller thrusts of each player
+        """
+        thrusts = [None] * len(alive_players)
+        profiler = self.profiler
+        (model_indices, model_observations) = ([], [])
+        for index, player in enumerate(alive_players):
+            target = self.target_of(player)
+            if player.name == "SAC":
+                model_indices.append(index)
+                model_observations.append(get_sac_obs(player, target))
+                continue
+            if player.name == "DQN" or player.name == "PID":
+                obs = get_pid_obs(player, target)
+            else:
+                obs = []
+            start = time.perf_counter() if profiler.enabled else None
+            thrusts[index] = player.act(obs)
+            if start is not None:
+                profiler.record(
+                    self.act_labels[id(player)], time.perf_counter() - start
+                )
+
+        if len(model_indices) > 0:
+            start = time.perf_counter() if profiler.enabled else None
+            model_players = [alive_players[index] for index in model_indices]
+            model_thrusts = act_batch(model_players, model_observations)
+            for index, thrust in zip(model_indices, model_thrusts):
+                thrusts[index] = thrust
+            if start is not None:
+                # The batch latency is shared by its players
+                latency = (time.perf_counter() - start) / len(model_players)
+                for player in model_players:
+                    profiler.record(self.act_labels[id(player)], latency)
+        return thrusts
+
+    def step(self) -> None:
+        """
+        Advances the match by one frame
+        """
+        self.time += 1 / FPS
+        self.step_count += 1
+
+        # Calculate propeller force in function of input for every alive player
+        alive_players = [player for player in self.players if player.dead == False]
+        thrusts = self.compute_thrusts(alive_players)
+        self.profiler.lap("act")
+
+        # Calculate accelerations according to Newton's laws of motion
+        self.thrusts[:] = 0
+        if len(alive_players) > 0:
+            thrusts = np.array(thrusts, dtype=np.float64)
+            self.thrusts[[player.dead == False for player in self.players]] = thrusts
+            (thruster_left, thruster_right) = thrusts.T
+            state = physics.get_states(alive_players)
+            physics.step(
+                state, thruster_left, thruster_right, self.gravity, self.mass, self.arm
+            )
+            physics.set_states(alive_players, state)
+        self.profiler.lap("physics")
+
+        for player_index, player in enumerate(self.players):
+            if player in alive_players:
+                target = self.target_of(player)
+                # Calculate distance to target
+                dist = sqrt(
+                    (player.x_position - target[0]) ** 2
+                    + (player.y_position - target[1]) ** 2
+                )
+
+                # If target reached, respawn target
+                if dist < 50:
+                    player.target_counter += 1
+                    self.target_times[player_index].append(self.time)
+
+                # If to far, die and respawn after timer
+                elif dist > 1000:
+                    player.dead = True
+                    player.respawn_timer = self.respawn_timer_max
+                    self.deaths[player_index] += 1
+            else:
+                player.respawn_timer -= 1 / FPS
+                # Respawn
+                if player.respawn_timer < 0:
+                    player.dead = False
+                    (
+                        player.angle,
+                        player.angular_speed,
+                        player.angular_acceleration,
+                    ) = (0, 0, 0)
+                    (player.x_position, player.x_speed, player.x_acceleration) = (
+                        400,
+                        0,
+                        0,
+                    )
+                    (player.y_position, player.y_speed, player.y_acceleration) = (
+                        400,
+                        0,
+                        0,
+                    )
+        self.profiler.lap("rules")
+
+    def run(self) -> list:
+        """
+        Simulates the match until the time limit
+
+        Returns:
+            list: Results of each player, see results
+        """
+        while not self.done:
+            self.step()
+        return self.results()
+
+    def results(self) -> list:
+        """
+        Returns:
+            list: One dict per player with its name, score (targets reached),
+                deaths and target_times (time at which each target was reached)
+        """
+        return [
+            {
+                "name": player.name,
+                "score": player.target_counter,
+                "deaths": self.deaths[player_index],
+                "target_times": list(self.target_times[player_index]),
+            }
+            for player_index, player in enumerate(self.players)
+        ]
+
+
+def run_match(players: list, seed: int = None, time_limit: float = 100) -> list:
+    """
+    Runs a headless balloon match
+
+    Args:
+        players (list): AI players of the match (see player.py)
+        seed (int): Seed of the targets
+        time_limit (float): Duration of the match in seconds
+
+    Returns:
+        list: One dict per player with its name, score, deaths and target_times
+    """
+    return BalloonMatch(players, seed, time_limit).run()
@@ -0,0 +1,293 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the local metrics backend of the training scripts
+Scalars are buffered in memory per metric and appended to the file in batches
+by a background thread, each batch is a block holding one step column and
+one value column per metric. Blocks are only appended, so a crash loses at most
+the unflushed values and the file can be read while a training is running.
+
+Example:
+python -m quadai.metrics tmp/metrics.qmet --plot rollout/ep_rew_mean
+python -m quadai.metrics tmp/metrics.qmet --export-wandb quadai
+"""
+
+import argparse
+import json
+import threading
+
+import numpy as np
+
+MAGIC = b"QUADMET1"
+# Block header: JSON header size (u4) and column data size (u8)
+BLOCK_PREFIX = 12
+
+
+class MetricsLogger:
+    """
+    Buffers scalars and appends them to a metrics file from a background thread
+    """
+
+    def __init__(self, path: str, flush_rows: int = 4096, flush_interval: float = 10.0):
+        """
+        Args:
+            path (str): Path of the metrics file, appended to if it exists
+            flush_rows (int): Buffered values that trigger a flush
+            flush_interval (float): Seconds between two flushes at most
+        """
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            # A block cut by a crash would hide the blocks appended after it
+            with open(path, "rb") as file:
+                (_, end) = scan_blocks(file.read(), path)
+            self.file.truncate(end)
+
+        # Name to (steps, values) lists, swapped for empty ones at each flush
+        self.buffers = {}
+        self.rows = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closing = False
+        self.error = None
+        self.writer = threading.Thread(target=self.write_blocks, daemon=True)
+        self.writer.start()
+
+    def record(self, name: str, value: float, step: int) -> None:
+        """
+        Args:
+            name (str): Name of the metric, e.g. rollout/ep_rew_mean
+            value (float): Value of the metric
+            step (int): Training step of the value
+        """
+        with self.lock:
+            if name not in self.buffers:
+                self.buffers[name] = ([], [])
+            (steps, values) = self.buffers[name]
+            steps.append(step)
+            values.append(value)
+            self.rows += 1
+        if self.rows >= self.flush_rows:
+            self.wake.set()
+
+    def record_many(self, values: dict, step: int) -> None:
+        """
+        Args:
+            values (dict): Name to value of the metrics
+            step (int): Training step of the values
+        """
+        for name, value in values.items():
+            self.record(name, value, step)
+
+    def flush(self) -> None:
+        """
+        Asks the background thread to write the buffered values
+        """
+        self.wake.set()
+
+    def write_blocks(self) -> None:
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            # Read before the swap, close() may come while the block is written
+            closing = self.closing
+            with self.lock:
+                (buffers, self.buffers, self.rows) = (self.buffers, {}, 0)
+            if buffers and self.error is None:
+                try:
+                    self.file.write(encode_block(buffers))
+                    self.file.flush()
+                except OSError as error:
+                    self.error = error
+            if closing:
+                break
+
+    def close(self) -> None:
+        """
+        Writes the buffered values and closes the file
+        """
+        if self.file.closed:
+            return
+        self.closing = True
+        self.wake.set()
+        self.writer.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_block(buffers: dict) -> bytes:
+    """
+    Args:
+        buffers (dict): Name to (steps, values) lists of the metrics
+
+    Returns:
+        bytes: The block, a JSON header followed by the int64 steps and the float64
+            values of each metric
+    """
+    columns = []
+    data = []
+    for name, (steps, values) in buffers.items():
+        columns.append({"name": name, "rows": len(steps)})
+        data.append(np.asarray(steps, dtype="<i8").tobytes())
+        data.append(np.asarray(values, dtype="<f8").tobytes())
+    header = json.dumps({"columns": columns}).encode()
+    data = b"".join(data)
+    return (
+        len(header).to_bytes(4, "little")
+        + len(data).to_bytes(8, "little")
+        + header
+        + data
+    )
+
+
+def scan_blocks(content: bytes, path: str) -> tuple:
+    """
+    Finds the complete blocks of a metrics file
+
+    Args:
+        content (bytes): Content of the metrics file
+        path (str): Path of the metrics file, for the error message
+
+    Returns:
+        tuple: (blocks, end), the (header, data offset) of each block and the end
+            of the last complete block
+
+    Raises:
+        ValueError: If the file is not a metrics file
+    """
+    if content[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a quadai metrics file")
+    blocks = []
+    offset = len(MAGIC)
+    while offset + BLOCK_PREFIX <= len(content):
+        header_size = int.from_bytes(content[offset : offset + 4], "little")
+        data_size = int.from_bytes(content[offset + 4 : offset + 12], "little")
+        start = offset + BLOCK_PREFIX + header_size
+        if start + data_size > len(content):
+            break
+        try:
+            header = json.loads(content[offset + BLOCK_PREFIX : start])
+        except ValueError:
+            break
+        blocks.append((header, start))
+        offset = start + data_size
+    return (blocks, offset)
+
+
+def read_metrics(path: str) -> dict:
+    """
+    Reads a metrics file, a block being written at the end of the file is ignored
+
+    Args:
+        path (str): Path of the metrics file
+
+    Returns:
+        dict: Name to (steps, values) arrays of each metric, in recording order
+
+    Raises:
+        ValueError: If the file is not a metrics file
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+
+    chunks = {}
+    for header, start in scan_blocks(content, path)[0]:
+        for column in header["columns"]:
+            rows = column["rows"]
+            steps = np.frombuffer(content, dtype="<i8", count=rows, offset=start)
+            start += 8 * rows
+            values = np.frombuffer(content, dtype="<f8", count=rows, offset=start)
+            start += 8 * rows
+            chunks.setdefault(column["name"], []).append((steps, values))
+
+    return {
+        name: (
+            np.concatenate([steps for steps, _ in parts]),
+            np.concatenate([values for _, values in parts]),
+        )
+        for name, parts in chunks.items()
+    }
+
+
+def export_wandb(path: str, project: str, name: str = None) -> None:
+    """
+    Uploads a metrics file to wandb, e.g. from a machine with internet access
+
+    Args:
+        path (str): Path of the metrics file
+        project (str): wandb project
+        name (str): Name of the wandb run
+    """
+    import wandb
+
+    metrics = read_metrics(path)
+    rows = {}
+    for metric, (steps, values) in metrics.items():
+        for step, value in zip(steps.tolist(), values.tolist()):
+            rows.setdefault(step, {})[metric] = value
+    run = wandb.init(project=project, name=name)
+    for step in sorted(rows):
+        run.log(rows[step], step=step)
+    run.finish()
+
+
+def print_summary(metrics: dict) -> None:
+    print(f"{'metric':<32}{'values':>8}{'last step':>12}{'last value':>14}")
+    for name, (steps, values) in sorted(metrics.items()):
+        print(f"{name:<32}{len(steps):>8}{steps[-1]:>12}{values[-1]:>14.4g}")
+
+
+def plot(metrics: dict, names: list) -> None:
+    """
+    Plots metrics against the training steps, needs matplotlib
+
+    Args:
+        metrics (dict): Metrics, see read_metrics
+        names (list): Names of the plotted metrics
+    """
+    import matplotlib.pyplot as plt
+
+    (figure, axes) = plt.subplots(len(names), 1, sharex=True, squeeze=False)
+    for axis, name in zip(axes[:, 0], names):
+        (steps, values) = metrics[name]
+        axis.plot(steps, values)
+        axis.set_ylabel(name)
+    axes[-1, 0].set_xlabel("steps")
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read a quadai metrics file")
+    parser.add_argument("path")
+    parser.add_argument("--plot", action="append", default=[], metavar="METRIC")
+    parser.add_argument(
+        "--export-wandb", default=None, metavar="PROJECT", help="Upload to wandb"
+    )
+    parser.add_argument("--name", default=None, help="Name of the wandb run")
+    args = parser.parse_args()
+
+    metrics = read_metrics(args.path)
+    print_summary(metrics)
+    if args.plot:
+        plot(metrics, args.plot)
+    if args.export_wandb is not None:
+        export_wandb(args.path, args.export_wandb, args.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a torch-free inference path for the SAC actor
+export_actor extracts the deterministic actor MLP of a sb3 model zip into a .npz
+NumpyActor computes the tanh-squashed mean action with plain NumPy
+
+Export and benchmark against sb3 with:
+python -m quadai.numpy_policy models/sac_model_v2_5000000_steps.zip
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Activations supported in the hidden layers of the actor
+ACTIVATIONS = {
+    "ReLU": lambda x: np.maximum(x, 0, out=x),
+    "Tanh": lambda x: np.tanh(x, out=x),
+}
+
+
+class NumpyActor:
+    """
+    Deterministic SAC actor loaded from a .npz written by export_actor
+
+    predict has the signature of sb3's predict so that it can replace a model
+    (e.g. in player.act_batch)
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path to the .npz
+        """
+        self.path = path
+        with np.load(path) as data:
+            n_layers = int(data["n_layers"])
+            self.weights = [data[f"weight_{i}"] for i in range(n_layers)]
+            self.biases = [data[f"bias_{i}"] for i in range(n_layers)]
+            self.activation = ACTIVATIONS[str(data["activation"])]
+            self.low = data["low"]
+            self.high = data["high"]
+        self.observation_size = self.weights[0].shape[0]
+
+    def forward(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Computes the squashed mean actions, between -1 and 1
+
+        Args:
+            observations (np.ndarray): The (N, observation_size) observations
+
+        Returns:
+            np.ndarray: The (N, action_size) actions
+        """
+        x = observations
+        for weight, bias in zip(self.weights[:-1], self.biases[:-1]):
+            x = self.activation(x @ weight + bias)
+        return np.tanh(x @ self.weights[-1] + self.biases[-1])
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        """
+        Computes the actions of one or several observations
+
+        Args:
+            observation (np.ndarray): One (observation_size,) observation or a batch
+            state: Unused, for compatibility with sb3
+            episode_start: Unused, for compatibility with sb3
+            deterministic (bool): Unused, the actor is always deterministic
+
+        Returns:
+            tuple: The actions rescaled to the action space and None
+        """
+        observation = np.asarray(observation, dtype=np.float32)
+        single = observation.ndim == 1
+        actions = self.forward(observation.reshape(-1, self.observation_size))
+        # Same rescaling as sb3's unscale_action
+        actions = self.low + 0.5 * (actions + 1.0) * (self.high - self.low)
+        if single:
+            return actions[0], None
+        return actions, None
+
+
+# Actors shared by the players, keyed by path
+loaded_actors = {}
+
+
+def load_actor(path: str) -> NumpyActor:
+    """
+    Loads a NumpyActor once and shares it between the players using it
+
+    Args:
+        path (str): Path to the .npz
+
+    Returns:
+        NumpyActor: The loaded actor
+    """
+    if path not in loaded_actors:
+        loaded_actors[path] = NumpyActor(path)
+    return loaded_actors[path]
+
+
+def export_actor(model_path: str, npz_path: str = None) -> str:
+    """
+    Extracts the deterministic actor of a sb3 SAC model (requires torch and sb3)
+
+    Args:
+        model_path (str): Path to the model zip
+        npz_path (str): Output path, defaults to the model path with a .npz extension
+
+    Returns:
+        str: Path of the written .npz
+    """
+    from stable_baselines3 import SAC
+    from torch import nn
+
+    if npz_path is None:
+        npz_path = os.path.splitext(model_path)[0] + ".npz"
+
+    model = SAC.load(model_path, device="cpu")
+    actor = model.actor
+    if actor.use_sde:
+        raise ValueError("gSDE actors are not supported")
+
+    linears = [layer for layer in actor.latent_pi if isinstance(layer, nn.Linear)]
+    activations = {
+        type(layer).__name__
+        for layer in actor.latent_pi
+        if not isinstance(layer, nn.Linear)
+    }
+    if len(activations) > 1 or not activations <= set(ACTIVATIONS):
+        raise ValueError(f"Unsupported activations {activations}")
+    linears.append(actor.mu)
+
+    arrays = {
+        "n_layers": len(linears),
+        "activation": activations.pop() if activations else "ReLU",
+        "low": model.action_space.low.astype(np.float32),
+        "high": model.action_space.high.astype(np.float32),
+    }
+    for i, layer in enumerate(linears):
+        # Stored transposed so that the forward pass is observations @ weight
+        arrays[f"weight_{i}"] = layer.weight.detach().numpy().T.copy()
+        arrays[f"bias_{i}"] = layer.bias.detach().numpy().copy()
+    np.savez(npz_path, **arrays)
+    return npz_path
+
+
+def benchmark(function, n_calls: int) -> float:
+    """
+    Measures the mean latency of a function
+
+    Args:
+        function (callable): Function without arguments
+        n_calls (int): Number of calls
+
+    Returns:
+        float: Mean latency in microseconds
+    """
+    function()
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        function()
+    return (time.perf_counter() - start) / n_calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a SAC actor to NumPy and benchmark it against sb3"
+    )
+    parser.add_argument("model", help="Path to the sb3 SAC model zip")
+    parser.add_argument("--output", default=None, help="Path of the .npz")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    from stable_baselines3 import SAC
+
+    npz_path = export_actor(args.model, args.output)
+    print(f"Exported {npz_path} ({os.path.getsize(npz_path) / 1024:.0f} KiB)")
+
+    model = SAC.load(args.model, device="cpu")
+    actor = NumpyActor(npz_path)
+
+    # Random observations of the same magnitude as the game ones
+    rng = np.random.default_rng(0)
+    observations = rng.normal(0, 1, (10000, actor.observation_size)).astype(np.float32)
+    (expected, _) = model.predict(observations, deterministic=True)
+    (actions, _) = actor.predict(observations)
+    print(f"Max absolute difference with sb3: {np.abs(actions - expected).max():.2e}")
+
+    observation = observations[0]
+    batch = observations[:32]
+    print(f"{'latency (us)':<20}{'sb3':>10}{'numpy':>10}")
+    for label, obs in (("single", observation), ("batch of 32", batch)):
+        torch_latency = benchmark(
+            lambda: model.predict(obs, deterministic=True), args.calls
+        )
+        numpy_latency = benchmark(lambda: actor.predict(obs), args.calls)
+        print(f"{label:<20}{torch_latency:>10.1f}{numpy_latency:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the rigidbody physics of the quadcopter, shared by the games and the environments
+The states of N drones are stored in a (N, 6) array, one row per drone:
+(x_position, y_position, angle, x_speed, y_speed, angular_speed)
+"""
+
+from math import pi
+
+import numpy as np
+
+# Columns of the state array
+X, Y, ANGLE, X_SPEED, Y_SPEED, ANGULAR_SPEED = range(6)
+POSITIONS = slice(X, ANGLE + 1)
+SPEEDS = slice(X_SPEED, ANGULAR_SPEED + 1)
+
+# Physics constants
+GRAVITY = 0.08
+MASS = 1
+# Length from center of mass to propeller
+ARM = 25
+
+# Attributes of a drone object matching the columns of the state array
+STATE_ATTRIBUTES = (
+    "x_position",
+    "y_position",
+    "angle",
+    "x_speed",
+    "y_speed",
+    "angular_speed",
+)
+
+
+def new_state(n_drones: int, x: float = 400, y: float = 400) -> np.ndarray:
+    """
+    Creates the state of drones at rest
+
+    Args:
+        n_drones (int): Number of drones
+        x (float): Initial x position
+        y (float): Initial y position
+
+    Returns:
+        np.ndarray: The (n_drones, 6) state array
+    """
+    state = np.zeros((n_drones, 6))
+    state[:, X] = x
+    state[:, Y] = y
+    return state
+
+
+def get_states(drones: list) -> np.ndarray:
+    """
+    Gathers the state of drone objects (e.g. players) into a state array
+
+    Args:
+        drones (list): Objects with x_position, y_position, angle, x_speed, y_speed, angular_speed
+
+    Returns:
+        np.ndarray: The (len(drones), 6) state array
+    """
+    return np.array(
+        [[getattr(drone, name) for name in STATE_ATTRIBUTES] for drone in drones],
+        dtype=np.float64,
+    ).reshape(len(drones), 6)
+
+
+def set_states(drones: list, state: np.ndarray) -> None:
+    """
+    Scatters a state array back into drone objects
+
+    Args:
+        drones (list): Objects with x_position, y_position, angle, x_speed, y_speed, angular_speed
+        state (np.ndarray): The (len(drones), 6) state array
+    """
+    for drone, row in zip(drones, state.tolist()):
+        for name, value in zip(STATE_ATTRIBUTES, row):
+            setattr(drone, name, value)
+
+
+def accelerations(
+    state: np.ndarray,
+    thruster_left,
+    thruster_right,
+    gravity: float = GRAVITY,
+    mass: float = MASS,
+    arm: float = ARM,
+):
+    """
+    Calculates the accelerations of the drones with Newton's laws of motion
+
+    Args:
+        state (np.ndarray): The (N, 6) state array
+        thruster_left: Left propeller thrusts, scalar or (N,) array
+        thruster_right: Right propeller thrusts, scalar or (N,) array
+        gravity (float): Gravity acceleration
+        mass (float): Mass of the drones
+        arm (float): Length from center of mass to propeller
+
+    Returns:
+        tuple: The x, y and angular accelerations, (N,) arrays
+    """
+    angle = state[:, ANGLE] * pi / 180
+    x_acceleration = -(thruster_left + thruster_right) * np.sin(angle) / mass
+    y_acceleration = gravity + (
+        -(thruster_left + thruster_right) * np.cos(angle) / mass
+    )
+    angular_acceleration = arm * (thruster_right - thruster_left) / mass
+    return x_acceleration, y_acceleration, angular_acceleration
+
+
+def derivatives(
+    state: np.ndarray,
+    thruster_left,
+    thruster_right,
+    gravity: float = GRAVITY,
+    mass: float = MASS,
+    arm: float = ARM,
+) -> np.ndarray:
+    """
+    Calculates the time derivative of the state, used by the Runge-Kutta integrators
+
+    Args:
+        state (np.ndarray): The (N, 6) state array
+        thruster_left: Left propeller thrusts, scalar or (N,) array
+        thruster_right: Right propeller thrusts, scalar or (N,) array
+        gravity (float): Gravity acceleration
+        mass (float): Mass of the drones
+        arm (float): Length from center of mass to propeller
+
+    Returns:
+        np.ndarray: The (N, 6) derivative, speeds then accelerations
+    """
+    derivative = np.empty_like(state)
+    derivative[:, POSITIONS] = state[:, SPEEDS]
+    (
+        derivative[:, X_SPEED],
+        derivative[:, Y_SPEED],
+        derivative[:, ANGULAR_SPEED],
+    ) = accelerations(state, thruster_left, thruster_right, gravity, mass, arm)
+    return derivative
+
+
+def update_speeds(
+    state: np.ndarray,
+    thruster_left,
+    thruster_right,
+    gravity: float = GRAVITY,
+    mass: float = MASS,
+    arm: float = ARM,
+    dt: float = 1.0,
+):
+    """
+    Applies the propeller thrusts and gravity to the speeds in place
+
+    Args:
+        state (np.ndarray): The (N, 6) state array
+        thruster_left: Left propeller thrusts, scalar or (N,) array
+        thruster_right: Right propeller thrusts, scalar or (N,) array
+        gravity (float): Gravity acceleration
+        mass (float): Mass of the drones
+        arm (float): Length from center of mass to propeller
+        dt (float): Duration of the step in frames
+
+    Returns:
+        tuple: The x, y and angular accelerations, (N,) arrays
+    """
+    (x_acceleration, y_acceleration, angular_acceleration) = accelerations(
+        state, thruster_left, thruster_right, gravity, mass, arm
+    )
+
+    # Calculate speed
+    state[:, X_SPEED] += x_acceleration * dt
+    state[:, Y_SPEED] += y_acceleration * dt
+    state[:, ANGULAR_SPEED] += angular_acceleration * dt
+    return x_acceleration, y_acceleration, angular_acceleration
+
+
+def update_positions(state: np.ndarray, dt: float = 1.0) -> None:
+    """
+    Moves the drones according to their speeds in place
+
+    Args:
+        state (np.ndarray): The (N, 6) state array
+        dt (float): Duration of the step in frames
+    """
+    state[:, POSITIONS] += state[:, SPEEDS] * dt
+
+
+# Integrators advance the state by dt frames in place and return the
+# accelerations at the start of the step, the thrusts are held during the step
+
+
+def euler_step(state, thruster_left, thruster_right, gravity, mass, arm, dt):
+    """
+    Semi-implicit Euler, the speeds are updated first and then move the drones
+    With dt=1 this is the original physics of the game
+    """
+    accelerations = update_speeds(
+        state, thruster_left, thruster_right, gravity, mass, arm, dt
+    )
+    update_positions(state, dt)
+    return accelerations
+
+
+def rk2_step(state, thruster_left, thruster_right, gravity, mass, arm, dt):
+    """
+    Second order Runge-Kutta (midpoint method)
+    """
+    forces = (thruster_left, thruster_right, gravity, mass, arm)
+    k1 = derivatives(state, *forces)
+    k2 = derivatives(state + dt / 2 * k1, *forces)
+    state += dt * k2
+    return tuple(k1[:, SPEEDS].T)
+
+
+def rk4_step(state, thruster_left, thruster_right, gravity, mass, arm, dt):
+    """
+    Classic fourth order Runge-Kutta
+    """
+    forces = (thruster_left, thruster_right, gravity, mass, arm)
+    k1 = derivatives(state, *forces)
+    k2 = derivatives(state + dt / 2 * k1, *forces)
+    k3 = derivatives(state + dt / 2 * k2, *forces)
+    k4 = derivatives(state + dt * k3, *forces)
+    state += dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return tuple(k1[:, SPEEDS].T)
+
+
+INTEGRATORS = {"euler": euler_step, "rk2": rk2_step, "rk4": rk4_step}
+
+
+def check_integrator(integrator: str) -> None:
+    """
+    Raises:
+        ValueError: If the integrator is not in INTEGRATORS
+    """
+    if integrator not in INTEGRATORS:
+        raise ValueError(
+            f"Unknown integrator {integrator!r}, choose from {', '.join(INTEGRATORS)}"
+        )
+
+
+def step(
+    state: np.ndarray,
+    thruster_left,
+    thruster_right,
+    gravity: float = GRAVITY,
+    mass: float = MASS,
+    arm: float = ARM,
+    dt: float = 1.0,
+    integrator: str = "euler",
+):
+    """
+    Advances the drones by dt frames in place
+
+    Args:
+        state (np.ndarray): The (N, 6) state array
+        thruster_left: Left propeller thrusts, scalar or (N,) array
+        thruster_right: Right propeller thrusts, scalar or (N,) array
+        gravity (float): Gravity acceleration
+        mass (float): Mass of the drones
+        arm (float): Length from center of mass to propeller
+        dt (float): Duration of the step in frames (1 frame is 1/60 s)
+        integrator (str): "euler" (semi-implicit), "rk2" or "rk4"
+
+    Returns:
+        tuple: The x, y and angular accelerations at the start of the step, (N,) arrays
+    """
+    check_integrator(integrator)
+    return INTEGRATORS[integrator](
+        state, thruster_left, thruster_right, gravity, mass, arm, dt
+    )
@@ -0,0 +1,273 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the accuracy harness of the physics integrators
+Random thrust sequences are simulated with every (integrator, dt) configuration
+and compared to a fine dt RK4 reference at the end of each action,
+along with the cost of simulating an action.
+
+Compare the integrators with:
+python -m quadai.physics_accuracy --dts 2.5 1 0.5 --output accuracy.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from quadai import physics
+from quadai.physics import X, Y, ANGLE
+
+# Thrusts of droneEnv (see SAC/env_SAC.py)
+THRUSTER_MEAN = 0.04
+THRUSTER_AMPLITUDE = 0.04
+DIFF_AMPLITUDE = 0.003
+
+
+def random_thrusts(n_actions: int, n_drones: int, seed: int = 0) -> tuple:
+    """
+    Draws uniform droneEnv actions and converts them to propeller thrusts
+
+    Args:
+        n_actions (int): Number of actions per drone
+        n_drones (int): Number of drones
+        seed (int): Seed of the actions
+
+    Returns:
+        tuple: Left and right thrusts, (n_actions, n_drones) arrays
+    """
+    actions = np.random.default_rng(seed).uniform(-1, 1, (n_actions, n_drones, 2))
+    thruster_left = (
+        THRUSTER_MEAN
+        + actions[..., 0] * THRUSTER_AMPLITUDE
+        + actions[..., 1] * DIFF_AMPLITUDE
+    )
+    thruster_right = (
+        THRUSTER_MEAN
+        + actions[..., 0] * THRUSTER_AMPLITUDE
+        - actions[..., 1] * DIFF_AMPLITUDE
+    )
+    return thruster_left, thruster_right
+
+
+def substeps(action_frames: float, dt: float) -> int:
+    """
+    Args:
+        action_frames (float): Duration of an action in frames
+        dt (float): Duration of a substep in frames
+
+    Returns:
+        int: Number of substeps per action
+
+    Raises:
+        ValueError: If dt does not divide the duration of an action
+    """
+    n_substeps = round(action_frames / dt)
+    if n_substeps < 1 or abs(n_substeps * dt - action_frames) > 1e-9:
+        raise ValueError(f"dt={dt} does not divide an action of {action_frames} frames")
+    return n_substeps
+
+
+def simulate(
+    thrusts: tuple, integrator: str, dt: float, action_frames: float
+) -> np.ndarray:
+    """
+    Simulates drones starting at rest with one thrust per drone and action
+
+    Args:
+        thrusts (tuple): Left and right thrusts, (n_actions, n_drones) arrays
+        integrator (str): Name of the integrator, see physics.INTEGRATORS
+        dt (float): Duration of a substep in frames
+        action_frames (float): Duration of an action in frames
+
+    Returns:
+        np.ndarray: The (n_actions, n_drones, 6) states at the end of each action
+    """
+    (thruster_left, thruster_right) = thrusts
+    (n_actions, n_drones) = thruster_left.shape
+    n_substeps = substeps(action_frames, dt)
+    state = physics.new_state(n_drones)
+    trajectory = np.empty((n_actions, n_drones, 6))
+    for action in range(n_actions):
+        for _ in range(n_substeps):
+            physics.step(
+                state,
+                thruster_left[action],
+                thruster_right[action],
+                dt=dt,
+                integrator=integrator,
+            )
+        trajectory[action] = state
+    return trajectory
+
+
+def errors(trajectory: np.ndarray, reference: np.ndarray) -> dict:
+    """
+    Args:
+        trajectory (np.ndarray): States at the end of each action
+        reference (np.ndarray): Reference states at the same times
+
+    Returns:
+        dict: Position errors in pixels and angle errors in degrees
+    """
+    position_error = np.hypot(
+        trajectory[..., X] - reference[..., X], trajectory[..., Y] - reference[..., Y]
+    )
+    angle_error = np.abs(trajectory[..., ANGLE] - reference[..., ANGLE])
+    return {
+        "position_max_px": float(position_error.max()),
+        "position_rms_px": float(np.sqrt(np.mean(position_error**2))),
+        "final_position_rms_px": float(np.sqrt(np.mean(position_error[-1] ** 2))),
+        "angle_max_deg": float(angle_error.max()),
+    }
+
+
+def action_cost(
+    integrator: str, dt: float, action_frames: float, n_drones: int, repeats: int = 20
+) -> float:
+    """
+    Times the physics of one action for a batch of drones
+
+    Args:
+        integrator (str): Name of the integrator
+        dt (float): Duration of a substep in frames
+        action_frames (float): Duration of an action in frames
+        n_drones (int): Number of drones in the batch
+        repeats (int): Number of timed actions, the best one is kept
+
+    Returns:
+        float: Time of one action in microseconds
+    """
+    thrusts = random_thrusts(repeats, n_drones, seed=1)
+    best = float("inf")
+    for action in range(repeats):
+        start = time.perf_counter()
+        simulate(
+            (thrusts[0][action : action + 1], thrusts[1][action : action + 1]),
+            integrator,
+            dt,
+            action_frames,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def run(
+    integrators: list,
+    dts: list,
+    action_frames: float = 5,
+    n_actions: int = 120,
+    n_drones: int = 256,
+    reference_dt: float = 1 / 64,
+    seed: int = 0,
+) -> dict:
+    """
+    Compares every (integrator, dt) configuration to the reference
+
+    Args:
+        integrators (list): Names of the integrators
+        dts (list): Substep durations in frames
+        action_frames (float): Duration of an action in frames
+        n_actions (int): Number of actions per trajectory
+        n_drones (int): Number of trajectories
+        reference_dt (float): Substep duration of the RK4 reference
+        seed (int): Seed of the actions
+
+    Returns:
+        dict: Settings of the run and results of each configuration
+    """
+    thrusts = random_thrusts(n_actions, n_drones, seed)
+    reference = simulate(thrusts, "rk4", reference_dt, action_frames)
+    results = []
+    print(
+        f"{'integrator':<12}{'dt':>8}{'substeps':>10}{'max px':>12}{'rms px':>12}"
+        f"{'max deg':>10}{'us/action':>12}"
+    )
+    for integrator in integrators:
+        for dt in dts:
+            result = {
+                "integrator": integrator,
+                "dt": dt,
+                "action_repeat": substeps(action_frames, dt),
+            }
+            result.update(
+                errors(simulate(thrusts, integrator, dt, action_frames), reference)
+            )
+            result["us_per_action"] = action_cost(
+                integrator, dt, action_frames, n_drones
+            )
+            results.append(result)
+            print(
+                f"{integrator:<12}{dt:>8g}{result['action_repeat']:>10}"
+                f"{result['position_max_px']:>12.4g}{result['position_rms_px']:>12.4g}"
+                f"{result['angle_max_deg']:>10.3g}{result['us_per_action']:>12.1f}"
+            )
+    return {
+        "settings": {
+            "action_frames": action_frames,
+            "n_actions": n_actions,
+            "n_drones": n_drones,
+            "reference_dt": reference_dt,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the physics integrators to a fine dt reference"
+    )
+    parser.add_argument(
+        "--integrators",
+        nargs="+",
+        choices=list(physics.INTEGRATORS.keys()),
+        default=list(physics.INTEGRATORS.keys()),
+    )
+    parser.add_argument(
+        "--dts",
+        nargs="+",
+        type=float,
+        default=[5, 2.5, 1, 0.5, 0.25],
+        help="Substep durations in frames, they must divide --action-frames",
+    )
+    parser.add_argument(
+        "--action-frames",
+        type=float,
+        default=5,
+        help="Duration of an action in frames (droneEnv: action_repeat * dt = 5)",
+    )
+    parser.add_argument("--actions", type=int, default=120, help="Actions per drone")
+    parser.add_argument("--drones", type=int, default=256)
+    parser.add_argument("--reference-dt", type=float, default=1 / 64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results")
+    args = parser.parse_args()
+
+    for dt in args.dts + [args.reference_dt]:
+        try:
+            substeps(args.action_frames, dt)
+        except ValueError as error:
+            parser.error(str(error))
+
+    results = run(
+        args.integrators,
+        args.dts,
+        args.action_frames,
+        args.actions,
+        args.drones,
+        args.reference_dt,
+        args.seed,
+    )
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
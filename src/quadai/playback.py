@@ -0,0 +1,179 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the playback of the recorded balloon and snowglobe matches (see recording.py)
+Recorded states are drawn with the renderers of the games, the AI players
+are not loaded and their actions are not computed again.
+
+Controls: SPACE pauses, LEFT and RIGHT seek 5 seconds, HOME restarts
+"""
+
+import numpy as np
+import pygame
+from pygame.locals import *
+
+from quadai import physics
+from quadai.balloon import BalloonRenderer
+from quadai.recording import Recording
+from quadai.snowglobe import Snowglobe
+from quadai.timestep import FixedTimestep
+
+
+class ReplayPlayer:
+    """
+    A recorded player, with the attributes the balloon renderer draws
+    """
+
+    def __init__(self, name: str, alpha: int):
+        self.name = name
+        self.alpha = alpha
+        (self.x_position, self.y_position, self.angle) = (400, 400, 0)
+        (self.x_speed, self.y_speed, self.angular_speed) = (0, 0, 0)
+        self.target_counter = 0
+        self.dead = False
+        self.respawn_timer = 0
+
+
+class ReplayMatch:
+    """
+    A recorded balloon match, seen by BalloonRenderer as a BalloonMatch
+    """
+
+    def __init__(self, recording: Recording):
+        """
+        Args:
+            recording (Recording): Recording of a balloon match
+        """
+        self.recording = recording
+        metadata = recording.metadata
+        self.players = [
+            ReplayPlayer(player["name"], player["alpha"])
+            for player in metadata["players"]
+        ]
+        self.time_limit = metadata["time_limit"]
+        self.seek(0)
+
+    def seek(self, index: int) -> None:
+        """
+        Moves the match to a recorded frame
+
+        Args:
+            index (int): Index of the frame
+        """
+        frame = self.recording[index]
+        self.index = index
+        self.step_count = int(frame["step"])
+        self.time = float(frame["time"])
+        self.targets = [tuple(target) for target in frame["target"].tolist()]
+        physics.set_states(self.players, frame["state"])
+        for player, score, dead, respawn_timer in zip(
+            self.players,
+            frame["score"].tolist(),
+            frame["dead"].tolist(),
+            frame["respawn_timer"].tolist(),
+        ):
+            (player.target_counter, player.dead) = (score, dead)
+            player.respawn_timer = respawn_timer
+
+    def poses(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (n_players, 3) x, y and angle of each player, NaN for dead players
+        """
+        frame = self.recording[self.index]
+        poses = frame["state"][:, : physics.ANGLE + 1].astype(np.float64)
+        poses[frame["dead"]] = np.nan
+        return poses
+
+    def target_of(self, player) -> tuple:
+        return self.targets[self.players.index(player)]
+
+
+def show_frame(recording: Recording, index: int, game) -> None:
+    """
+    Moves a snowglobe game to a recorded frame
+
+    Args:
+        recording (Recording): Recording of a snowglobe game
+        index (int): Index of the frame
+        game (Snowglobe): The game drawing the frame
+    """
+    frame = recording[index]
+    game.step_count = int(frame["step"])
+    physics.set_states([game.player], frame["state"])
+    if recording.metadata["n_particles"] > 0:
+        snow = game.snow
+        snow.position = frame["particle_position"].T.astype(np.float64)
+        radius = frame["particle_radius"].astype(np.int64)
+        if not np.array_equal(radius, snow.radius):
+            # The particles were reset during the game
+            (snow.radius, snow.sprites) = (radius, None)
+
+
+def play(path: str, speed: float = 1.0) -> None:
+    """
+    Plays a recording in a window until its end or until the window is closed
+
+    Args:
+        path (str): Path of the recording
+        speed (float): Speed of the playback relative to real time
+    """
+    recording = Recording(path)
+    metadata = recording.metadata
+    if len(recording) == 0:
+        print(f"{path} has no frames")
+        return
+    fps = metadata["fps"]
+
+    pygame.init()
+    if metadata["game"] == "balloon":
+        screen = pygame.display.set_mode((800, 800))
+        match = ReplayMatch(recording)
+        renderer = BalloonRenderer(screen)
+    else:
+        (width, height) = metadata["size"]
+        screen = pygame.display.set_mode((width, height))
+        pygame.display.set_caption("Schneekugel")
+        game = Snowglobe(metadata["n_particles"], width, height)
+    FramePerSec = pygame.time.Clock()
+
+    timestep = FixedTimestep(step_rate=fps, speed=speed, render_rate=60)
+    (index, paused) = (0, False)
+    last = len(recording) - 1
+    while True:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                return
+            if event.type == KEYDOWN:
+                if event.key == K_SPACE:
+                    paused = not paused
+                elif event.key == K_LEFT:
+                    index = max(index - 5 * fps, 0)
+                elif event.key == K_RIGHT:
+                    index = min(index + 5 * fps, last)
+                elif event.key == K_HOME:
+                    index = 0
+
+        steps = timestep.advance()
+        if not paused:
+            if index == last:
+                break
+            index = min(index + steps, last)
+
+        if timestep.should_render():
+            if metadata["game"] == "balloon":
+                previous = None
+                if index > 0 and not paused:
+                    match.seek(index - 1)
+                    previous = match.poses()
+                match.seek(index)
+                renderer.draw(match, previous, timestep.alpha)
+                renderer.update_display()
+            else:
+                show_frame(recording, index, game)
+                game.draw(screen)
+                game.update_display()
+        FramePerSec.tick(60)
@@ -8,13 +8,15 @@ This is where the players for the main game are defined
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pygame
 from pygame.locals import *
 
-from stable_baselines3 import SAC
-
-from quadai.PID.controller_PID import PID
+from quadai import startup
+from quadai.numpy_policy import load_actor
+from quadai.PID.controller_PID import PID, PIDBank
 
 
 class Player:
@@ -92,6 +94,66 @@ class PIDPlayer(Player):
         return thruster_left, thruster_right
 
 
+class PIDSwarm:
+    """
+    Batched PIDPlayer controlling a whole array of drones
+    Drone i gets the same thrusts as a PIDPlayer given the same observations
+    The gains of each drone can be changed through the banks (e.g. self.xPID.kp[i])
+    """
+
+    def __init__(self, n_drones):
+        self.n_drones = n_drones
+        self.thruster_mean = 0.04
+        self.thruster_amplitude = 0.04
+        self.diff_amplitude = 0.003
+
+        self.dt = 1 / 60
+        self.xPID = PIDBank(n_drones, 0.2, 0, 0.2, 25, -25)
+        self.aPID = PIDBank(n_drones, 0.02, 0, 0.01, 1, -1)
+
+        self.yPID = PIDBank(n_drones, 2.5, 0, 1.5, 100, -100)
+        self.ydPID = PIDBank(n_drones, 1, 0, 0, 1, -1)
+
+    def reset(self, indices=slice(None)):
+        """
+        Clears the controllers of the selected drones (e.g. after a respawn)
+
+        Args:
+            indices: Indices of the drones, all of them by default
+        """
+        for bank in (self.xPID, self.aPID, self.yPID, self.ydPID):
+            bank.reset(indices)
+
+    def act(self, obs):
+        """
+        Computes the thrusts of every drone
+
+        Args:
+            obs (np.ndarray): The (n_drones, 6) observations, one row per drone:
+                (error_x, x_speed, error_y, y_speed, angle, angular_speed)
+
+        Returns:
+            tuple: Left and right propeller thrusts, (n_drones,) arrays
+        """
+        error_x, xd, error_y, yd, a, ad = np.asarray(obs, dtype=np.float64).T
+
+        ac = self.xPID.compute(-error_x, self.dt)
+
+        error_a = ac - a
+        action1 = self.aPID.compute(-error_a, self.dt)
+
+        ydc = self.yPID.compute(error_y, self.dt)
+        error_yd = ydc - yd
+        action0 = self.ydPID.compute(-error_yd, self.dt)
+
+        thruster_left = self.thruster_mean + action0 * self.thruster_amplitude
+        thruster_right = self.thruster_mean + action0 * self.thruster_amplitude
+        thruster_left += action1 * self.diff_amplitude
+        thruster_right -= action1 * self.diff_amplitude
+
+        return thruster_left, thruster_right
+
+
 class HumanPlayer(Player):
     def __init__(self):
         self.name = "Human"
@@ -116,20 +178,36 @@ class HumanPlayer(Player):
 
 
 class SACPlayer(Player):
-    def __init__(self):
+    def __init__(self, model_path="models/sac_model_v2_5000000_steps.zip"):
         self.name = "SAC"
         self.alpha = 50
         self.thruster_amplitude = 0.04
         self.diff_amplitude = 0.003
-        model_path = "models/sac_model_v2_5000000_steps.zip"
         model_path = os.path.join(os.path.dirname(__file__), model_path)
         self.path = model_path
         super().__init__()
 
-        self.action_value = SAC.load(self.path)
+        # The model loads in the background, act waits for it if needed
+        self.model = load_model_async(self.path)
+
+    @property
+    def action_value(self):
+        return self.model.result()
 
     def act(self, obs):
         action, _ = self.action_value.predict(obs)
+        return self.action_to_thrusts(action)
+
+    def action_to_thrusts(self, action):
+        """
+        Converts an action of the model to propeller thrusts
+
+        Args:
+            action (np.ndarray): Thrust amplitude and thrust difference between -1 and 1
+
+        Returns:
+            tuple: Left and right propeller thrusts
+        """
         (action0, action1) = (action[0], action[1])
 
         thruster_left = self.thruster_mean
@@ -140,3 +218,102 @@ class SACPlayer(Player):
         thruster_left += action1 * self.diff_amplitude
         thruster_right -= action1 * self.diff_amplitude
         return thruster_left, thruster_right
+
+
+class NumpySACPlayer(SACPlayer):
+    """
+    SACPlayer running the deterministic actor with NumPy instead of torch
+    The .npz is written by quadai.numpy_policy.export_actor
+    """
+
+    def __init__(self, model_path="models/sac_model_v2_5000000_steps.npz"):
+        self.name = "SAC"
+        self.alpha = 50
+        self.thruster_amplitude = 0.04
+        self.diff_amplitude = 0.003
+        model_path = os.path.join(os.path.dirname(__file__), model_path)
+        self.path = model_path
+        Player.__init__(self)
+
+        self.model = load_actor(self.path)
+
+    @property
+    def action_value(self):
+        return self.model
+
+
+# Models shared by the players, keyed by path
+loaded_models = {}
+model_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model_loader")
+
+
+def read_model(path):
+    """
+    Imports stable_baselines3 (and torch) on first use and loads a SAC model
+
+    Args:
+        path (str): Path to the model zip
+
+    Returns:
+        SAC: The loaded model
+    """
+    from stable_baselines3 import SAC
+
+    startup.mark("sb3 imported")
+    model = SAC.load(path)
+    startup.mark("model loaded")
+    return model
+
+
+def load_model_async(path):
+    """
+    Starts loading a SAC model in a background thread, once per path
+
+    Args:
+        path (str): Path to the model zip
+
+    Returns:
+        Future: The model shared by the players using it
+    """
+    if path not in loaded_models:
+        loaded_models[path] = model_loader.submit(read_model, path)
+    return loaded_models[path]
+
+
+def load_model(path):
+    """
+    Loads a SAC model once and shares it between the players using it
+
+    Args:
+        path (str): Path to the model zip
+
+    Returns:
+        SAC: The loaded model
+    """
+    return load_model_async(path).result()
+
+
+def act_batch(players, observations):
+    """
+    Computes the thrusts of model-driven players with one forward pass per model
+
+    Args:
+        players (list): Players with an action_value model (e.g. SACPlayer)
+        observations (list): Observation of each player
+
+    Returns:
+        list: Left and right propeller thrusts of each player
+    """
+    thrusts = [None] * len(players)
+    # Group the players by model
+    groups = {}
+    for index, player in enumerate(players):
+        groups.setdefault(id(player.action_value), []).append(index)
+
+    for indices in groups.values():
+        model = players[indices[0]].action_value
+        batch = np.stack([observations[index] for index in indices])
+        actions, _ = model.predict(batch)
+        for index, action in zip(indices, actions):
+            thrusts[index] = players[index].action_to_thrusts(action)
+    return thrusts
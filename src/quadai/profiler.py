@@ -0,0 +1,192 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a per-frame profiler for the game loops
+Sections of a frame are timed with lap(name), samples (e.g. the act latency
+of a player) with record(name, seconds), the last frames are kept in ring buffers.
+When the profiler is disabled every call returns immediately.
+"""
+
+import csv
+import json
+import time
+
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """
+    Per-frame timings of the sections of a game loop
+
+    Every key has a ring buffer of the last capacity frames in seconds,
+    all the buffers are written at the end of each frame so that they stay aligned.
+    """
+
+    def __init__(self, enabled: bool = False, capacity: int = 600):
+        """
+        Args:
+            enabled (bool): Record the timings, calls return immediately if False
+            capacity (int): Number of frames kept in the ring buffers
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        self.show_overlay = False
+
+        # Key to (capacity,) ring buffer, NaN before the key was first recorded
+        self.buffers = {}
+        self.frame_count = 0
+        # Timings of the current frame
+        self.current = {}
+        self.frame_start = time.perf_counter()
+        self.last = self.frame_start
+
+        self.overlay = None
+        self.overlay_font = None
+
+    def start_frame(self) -> None:
+        """
+        Starts timing a frame, the next lap measures from here
+        """
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        self.current = {}
+
+    def lap(self, name: str) -> None:
+        """
+        Adds the time since the previous lap (or the start of the frame) to a section
+        A section can be timed several times per frame, the times are summed
+
+        Args:
+            name (str): Name of the section
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Adds a duration measured elsewhere (e.g. the act latency of a player)
+
+        Args:
+            name (str): Name of the sample
+            seconds (float): Duration
+        """
+        if not self.enabled:
+            return
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def end_frame(self) -> None:
+        """
+        Writes the timings of the frame in the ring buffers
+        """
+        if not self.enabled:
+            return
+        self.current["frame"] = time.perf_counter() - self.frame_start
+        position = self.frame_count % self.capacity
+        for name, buffer in self.buffers.items():
+            buffer[position] = self.current.get(name, 0.0)
+        for name in self.current.keys() - self.buffers.keys():
+            buffer = np.full(self.capacity, np.nan)
+            buffer[position] = self.current[name]
+            self.buffers[name] = buffer
+        self.frame_count += 1
+
+    def frames(self) -> dict:
+        """
+        Returns:
+            dict: Timings of the buffered frames per key, oldest first, in seconds
+        """
+        n_frames = min(self.frame_count, self.capacity)
+        start = self.frame_count % self.capacity if self.frame_count > n_frames else 0
+        order = (np.arange(n_frames) + start) % self.capacity
+        return {name: buffer[order] for name, buffer in self.buffers.items()}
+
+    def percentiles(self) -> dict:
+        """
+        Returns:
+            dict: (p50, p99) in milliseconds of each key over the buffered frames
+        """
+        summary = {}
+        for name, timings in self.frames().items():
+            timings = timings[~np.isnan(timings)]
+            if len(timings) > 0:
+                (p50, p99) = np.percentile(timings, (50, 99)) * 1000
+                summary[name] = (float(p50), float(p99))
+        return summary
+
+    def toggle_overlay(self) -> None:
+        """
+        Shows or hides the overlay, showing it enables the profiler
+        """
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.enabled = True
+            self.start_frame()
+
+    def draw_overlay(
+        self, screen: pygame.Surface, refresh_every: int = 30
+    ) -> pygame.Rect:
+        """
+        Draws the p50/p99 table in the bottom left corner if the overlay is shown
+        The table is rendered again every refresh_every frames
+
+        Args:
+            screen (pygame.Surface): Surface to draw on
+            refresh_every (int): Frames between two renders of the table
+
+        Returns:
+            pygame.Rect: The area drawn, None if the overlay is hidden
+        """
+        if not self.show_overlay:
+            return None
+        if self.overlay is None or self.frame_count % refresh_every == 0:
+            if self.overlay_font is None:
+                self.overlay_font = pygame.font.Font(None, 18)
+            rows = [("ms", "p50", "p99")]
+            for name, (p50, p99) in sorted(self.percentiles().items()):
+                rows.append((name, f"{p50:.2f}", f"{p99:.2f}"))
+            line_height = self.overlay_font.get_linesize()
+            self.overlay = pygame.Surface((260, line_height * len(rows) + 8))
+            self.overlay.set_alpha(180)
+            for index, row in enumerate(rows):
+                for cell, x in zip(row, (4, 170, 215)):
+                    text = self.overlay_font.render(cell, True, (255, 255, 255))
+                    self.overlay.blit(text, (x, 4 + index * line_height))
+        return screen.blit(
+            self.overlay, (0, screen.get_height() - self.overlay.get_height())
+        )
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the buffered frames, as a CSV (one row per frame) or a JSON
+        (timings and percentiles per key) depending on the extension
+
+        Args:
+            path (str): Path of the .csv or .json trace
+        """
+        frames = self.frames()
+        names = sorted(frames)
+        if path.endswith(".json"):
+            trace = {
+                "frames": {
+                    name: [None if np.isnan(t) else t * 1000 for t in frames[name]]
+                    for name in names
+                },
+                "percentiles_ms": self.percentiles(),
+            }
+            with open(path, "w") as file:
+                json.dump(trace, file, indent=4)
+        else:
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow([name + " (ms)" for name in names])
+                if names:
+                    rows = np.column_stack([frames[name] for name in names]) * 1000
+                    writer.writerows(rows.tolist())
@@ -0,0 +1,290 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the binary recording format of the balloon and snowglobe matches
+A recording is a JSON header followed by one fixed-size record per simulation step,
+a NumPy structured array holding the drone states, the thrusts, the targets
+and optionally the snow particles.
+Records are appended in chunks by a background thread and read back with
+a memory map, so any frame is reached in O(1) and files larger than RAM stream.
+
+Example:
+from quadai.recording import Recording
+recording = Recording("match.qrec")
+print(recording.metadata["players"], len(recording), recording[-1]["score"])
+"""
+
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from quadai import physics
+
+MAGIC = b"QUADREC1"
+VERSION = 1
+# Records start at a multiple of this offset
+ALIGNMENT = 64
+
+
+def frame_dtype(n_players: int, n_particles: int = 0) -> np.dtype:
+    """
+    Layout of the record of one simulation step
+
+    Args:
+        n_players (int): Number of drones
+        n_particles (int): Number of recorded snow particles, 0 for none
+
+    Returns:
+        np.dtype: The structured dtype of a record
+    """
+    fields = [
+        ("step", "<u4"),
+        ("time", "<f8"),
+        # Float64 keeps the pixels of the replay identical to the game
+        ("state", "<f8", (n_players, 6)),
+        ("thrust", "<f4", (n_players, 2)),
+        ("target_index", "<i4", (n_players,)),
+        ("target", "<f4", (n_players, 2)),
+        ("score", "<u4", (n_players,)),
+        ("dead", "?", (n_players,)),
+        ("respawn_timer", "<f4", (n_players,)),
+    ]
+    if n_particles > 0:
+        fields += [
+            ("particle_position", "<i2", (n_particles, 2)),
+            ("particle_radius", "u1", (n_particles,)),
+        ]
+    return np.dtype(fields)
+
+
+class Recorder:
+    """
+    Appends records to a recording without blocking the game loop
+
+    Records are copied in a chunk buffer, full chunks are written to the file
+    by a background thread.
+    """
+
+    def __init__(self, path: str, metadata: dict, chunk_frames: int = 512):
+        """
+        Args:
+            path (str): Path of the recording, overwritten if it exists
+            metadata (dict): JSON header, must hold n_players and n_particles
+            chunk_frames (int): Records per chunk written at once
+        """
+        self.path = path
+        self.dtype = frame_dtype(metadata["n_players"], metadata["n_particles"])
+        self.metadata = dict(metadata, version=VERSION, itemsize=self.dtype.itemsize)
+        self.frame_count = 0
+
+        header = json.dumps(self.metadata).encode()
+        size = len(MAGIC) + 4 + len(header)
+        header += b" " * (-size % ALIGNMENT)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + len(header).to_bytes(4, "little") + header)
+
+        # Chunks go back and forth between the game loop and the writer thread
+        self.chunk_frames = chunk_frames
+        self.free_chunks = queue.Queue()
+        for _ in range(2):
+            self.free_chunks.put(np.zeros(chunk_frames, dtype=self.dtype))
+        self.full_chunks = queue.Queue()
+        self.chunk = self.free_chunks.get()
+        self.chunk_count = 0
+        self.error = None
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def write_chunks(self) -> None:
+        while True:
+            item = self.full_chunks.get()
+            if item is None:
+                break
+            (chunk, n_frames) = item
+            try:
+                if self.error is None:
+                    self.file.write(chunk[:n_frames].tobytes())
+                    self.file.flush()
+            except OSError as error:
+                self.error = error
+            self.free_chunks.put(chunk)
+
+    def append(self, values: tuple) -> None:
+        """
+        Appends a record
+
+        Args:
+            values (tuple): Values of the fields of the record, in the order of frame_dtype
+        """
+        if self.error is not None:
+            raise self.error
+        if self.chunk_count == self.chunk_frames:
+            self.full_chunks.put((self.chunk, self.chunk_count))
+            # A third chunk is only allocated if the writer falls behind
+            try:
+                self.chunk = self.free_chunks.get_nowait()
+            except queue.Empty:
+                self.chunk = np.zeros(self.chunk_frames, dtype=self.dtype)
+            self.chunk_count = 0
+        self.chunk[self.chunk_count] = values
+        self.chunk_count += 1
+        self.frame_count += 1
+
+    def close(self) -> None:
+        """
+        Writes the last records and closes the file
+        """
+        if self.file.closed:
+            return
+        self.full_chunks.put((self.chunk, self.chunk_count))
+        self.full_chunks.put(None)
+        self.writer.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Recording:
+    """
+    Read-only, memory-mapped access to the records of a recording
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the recording
+
+        Raises:
+            ValueError: If the file is not a recording
+        """
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a quadai recording")
+            header_size = int.from_bytes(file.read(4), "little")
+            self.metadata = json.loads(file.read(header_size))
+        if self.metadata["version"] != VERSION:
+            raise ValueError(
+                f"{path} has format version {self.metadata['version']}, expected {VERSION}"
+            )
+        self.dtype = frame_dtype(
+            self.metadata["n_players"], self.metadata["n_particles"]
+        )
+        offset = len(MAGIC) + 4 + header_size
+        # A record being written at the end of the file is ignored
+        n_frames = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if n_frames > 0:
+            self.frames = np.memmap(
+                path, dtype=self.dtype, mode="r", offset=offset, shape=(n_frames,)
+            )
+        else:
+            self.frames = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+
+def balloon_metadata(match) -> dict:
+    """
+    Args:
+        match (BalloonMatch): The recorded match
+
+    Returns:
+        dict: Header of the recording of a balloon match
+    """
+    return {
+        "game": "balloon",
+        "fps": 60,
+        "n_players": len(match.players),
+        "n_particles": 0,
+        "players": [
+            {"name": player.name, "alpha": player.alpha} for player in match.players
+        ],
+        "time_limit": match.time_limit,
+        # Seed of the targets, None if the match was given a list of targets
+        "seed": getattr(match.targets, "seed", None),
+    }
+
+
+def record_balloon_step(recorder: Recorder, match) -> None:
+    """
+    Appends the state of a balloon match after a step
+
+    Args:
+        recorder (Recorder): The recorder
+        match (BalloonMatch): The recorded match
+    """
+    players = match.players
+    scores = [player.target_counter for player in players]
+    recorder.append(
+        (
+            match.step_count,
+            match.time,
+            physics.get_states(players),
+            match.thrusts,
+            scores,
+            [match.target_of(player) for player in players],
+            scores,
+            [player.dead for player in players],
+            [player.respawn_timer for player in players],
+        )
+    )
+
+
+def snowglobe_metadata(game, particles: bool = True) -> dict:
+    """
+    Args:
+        game (Snowglobe): The recorded game
+        particles (bool): Record the snow particles
+
+    Returns:
+        dict: Header of the recording of a snowglobe game
+    """
+    return {
+        "game": "snowglobe",
+        "fps": 60,
+        "n_players": 1,
+        "n_particles": game.n_particles if particles else 0,
+        "players": [{"name": game.player.name, "alpha": 255}],
+        "size": [game.width, game.height],
+    }
+
+
+def record_snowglobe_step(recorder: Recorder, game, target: tuple) -> None:
+    """
+    Appends the state of a snowglobe game after a step
+
+    Args:
+        recorder (Recorder): The recorder
+        game (Snowglobe): The recorded game
+        target (tuple): Position followed by the drone during the step
+    """
+    values = (
+        game.step_count,
+        game.step_count / 60,
+        physics.get_states([game.player]),
+        game.thrusts,
+        -1,
+        target,
+        0,
+        False,
+        0,
+    )
+    if recorder.metadata["n_particles"] > 0:
+        # The particles are drawn at their truncated positions
+        values += (game.snow.position.astype(np.int64).T, game.snow.radius)
+    recorder.append(values)
@@ -0,0 +1,183 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is where the surfaces drawn every frame are cached
+Rotated sprites are kept by (sprite, quantized angle, alpha) with LRU eviction,
+rendered texts by (font, text, antialias, color, alpha)
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+
+class RotationCache:
+    """
+    Rotated copies of sprites, evicting the least recently used ones above a memory cap
+
+    Angles are rounded to a multiple of angle_step degrees, so a drone turning
+    slowly reuses the same surface for several frames.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20, angle_step: float = 1.0):
+        """
+        Args:
+            max_bytes (int): Memory cap of the cached surfaces in bytes
+            angle_step (float): Angle quantization in degrees
+        """
+        self.max_bytes = max_bytes
+        self.angle_step = angle_step
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def rotate(
+        self, sprite: pygame.Surface, angle: float, alpha: int = None
+    ) -> pygame.Surface:
+        """
+        Returns the sprite rotated like pygame.transform.rotate, from the cache if possible
+        The returned surface is shared, it must not be modified
+
+        Args:
+            sprite (pygame.Surface): Sprite to rotate, e.g. a frame of an animation
+            angle (float): Counterclockwise angle in degrees
+            alpha (int): Alpha of the rotated surface, None to keep the sprite's
+
+        Returns:
+            pygame.Surface: The rotated sprite
+        """
+        quantized = round(angle / self.angle_step) * self.angle_step % 360
+        # The sprite itself is part of the key so that it outlives its cache entries
+        key = (sprite, quantized, alpha)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = pygame.transform.rotate(sprite, quantized)
+        if alpha is not None:
+            surface.set_alpha(alpha)
+        self.surfaces[key] = surface
+        self.bytes += surface.get_pitch() * surface.get_height()
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            (_, evicted) = self.surfaces.popitem(last=False)
+            self.bytes -= evicted.get_pitch() * evicted.get_height()
+        return surface
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Returns:
+            float: Fraction of the lookups served from the cache
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Hits, misses, hit rate, number of surfaces and memory used
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "surfaces": len(self.surfaces),
+            "bytes": self.bytes,
+        }
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+        self.bytes = 0
+
+
+class TextCache:
+    """
+    Rendered text surfaces, a text is only rasterized again when its string changes
+
+    HUD texts like "Score : N" take few distinct values, the least recently used
+    surfaces are evicted above max_surfaces.
+    """
+
+    def __init__(self, max_surfaces: int = 512):
+        """
+        Args:
+            max_surfaces (int): Number of cached surfaces
+        """
+        self.max_surfaces = max_surfaces
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(
+        self,
+        font: pygame.font.Font,
+        text: str,
+        antialias: bool,
+        color: tuple,
+        alpha: int = None,
+    ) -> pygame.Surface:
+        """
+        Returns font.render(text, antialias, color), from the cache if possible
+        The returned surface is shared, it must not be modified
+
+        Args:
+            font (pygame.font.Font): Font of the text
+            text (str): The text
+            antialias (bool): Smooth the edges of the characters
+            color (tuple): RGB color of the text
+            alpha (int): Alpha of the surface, None for opaque text
+
+        Returns:
+            pygame.Surface: The rendered text
+        """
+        key = (font, text, antialias, tuple(color), alpha)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        if alpha is not None:
+            surface.set_alpha(alpha)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Returns:
+            float: Fraction of the lookups served from the cache
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Hits, misses, hit rate and number of surfaces
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "surfaces": len(self.surfaces),
+        }
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+
+
+# Shared by the games and the environments
+rotation_cache = RotationCache()
+text_cache = TextCache()
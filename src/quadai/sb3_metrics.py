@@ -0,0 +1,114 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the glue between sb3 and the local metrics backend (see metrics.py)
+The values logged by sb3 (losses, rollout and time statistics) and the episodes
+reported by Monitor are written to a metrics file, wandb is an optional exporter.
+"""
+
+import sys
+
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.logger import (
+    HumanOutputFormat,
+    KVWriter,
+    Logger,
+    TensorBoardOutputFormat,
+)
+
+from quadai.metrics import MetricsLogger
+
+
+class MetricsOutputFormat(KVWriter):
+    """
+    sb3 logger output writing the numeric values to a MetricsLogger
+    """
+
+    def __init__(self, metrics: MetricsLogger):
+        self.metrics = metrics
+
+    def write(self, key_values: dict, key_excluded: dict, step: int = 0) -> None:
+        for key, value in key_values.items():
+            if isinstance(value, (int, float)) or hasattr(value, "dtype"):
+                self.metrics.record(key, float(value), step)
+
+    def close(self) -> None:
+        self.metrics.close()
+
+
+class EpisodeMetricsCallback(BaseCallback):
+    """
+    Records the reward and the length of every episode reported by Monitor
+    """
+
+    def __init__(self, metrics: MetricsLogger):
+        super().__init__()
+        self.metrics = metrics
+
+    def _on_step(self) -> bool:
+        for info in self.locals["infos"]:
+            episode = info.get("episode")
+            if episode is not None:
+                self.metrics.record("episode/reward", episode["r"], self.num_timesteps)
+                self.metrics.record("episode/length", episode["l"], self.num_timesteps)
+        return True
+
+
+def setup_metrics(
+    model, path: str, tensorboard_dir: str = None, verbose: int = 1
+) -> tuple:
+    """
+    Sends the logs of a model to a metrics file instead of the default sb3 outputs
+
+    Args:
+        model (BaseAlgorithm): The sb3 model
+        path (str): Path of the metrics file, appended to if it exists
+        tensorboard_dir (str): Also write tensorboard logs there if not None,
+            e.g. for wandb to sync them, start the wandb run first
+        verbose (int): Also print the logs if 1
+
+    Returns:
+        tuple: (metrics, callback), the MetricsLogger to close after training and
+            the callback recording the episodes to pass to model.learn
+    """
+    metrics = MetricsLogger(path)
+    output_formats = [MetricsOutputFormat(metrics)]
+    if verbose > 0:
+        output_formats.append(HumanOutputFormat(sys.stdout))
+    if tensorboard_dir is not None:
+        output_formats.append(TensorBoardOutputFormat(tensorboard_dir))
+    model.set_logger(Logger(None, output_formats))
+    return (metrics, EpisodeMetricsCallback(metrics))
+
+
+def wandb_callback(
+    project: str, gradient_save_freq: int, model_save_freq: int, **init_kwargs
+) -> tuple:
+    """
+    Starts a wandb run syncing the tensorboard logs, needs wandb
+
+    Args:
+        project (str): wandb project
+        gradient_save_freq (int): Callback calls between two uploads of the gradients
+        model_save_freq (int): Callback calls between two uploads of the model
+        **init_kwargs: Other arguments of wandb.init, e.g. name or config
+
+    Returns:
+        tuple: (run, callback), the wandb run and its WandbCallback
+    """
+    import wandb
+    from wandb.integration.sb3 import WandbCallback
+
+    run = wandb.init(
+        project=project, sync_tensorboard=True, monitor_gym=True, **init_kwargs
+    )
+    callback = WandbCallback(
+        gradient_save_freq=gradient_save_freq,
+        model_save_path=f"models/{run.id}",
+        model_save_freq=model_save_freq,
+        verbose=2,
+    )
+    return (run, callback)
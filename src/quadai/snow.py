@@ -0,0 +1,222 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the snow of the snowglobe game (see snowglobe.py)
+Particles are stored as NumPy arrays and updated with whole-array operations
+"""
+
+from math import sqrt, tan, radians
+
+import numpy as np
+import pygame
+
+from quadai.spatial_grid import SpatialGrid
+
+
+class SnowField:
+    """
+    Snow particles inside a circular snowglobe
+
+    Positions and speeds are (2, n_particles) arrays in pygame coordinates
+    (y axis pointing down) so that the x and y rows are contiguous,
+    radii are a (n_particles,) array.
+    """
+
+    def __init__(
+        self,
+        n_particles: int,
+        center: tuple = (400, 400),
+        snowglobe_radius: float = 350,
+        snow_min_radius: int = 3,
+        snow_max_radius: int = 9,
+        collision_margin: float = 0.95,
+        drag: float = 0.02,
+        gravity: float = 0.016,
+        interaction_force: tuple = (0.1, 0.08),
+        interaction_distance: float = 150,
+        interaction_angle: float = 30,
+        random_snow_speed: float = 0.1,
+        collision_drag: float = 0.3,
+        seed: int = None,
+    ):
+        self.n_particles = n_particles
+        self.center = np.array(center, dtype=np.float64).reshape(2, 1)
+        self.snowglobe_radius = snowglobe_radius
+        (self.snow_min_radius, self.snow_max_radius) = (
+            snow_min_radius,
+            snow_max_radius,
+        )
+        self.collision_margin = collision_margin
+        self.drag = drag
+        self.gravity = gravity
+        self.interaction_force = np.array(interaction_force, dtype=np.float64)
+        self.interaction_distance = interaction_distance
+        self.interaction_angle = interaction_angle
+        self.random_snow_speed = random_snow_speed
+        self.collision_drag = collision_drag
+
+        # Spatial index to only visit the particles close to the drone
+        self.grid = SpatialGrid(
+            origin=self.center.ravel() - snowglobe_radius,
+            size=(2 * snowglobe_radius, 2 * snowglobe_radius),
+            cell_size=interaction_distance / 4,
+        )
+        # The grid is only rebuilt once the particles may have moved by more than this
+        self.grid_skin = interaction_distance / 8
+
+        self.rng = np.random.default_rng(seed)
+        self.noise = np.empty((2, n_particles), dtype=np.float32)
+        self.circle_sprites = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Spreads the particles uniformly inside the snowglobe, at rest
+        """
+        # Polar sampling, sqrt makes the density uniform over the disk
+        r = self.snowglobe_radius * np.sqrt(self.rng.random(self.n_particles))
+        theta = self.rng.uniform(0, 2 * np.pi, self.n_particles)
+        self.position = self.center + np.stack([r * np.cos(theta), r * np.sin(theta)])
+        self.speed = np.zeros((2, self.n_particles))
+        self.radius = self.rng.integers(
+            self.snow_min_radius, self.snow_max_radius, self.n_particles
+        )
+        self.sprites = None
+        self.grid_drift = np.inf
+
+    def interaction_acceleration(
+        self, indices: np.ndarray, player_x: float, player_y: float
+    ) -> tuple:
+        """
+        Calculates the airflow of the drone on the selected particles
+        Snow below the drone is attracted to it, snow above it is repelled
+
+        Args:
+            indices (np.ndarray): Indices of the particles to consider
+            player_x (float): x position of the drone
+            player_y (float): y position of the drone
+
+        Returns:
+            tuple: Indices of the affected particles and their (2, n) accelerations
+        """
+        offset = self.position[:, indices] - ((player_x,), (player_y,))
+        squared_distance = offset[0] ** 2 + offset[1] ** 2
+        near = squared_distance < self.interaction_distance**2
+
+        # Inside a cone means more than interaction_angle degrees from the horizontal,
+        # because pygame y-axis is inverted, the snow below has a positive y offset
+        cone = np.abs(offset[0]) * tan(radians(self.interaction_angle))
+        below = near & (offset[1] > cone)
+        above = near & (-offset[1] > cone)
+        affected = below | above
+
+        offset = offset[:, affected]
+        # -1 to attract, +1 to repel
+        sign = np.where(below[affected], -1.0, 1.0)
+        acceleration = (
+            sign
+            * self.interaction_force[:, None]
+            * offset
+            / np.sqrt(squared_distance[affected])
+        )
+        return indices[affected], acceleration
+
+    def step(self, player_x: float, player_y: float) -> None:
+        """
+        Advances every particle by one frame
+
+        Args:
+            player_x (float): x position of the drone
+            player_y (float): y position of the drone
+        """
+        # Drag and reduced gravity
+        self.speed -= self.drag * self.speed
+        self.speed[1] += self.gravity
+
+        # Drone interaction, only with the particles in the grid cells
+        # overlapping the interaction circle and cones
+        if self.grid_drift > self.grid_skin:
+            self.grid.build(self.position[0], self.position[1])
+            self.grid_drift = 0
+        indices = self.grid.query_circle(
+            player_x,
+            player_y,
+            self.interaction_distance,
+            self.interaction_angle,
+            margin=self.grid_drift,
+        )
+        (indices, acceleration) = self.interaction_acceleration(
+            indices, player_x, player_y
+        )
+        self.speed[:, indices] += acceleration
+
+        # Add random noise to speed
+        self.rng.random(dtype=np.float32, out=self.noise)
+        self.noise *= 2 * self.random_snow_speed
+        self.noise -= self.random_snow_speed
+        self.speed += self.noise
+
+        # Boundary conditions: particles moving outwards bounce on the glass
+        limit = self.snowglobe_radius * self.collision_margin
+        rim = self.outside(limit)
+        if len(rim) > 0:
+            to_center = self.position[:, rim] - self.center
+            normal = to_center / np.hypot(to_center[0], to_center[1])
+            speed = self.speed[:, rim]
+            r_speed = (speed * normal).sum(axis=0)
+            bounce = r_speed > 0
+            self.speed[:, rim[bounce]] = self.collision_drag * (
+                speed[:, bounce] - 2 * r_speed[bounce] * normal[:, bounce]
+            )
+
+        # Calculate position, clamping below cannot move a particle further
+        self.position += self.speed
+        self.grid_drift += sqrt(2) * np.abs(self.speed).max(initial=0)
+
+        # Clamp position inside the snowglobe
+        outside = self.outside(limit)
+        if len(outside) > 0:
+            to_center = self.position[:, outside] - self.center
+            self.position[:, outside] = (
+                self.center + to_center / np.hypot(to_center[0], to_center[1]) * limit
+            )
+
+    def outside(self, distance: float) -> np.ndarray:
+        """
+        Finds the particles further than a distance from the center
+
+        Args:
+            distance (float): Distance to the center of the snowglobe
+
+        Returns:
+            np.ndarray: Indices of the particles
+        """
+        dx = self.position[0] - self.center[0]
+        dy = self.position[1] - self.center[1]
+        dx *= dx
+        dy *= dy
+        dx += dy
+        return np.flatnonzero(dx > distance**2)
+
+    def draw(self, screen: pygame.Surface) -> None:
+        """
+        Draws the particles as white circles
+
+        Args:
+            screen (pygame.Surface): Surface to draw on
+        """
+        if self.sprites is None:
+            for r in range(self.snow_min_radius, self.snow_max_radius):
+                if r not in self.circle_sprites:
+                    sprite = pygame.Surface((2 * r + 2, 2 * r + 2))
+                    sprite.set_colorkey((0, 0, 0))
+                    pygame.draw.circle(sprite, (255, 255, 255), (r + 1, r + 1), r, 0)
+                    self.circle_sprites[r] = sprite
+            self.sprites = [self.circle_sprites[r] for r in self.radius.tolist()]
+
+        # Same pixels as pygame.draw.circle at the truncated particle position
+        corners = self.position.astype(np.int64) - (self.radius + 1)
+        screen.blits(zip(self.sprites, corners.T.tolist()), doreturn=False)
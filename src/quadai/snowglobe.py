@@ -7,236 +7,153 @@ https://github.com/AlexandreSajus/Quadcopter-AI
 Christmas themed mod to the main game
 """
 
-import os
-import random
-from random import randrange
-from math import sin, cos, pi, sqrt, atan2
+import time
+from math import sin, cos, sqrt, atan2
 
 import pygame
 from pygame.locals import *
 
+from quadai import assets, physics, startup
+from quadai.compositor import Compositor, MovingLayer
 from quadai.player import PIDPlayer
+from quadai.profiler import FrameProfiler
+from quadai.recording import Recorder, record_snowglobe_step, snowglobe_metadata
+from quadai.render_cache import rotation_cache
+from quadai.snow import SnowField
 
 
-def correct_path(current_path):
+class Snowglobe:
     """
-    This function is used to get the correct path to the assets folder
+    State, physics and drawing of the snowglobe game
+    The drone is a PIDPlayer following a target, usually the mouse
     """
-    return os.path.join(os.path.dirname(__file__), current_path)
 
-
-def snowglobe():
-    """
-    Runs the snowglobe game
-    """
-    # FPS, w and h of the window
-    FPS = 60
-    WIDTH = 800
-    HEIGHT = 800
-
-    # simulation step number
-    step = 0
-    # snowglobe geometry
-    snowglobe_radius = 350
-    snowglobe_edge = 20
-    # radius of the snow particles
-    (snow_min_radius, snow_max_radius) = (3, 9)
-    # number of snow particles
-    n_particles = 1800
-    # factor to define collision player-snowglobe
-    player_collision_margin = 0.9
-    # factor to define collision player-snow
-    particle_collision_margin = 0.95
-    # drag coefficient for snow
-    drag = 0.02
-    # gravity reduction for snow
-    gravity_reduction = 0.2
-    # snow-drone interaction force
-    interaction_force_x = 0.1
-    interaction_force_y = 0.08
-    # snow-drone interaction distance
-    interaction_distance = 150
-    # snow-drone interaction cone angle
-    interaction_angle = 30
-    # random snow speed
-    random_snow_speed = 0.1
-    # snow collision drag
-    collision_drag = 0.3
-
-    # Drone constants
-    # Physics constants
-    gravity = 0.08
-    # Mass
-    mass = 1
-    # Length from center of mass to propeller
-    arm = 25
-
-    # Initialize Pygame, load sprites
-    FramePerSec = pygame.time.Clock()
-
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-
-    # Title the window
-    pygame.display.set_caption("Schneekugel")
-
-    # Loading player and target sprites
-    player_width = 80
-    player_animation_speed = 0.3
-    player_animation = []
-    for i in range(1, 5):
-        image = pygame.image.load(
-            correct_path(
-                os.path.join(
-                    "assets/balloon-flat-asset-pack/png/objects/drone-sprites/drone-"
-                    + str(i)
-                    + ".png"
-                )
-            )
-        )
-        image.convert()
-        player_animation.append(
-            pygame.transform.scale(image, (player_width, int(player_width * 0.30)))
-        )
-
-    # Loading background sprites
-    cloud1 = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/cloud-1.png"
-            )
-        )
-    )
-    cloud2 = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/cloud-2.png"
-            )
-        )
-    )
-    sun = pygame.image.load(
-        correct_path(
-            os.path.join(
-                "assets/balloon-flat-asset-pack/png/background-elements/sun.png"
-            )
-        )
-    )
-    cloud1.set_alpha(124)
-    (x_cloud1, y_cloud1, speed_cloud1) = (150, 200, 0.3)
-    cloud2.set_alpha(124)
-    (x_cloud2, y_cloud2, speed_cloud2) = (400, 500, -0.2)
-    sun.set_alpha(124)
-
-    # Init drone and snow particles
-    # Create player
-    player = PIDPlayer()
-
-    class SnowParticle:
+    def __init__(
+        self,
+        n_particles: int = 1800,
+        width: int = 800,
+        height: int = 800,
+        seed: int = None,
+        profiler: FrameProfiler = None,
+    ):
         """
-        A snow particle
+        Args:
+            n_particles (int): Number of snow particles
+            width (int): Width of the window
+            height (int): Height of the window
+            seed (int): Seed of the snow, None for random snow
+            profiler (FrameProfiler): Times the sections of step and draw
         """
+        (self.width, self.height) = (width, height)
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+
+        # simulation step number
+        self.step_count = 0
+        # snowglobe geometry
+        self.snowglobe_radius = 350
+        self.snowglobe_edge = 20
+        # radius of the snow particles
+        (self.snow_min_radius, self.snow_max_radius) = (3, 9)
+        # number of snow particles
+        self.n_particles = n_particles
+        # factor to define collision player-snowglobe
+        self.player_collision_margin = 0.9
+        # factor to define collision player-snow
+        self.particle_collision_margin = 0.95
+        # drag coefficient for snow
+        self.drag = 0.02
+        # gravity reduction for snow
+        self.gravity_reduction = 0.2
+        # snow-drone interaction force
+        self.interaction_force_x = 0.1
+        self.interaction_force_y = 0.08
+        # snow-drone interaction distance
+        self.interaction_distance = 150
+        # snow-drone interaction cone angle
+        self.interaction_angle = 30
+        # random snow speed
+        self.random_snow_speed = 0.1
+        # snow collision drag
+        self.collision_drag = 0.3
+
+        # Drone constants
+        # Physics constants
+        self.gravity = physics.GRAVITY
+        # Mass
+        self.mass = physics.MASS
+        # Length from center of mass to propeller
+        self.arm = physics.ARM
+
+        # Loading player sprites, shared with the other games
+        self.player_animation_speed = 0.3
+        self.player_animation = assets.drone_animation()
+
+        # Loading background sprites
+        (self.cloud1, self.cloud2, self.sun) = assets.background_sprites()
+        # Thrusts of the last step
+        self.thrusts = (0.0, 0.0)
+        # Created on the first draw, when the screen is known
+        self.compositor = None
+
+        # Init drone and snow particles
+        # Create player
+        self.player = PIDPlayer()
+
+        self.snow = SnowField(
+            n_particles,
+            center=(width / 2, height / 2),
+            snowglobe_radius=self.snowglobe_radius,
+            snow_min_radius=self.snow_min_radius,
+            snow_max_radius=self.snow_max_radius,
+            collision_margin=self.particle_collision_margin,
+            drag=self.drag,
+            gravity=self.gravity * self.gravity_reduction,
+            interaction_force=(self.interaction_force_x, self.interaction_force_y),
+            interaction_distance=self.interaction_distance,
+            interaction_angle=self.interaction_angle,
+            random_snow_speed=self.random_snow_speed,
+            collision_drag=self.collision_drag,
+            seed=seed,
+        )
 
-        def __init__(self, x, y, radius):
-            self.x_position = x
-            self.y_position = y
-            self.x_speed = 0
-            self.y_speed = 0
-            self.x_acceleration = 0
-            self.y_acceleration = 0
-            self.radius = radius
-
-    # Utilities
-    def create_snow_particles(n_particles):
-        snow_particles = []
-        for _ in range(0, n_particles):
-            while True:
-                x = randrange(0, WIDTH)
-                y = randrange(0, HEIGHT)
-                if (
-                    sqrt((x - WIDTH / 2) ** 2 + (y - HEIGHT / 2) ** 2)
-                    < snowglobe_radius
-                ):
-                    break
-            r = randrange(snow_min_radius, snow_max_radius)
-            snow_particles.append(SnowParticle(x, y, r))
-        return snow_particles
-
-    def convert_to_circular(x, y, x_pos, y_pos):
+    def convert_to_circular(self, x, y, x_pos, y_pos):
         """
         Convert cartesian coordinates to circular
         Returns r and theta coordinates
         """
         # Because pygame y-axis is inverted, y = -y
-        angle = atan2(HEIGHT / 2 - y_pos, x_pos - WIDTH / 2)
+        angle = atan2(self.height / 2 - y_pos, x_pos - self.width / 2)
         y = -y
         r = x * cos(angle) + y * sin(angle)
         theta = -sin(angle) * x + cos(angle) * y
         return r, theta
 
-    def convert_to_cartesian(r, theta, x_pos, y_pos):
+    def convert_to_cartesian(self, r, theta, x_pos, y_pos):
         """
         Convert circular coordinates to cartesian
         Returns x and y coordinates
         """
         # Because pygame y-axis is inverted, y = -y
-        angle = atan2(HEIGHT / 2 - y_pos, x_pos - WIDTH / 2)
+        angle = atan2(self.height / 2 - y_pos, x_pos - self.width / 2)
         x = r * cos(angle) - theta * sin(angle)
         y = r * sin(angle) + theta * cos(angle)
         y = -y
         return x, y
 
-    snow_particles = create_snow_particles(n_particles)
-
-    # Game loop
-    while True:
-
-        # Quit if user closes window
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-                exit()
-
-        step += 1
-
-        # If spacebar is pressed, reset snow particles
-        if pygame.key.get_pressed()[pygame.K_SPACE]:
-            snow_particles = create_snow_particles(n_particles)
-
-        # Background
-        screen.fill((131, 176, 181))
-
-        x_cloud1 += speed_cloud1
-        if x_cloud1 > WIDTH:
-            x_cloud1 = -cloud1.get_width()
-        screen.blit(cloud1, (x_cloud1, y_cloud1))
-
-        x_cloud2 += speed_cloud2
-        if x_cloud2 < -cloud2.get_width():
-            x_cloud2 = WIDTH
-        screen.blit(cloud2, (x_cloud2, y_cloud2))
-
-        screen.blit(sun, (630, -100))
-
-        # Snowglobe
-        pygame.draw.circle(
-            screen,
-            (200, 200, 200),
-            (int(WIDTH / 2), int(HEIGHT / 2)),
-            snowglobe_radius,
-            snowglobe_edge,
-        )
-
-        # Player
-        # Initialize accelerations
-        player.x_acceleration = 0
-        player.y_acceleration = gravity
-        player.angular_acceleration = 0
+    def step(self, target_x: float, target_y: float) -> None:
+        """
+        Advances the drone and the snow by one frame
 
-        # Get mouse position
-        mouse_pos = pygame.mouse.get_pos()
-        (target_x, target_y) = mouse_pos
+        Args:
+            target_x (float): x position followed by the drone
+            target_y (float): y position followed by the drone
+        """
+        player = self.player
+        profiler = self.profiler
+        self.step_count += 1
 
         # Calculate propeller force in function of input
+        start = time.perf_counter() if profiler.enabled else None
         thruster_left, thruster_right = player.act(
             [
                 target_x - player.x_position,
@@ -247,179 +164,195 @@ def snowglobe():
                 player.angular_speed,
             ]
         )
-
-        # Calculate accelerations according to Newton's laws of motion
-        force_x = (
-            -(thruster_left + thruster_right) * sin(player.angle * pi / 180) / mass
-        )
-        force_y = (
-            -(thruster_left + thruster_right) * cos(player.angle * pi / 180) / mass
+        self.thrusts = (thruster_left, thruster_right)
+        if start is not None:
+            profiler.record("act 0:" + player.name, time.perf_counter() - start)
+        profiler.lap("act")
+
+        # Calculate accelerations and speed according to Newton's laws of motion
+        player_state = physics.get_states([player])
+        physics.update_speeds(
+            player_state,
+            thruster_left,
+            thruster_right,
+            self.gravity,
+            self.mass,
+            self.arm,
         )
-
-        # Update accelerations
-        player.x_acceleration += force_x
-        player.y_acceleration += force_y
-
-        player.angular_acceleration += arm * (thruster_right - thruster_left) / mass
-
-        # Calculate speed
-        player.x_speed += player.x_acceleration
-        player.y_speed += player.y_acceleration
-        player.angular_speed += player.angular_acceleration
+        physics.set_states([player], player_state)
 
         # Boundary conditions
         distance_to_center = sqrt(
-            (player.x_position - WIDTH / 2) ** 2 + (player.y_position - HEIGHT / 2) ** 2
+            (player.x_position - self.width / 2) ** 2
+            + (player.y_position - self.height / 2) ** 2
         )
-        r_speed, theta_speed = convert_to_circular(
+        r_speed, theta_speed = self.convert_to_circular(
             player.x_speed, player.y_speed, player.x_position, player.y_position
         )
 
         if (
-            distance_to_center > snowglobe_radius * player_collision_margin
+            distance_to_center > self.snowglobe_radius * self.player_collision_margin
             and r_speed > 0
         ):
             r_speed = -r_speed
-            x_speed, y_speed = convert_to_cartesian(
+            x_speed, y_speed = self.convert_to_cartesian(
                 r_speed, theta_speed, player.x_position, player.y_position
             )
             player.x_speed = x_speed
             player.y_speed = y_speed
 
         # Calculate position
-        player.x_position += player.x_speed
-        player.y_position += player.y_speed
-        player.angle += player.angular_speed
+        player_state = physics.get_states([player])
+        physics.update_positions(player_state)
+        physics.set_states([player], player_state)
+        profiler.lap("drone physics")
+
+        # Snow particles
+        self.snow.step(player.x_position, player.y_position)
+        profiler.lap("snow physics")
+
+    def draw_decorations(self, background: pygame.Surface) -> None:
+        """
+        Draws the sun and the snowglobe over the clouds
+
+        Args:
+            background (pygame.Surface): Background layer of the compositor
+        """
+        background.blit(self.sun, (630, -100))
+
+        # Snowglobe
+        pygame.draw.circle(
+            background,
+            (200, 200, 200),
+            (int(self.width / 2), int(self.height / 2)),
+            self.snowglobe_radius,
+            self.snowglobe_edge,
+        )
+
+    def draw(self, screen: pygame.Surface) -> None:
+        """
+        Draws the current frame, only the areas that changed are drawn again
+
+        Args:
+            screen (pygame.Surface): Surface to draw on
+        """
+        if self.compositor is None or self.compositor.screen is not screen:
+            # The sky, the clouds, the sun and the snowglobe are a background layer
+            self.compositor = Compositor(
+                screen,
+                (131, 176, 181),
+                [
+                    MovingLayer(self.cloud1, 150, 200, 0.3),
+                    MovingLayer(self.cloud2, 400, 500, -0.2),
+                ],
+                self.draw_decorations,
+            )
+        compositor = self.compositor
+        compositor.begin_frame()
+        self.profiler.lap("background")
 
         # Animation
-        player_sprite = player_animation[
-            int(step * player_animation_speed) % len(player_animation)
+        player = self.player
+        player_sprite = self.player_animation[
+            int(self.step_count * self.player_animation_speed)
+            % len(self.player_animation)
         ]
-        player_copy = pygame.transform.rotate(player_sprite, player.angle)
-        player_copy.set_alpha(255)
-        screen.blit(
+        player_copy = rotation_cache.rotate(player_sprite, player.angle, 255)
+        compositor.blit(
             player_copy,
             (
                 player.x_position - int(player_copy.get_width() / 2),
                 player.y_position - int(player_copy.get_height() / 2),
             ),
         )
-
-        # Snow particles
-        for snow_particle in snow_particles:
-            # Accelerations
-            snow_particle.x_acceleration = 0 - drag * snow_particle.x_speed
-            snow_particle.y_acceleration = (
-                gravity * gravity_reduction - drag * snow_particle.y_speed
+        self.profiler.lap("sprites")
+
+        # Snow particles, they stay inside the snowglobe
+        self.snow.draw(screen)
+        compositor.mark(
+            pygame.Rect(
+                self.width / 2 - self.snowglobe_radius,
+                self.height / 2 - self.snowglobe_radius,
+                2 * self.snowglobe_radius,
+                2 * self.snowglobe_radius,
             )
+        )
+        self.profiler.lap("snow draw")
 
-            # Drone interaction
-            distance_to_player = sqrt(
-                (snow_particle.y_position - player.y_position) ** 2
-                + (snow_particle.x_position - player.x_position) ** 2
-            )
-            angle_to_player = atan2(
-                snow_particle.y_position - player.y_position,
-                player.x_position - snow_particle.x_position,
-            )
-            angle_to_player = angle_to_player * 180 / pi
-
-            if distance_to_player < interaction_distance:
-                # If snow below the player, snow is attracted to the player
-                if interaction_angle < angle_to_player < 180 - interaction_angle:
-                    snow_particle.x_acceleration -= (
-                        interaction_force_x
-                        * (snow_particle.x_position - player.x_position)
-                        / distance_to_player
-                    )
-                    snow_particle.y_acceleration -= (
-                        interaction_force_y
-                        * (snow_particle.y_position - player.y_position)
-                        / distance_to_player
-                    )
-                # If snow above the player, snow is repelled from the player
-                elif -interaction_angle > angle_to_player > -180 + interaction_angle:
-                    snow_particle.x_acceleration += (
-                        interaction_force_x
-                        * (snow_particle.x_position - player.x_position)
-                        / distance_to_player
-                    )
-                    snow_particle.y_acceleration += (
-                        interaction_force_y
-                        * (snow_particle.y_position - player.y_position)
-                        / distance_to_player
-                    )
-
-            # Calculate speed
-            snow_particle.x_speed += snow_particle.x_acceleration
-            snow_particle.y_speed += snow_particle.y_acceleration
-
-            # Add random noise to speed
-            snow_particle.x_speed += random.uniform(
-                -random_snow_speed, random_snow_speed
-            )
-            snow_particle.y_speed += random.uniform(
-                -random_snow_speed, random_snow_speed
-            )
+    def update_display(self) -> None:
+        """
+        Shows the frame drawn by draw, only updating the areas that changed
+        """
+        self.compositor.update()
 
-            # Boundary conditions
-            distance_to_center = sqrt(
-                (snow_particle.x_position - WIDTH / 2) ** 2
-                + (snow_particle.y_position - HEIGHT / 2) ** 2
-            )
-            r_speed, theta_speed = convert_to_circular(
-                snow_particle.x_speed,
-                snow_particle.y_speed,
-                snow_particle.x_position,
-                snow_particle.y_position,
-            )
 
-            if (
-                distance_to_center > snowglobe_radius * particle_collision_margin
-                and r_speed > 0
-            ):
-                r_speed = -r_speed * collision_drag
-                theta_speed = theta_speed * collision_drag
-                x_speed, y_speed = convert_to_cartesian(
-                    r_speed,
-                    theta_speed,
-                    snow_particle.x_position,
-                    snow_particle.y_position,
-                )
-                snow_particle.x_speed = x_speed
-                snow_particle.y_speed = y_speed
-
-            # Calculate position
-            snow_particle.x_position += snow_particle.x_speed
-            snow_particle.y_position += snow_particle.y_speed
-
-            # Clamp position
-            r_position, theta_position = convert_to_circular(
-                snow_particle.x_position - WIDTH / 2,
-                snow_particle.y_position - HEIGHT / 2,
-                snow_particle.x_position,
-                snow_particle.y_position,
-            )
+def snowglobe(profile: str = None, record: str = None, particles: bool = True):
+    """
+    Runs the snowglobe game
+    Press F3 to show the frame profiler
 
-            if r_position > snowglobe_radius * particle_collision_margin:
-                r_position = snowglobe_radius * particle_collision_margin
-                x_position, y_position = convert_to_cartesian(
-                    r_position,
-                    theta_position,
-                    snow_particle.x_position,
-                    snow_particle.y_position,
-                )
-                snow_particle.x_position = x_position + WIDTH / 2
-                snow_particle.y_position = y_position + HEIGHT / 2
-
-            # Animation
-            pygame.draw.circle(
-                screen,
-                (255, 255, 255),
-                (int(snow_particle.x_position), int(snow_particle.y_position)),
-                snow_particle.radius,
-                0,
-            )
+    Args:
+        profile (str): Path of a .csv or .json frame trace written on exit,
+            the profiler records from the start if given
+        record (str): Path of a recording of the game (see recording.py), None to disable
+        particles (bool): Record the snow particles
+    """
+    # FPS, w and h of the window
+    FPS = 60
+    WIDTH = 800
+    HEIGHT = 800
+
+    # Initialize Pygame, load sprites
+    FramePerSec = pygame.time.Clock()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    startup.mark("window opened")
+
+    # Title the window
+    pygame.display.set_caption("Schneekugel")
+
+    profiler = FrameProfiler(enabled=profile is not None)
+    game = Snowglobe(1800, WIDTH, HEIGHT, profiler=profiler)
+    startup.mark("assets loaded")
+
+    recorder = None
+    if record is not None:
+        recorder = Recorder(record, snowglobe_metadata(game, particles))
 
-        pygame.display.update()
+    # Game loop
+    while True:
+        profiler.start_frame()
+
+        # Quit if user closes window
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                if recorder is not None:
+                    recorder.close()
+                if profile is not None:
+                    profiler.dump(profile)
+                pygame.quit()
+                exit()
+            elif event.type == KEYDOWN and event.key == K_F3:
+                profiler.toggle_overlay()
+
+        # If spacebar is pressed, reset snow particles
+        if pygame.key.get_pressed()[pygame.K_SPACE]:
+            game.snow.reset()
+
+        # The drone follows the mouse
+        (target_x, target_y) = pygame.mouse.get_pos()
+        profiler.lap("events")
+        game.step(target_x, target_y)
+        if recorder is not None:
+            record_snowglobe_step(recorder, game, (target_x, target_y))
+            profiler.lap("record")
+        game.draw(screen)
+        game.compositor.mark(profiler.draw_overlay(screen))
+        profiler.lap("overlay")
+
+        game.update_display()
+        profiler.lap("display update")
+        profiler.end_frame()
+        startup.first_frame()
         FramePerSec.tick(FPS)
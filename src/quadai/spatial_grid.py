@@ -0,0 +1,137 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a uniform grid spatial index over 2D points
+It is used to find the snow particles close to the drone (see snow.py)
+"""
+
+from math import floor, tan, radians
+
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Points sorted by the square cell they are in
+
+    The points of cell c are self.order[self.starts[c] : self.starts[c + 1]]
+    """
+
+    def __init__(self, origin: tuple, size: tuple, cell_size: float):
+        """
+        Args:
+            origin (tuple): (x, y) corner of the indexed area
+            size (tuple): (width, height) of the indexed area
+            cell_size (float): Side of the square cells
+        """
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.cell_size = float(cell_size)
+        self.n_columns = max(1, int(np.ceil(size[0] / cell_size)))
+        self.n_rows = max(1, int(np.ceil(size[1] / cell_size)))
+        self.n_cells = self.n_columns * self.n_rows
+        # 16 bits cell indices are sorted with a radix sort
+        self.dtype = np.int16 if self.n_cells <= np.iinfo(np.int16).max else np.int32
+
+        self.cell = None
+        self.order = None
+        self.starts = None
+
+    def cell_of(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Calculates the cell index of points, points outside go to the border cells
+
+        Args:
+            x (np.ndarray): x positions
+            y (np.ndarray): y positions
+
+        Returns:
+            np.ndarray: Cell indices
+        """
+        column = (x - self.origin[0]) / self.cell_size
+        row = (y - self.origin[1]) / self.cell_size
+        column = np.clip(column, 0, self.n_columns - 1).astype(self.dtype)
+        row = np.clip(row, 0, self.n_rows - 1).astype(self.dtype)
+        return row * self.dtype(self.n_columns) + column
+
+    def build(self, x: np.ndarray, y: np.ndarray) -> None:
+        """
+        Indexes the points, reusing the previous order when the points are the same
+
+        Args:
+            x (np.ndarray): x positions
+            y (np.ndarray): y positions
+        """
+        cell = self.cell_of(x, y)
+        if self.cell is None or len(cell) != len(self.cell):
+            self.order = np.argsort(cell, kind="stable")
+        elif np.array_equal(cell, self.cell):
+            return
+        else:
+            # Few points change cell each frame, the previous order is almost sorted
+            self.order = self.order[np.argsort(cell[self.order], kind="stable")]
+        self.cell = cell
+        self.starts = np.zeros(self.n_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=self.n_cells), out=self.starts[1:])
+
+    def query_circle(
+        self,
+        x: float,
+        y: float,
+        radius: float,
+        cone_angle: float = None,
+        margin: float = 0,
+    ) -> np.ndarray:
+        """
+        Finds the points in the cells overlapping a circle
+
+        Args:
+            x (float): x position of the center
+            y (float): y position of the center
+            radius (float): Radius of the circle
+            cone_angle (float): If given, cells entirely within cone_angle degrees
+                of the horizontal line through the center are skipped
+            margin (float): Distance the points may have moved since the last build
+
+        Returns:
+            np.ndarray: Indices of the candidate points, a superset of the points in the circle
+        """
+        if self.order is None:
+            return np.zeros(0, dtype=np.int64)
+        slope = tan(radians(cone_angle)) if cone_angle is not None else None
+
+        # Cells are grown by the margin so that moved points are still found
+        reach = radius + margin
+        first_column = max(0, floor((x - reach - self.origin[0]) / self.cell_size))
+        last_column = min(
+            self.n_columns - 1, floor((x + reach - self.origin[0]) / self.cell_size)
+        )
+        first_row = max(0, floor((y - reach - self.origin[1]) / self.cell_size))
+        last_row = min(
+            self.n_rows - 1, floor((y + reach - self.origin[1]) / self.cell_size)
+        )
+
+        chunks = []
+        for row in range(first_row, last_row + 1):
+            top = self.origin[1] + row * self.cell_size
+            dy_min = max(top - y, 0, y - top - self.cell_size) - margin
+            dy_max = max(abs(top - y), abs(top + self.cell_size - y)) + margin
+            for column in range(first_column, last_column + 1):
+                left = self.origin[0] + column * self.cell_size
+                dx_min = max(left - x, 0, x - left - self.cell_size) - margin
+                # Cell entirely outside of the circle
+                if max(dx_min, 0) ** 2 + max(dy_min, 0) ** 2 >= radius**2:
+                    continue
+                # Cell entirely outside of the vertical cones
+                if slope is not None and dy_max <= dx_min * slope:
+                    continue
+                cell = row * self.n_columns + column
+                (start, end) = (self.starts[cell], self.starts[cell + 1])
+                if end > start:
+                    chunks.append(self.order[start:end])
+
+        if len(chunks) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(chunks)
@@ -0,0 +1,67 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a small startup profiler reporting the time to first frame
+Events are marked with mark(label) and printed when the first frame is shown
+"""
+
+import threading
+import time
+
+# Reference time, this module is imported first by __main__
+start_time = time.perf_counter()
+# Print the report when the first frame is shown
+enabled = False
+
+marks = []
+lock = threading.Lock()
+reported = False
+
+
+def mark(label: str) -> None:
+    """
+    Records the time of a startup event
+
+    Args:
+        label (str): Name of the event
+    """
+    with lock:
+        marks.append((label, time.perf_counter(), threading.current_thread().name))
+
+
+def first_frame() -> None:
+    """
+    Marks the first frame and prints the report once if enabled
+    """
+    global reported
+    if reported:
+        return
+    reported = True
+    mark("first frame")
+    if enabled:
+        print(report())
+
+
+def report() -> str:
+    """
+    Formats the startup events
+
+    Returns:
+        str: One line per event with the time since start and since the previous event
+    """
+    with lock:
+        events = sorted(marks, key=lambda event: event[1])
+    lines = ["Startup report (ms)", f"{'event':<28}{'since start':>12}{'delta':>10}"]
+    previous = start_time
+    for label, timestamp, thread in events:
+        if thread != "MainThread":
+            label = f"{label} [{thread}]"
+        lines.append(
+            f"{label:<28}{(timestamp - start_time) * 1000:>12.1f}"
+            f"{(timestamp - previous) * 1000:>10.1f}"
+        )
+        previous = timestamp
+    return "\n".join(lines)
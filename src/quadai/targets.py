@@ -0,0 +1,137 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the target generator shared by the games and the environments
+Target k of a seed is computed on demand by hashing (seed, k) with SplitMix64,
+a counter-based generator: nothing is stored, any target is reached in O(1)
+and batches of targets are drawn with one NumPy call.
+
+Example:
+from quadai.targets import TargetStream
+targets = TargetStream(seed=0)
+print(targets[0], targets[10**12], targets.batch([0, 1, 2]))
+"""
+
+import random
+
+import numpy as np
+
+# Targets are drawn in [TARGET_MIN, TARGET_MAX) on both axes
+TARGET_MIN = 200
+TARGET_MAX = 600
+
+MASK = 2**64 - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+
+
+def mix(z: int) -> int:
+    """
+    SplitMix64 finalizer, a bijection of 64-bit integers
+
+    Args:
+        z (int): Integer in [0, 2**64)
+
+    Returns:
+        int: The hashed integer
+    """
+    z = ((z ^ (z >> 30)) * MIX1) & MASK
+    z = ((z ^ (z >> 27)) * MIX2) & MASK
+    return z ^ (z >> 31)
+
+
+def mix_array(z: np.ndarray) -> np.ndarray:
+    """
+    SplitMix64 finalizer of a uint64 array, see mix
+
+    Args:
+        z (np.ndarray): uint64 array, modified in place
+
+    Returns:
+        np.ndarray: The hashed array
+    """
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(MIX1)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(MIX2)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+class TargetStream:
+    """
+    Unbounded sequence of targets addressed by their index
+
+    Both the scalar (stream[k]) and the batched (stream.batch(indices)) accesses
+    return the same targets.
+    """
+
+    def __init__(self, seed: int = None, low: int = TARGET_MIN, high: int = TARGET_MAX):
+        """
+        Args:
+            seed (int): Seed of the sequence, None draws one from the random module
+                so that random.seed still makes runs reproducible
+            low (int): Lowest coordinate of a target
+            high (int): Highest coordinate of a target, excluded
+        """
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed = seed
+        (self.low, self.high) = (low, high)
+        # Nearby seeds give unrelated sequences
+        self.key = mix(seed & MASK)
+
+    def coordinate(self, counter: int) -> int:
+        z = mix((self.key + counter * GOLDEN_GAMMA) & MASK)
+        # Multiply-shift maps the high 32 bits to [low, high) without modulo bias
+        return self.low + (((z >> 32) * (self.high - self.low)) >> 32)
+
+    def __getitem__(self, index: int) -> tuple:
+        """
+        Args:
+            index (int): Index of the target, from 0
+
+        Returns:
+            tuple: (x, y) position of the target
+        """
+        if index < 0:
+            raise IndexError("Target indices start at 0")
+        return (self.coordinate(2 * index), self.coordinate(2 * index + 1))
+
+    def batch(self, indices) -> np.ndarray:
+        """
+        Draws many targets in one call, e.g. for vectorized environments
+
+        Args:
+            indices (array_like): Indices of the targets, from 0
+
+        Returns:
+            np.ndarray: The (len(indices), 2) int64 positions of the targets
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if np.any(indices < 0):
+            raise IndexError("Target indices start at 0")
+        counters = indices.astype(np.uint64)[:, None] * np.uint64(2)
+        counters = counters + np.arange(2, dtype=np.uint64)
+        z = mix_array(np.uint64(self.key) + counters * np.uint64(GOLDEN_GAMMA))
+        span = np.uint64(self.high - self.low)
+        coordinates = (z >> np.uint64(32)) * span >> np.uint64(32)
+        return coordinates.astype(np.int64) + self.low
+
+    def take(self, start: int, count: int) -> list:
+        """
+        Args:
+            start (int): Index of the first target
+            count (int): Number of targets
+
+        Returns:
+            list: (x, y) positions of the targets start to start + count - 1
+        """
+        return [
+            tuple(target)
+            for target in self.batch(np.arange(start, start + count)).tolist()
+        ]
@@ -0,0 +1,97 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is the fixed-timestep clock of the game loops
+Real time is accumulated and consumed by simulation steps of a fixed duration,
+so the simulation runs at the same rate whatever the rendering rate.
+The leftover time gives the interpolation factor between the last two states.
+"""
+
+import time
+
+
+class FixedTimestep:
+    """
+    Decides how many simulation steps to run each frame and whether to render it
+
+    Usage per frame: run advance() simulation steps, then render with alpha
+    if should_render() is True.
+    """
+
+    def __init__(
+        self,
+        step_rate: float = 60,
+        speed: float = 1.0,
+        render_rate: float = 60,
+        max_frame_time: float = 0.25,
+        max_skipped_frames: int = 5,
+        clock=time.perf_counter,
+    ):
+        """
+        Args:
+            step_rate (float): Simulation steps per simulated second
+            speed (float): Simulated seconds per real second (e.g. 4 for a 4x spectator mode)
+            render_rate (float): Target frames per second, frames later than this
+                can be skipped
+            max_frame_time (float): Real time accounted per frame at most in seconds,
+                the simulation slows down instead of falling further behind
+            max_skipped_frames (int): Consecutive frames skipped at most
+            clock (callable): Returns the real time in seconds
+        """
+        self.step_duration = 1 / step_rate
+        self.speed = speed
+        self.frame_duration = 1 / render_rate
+        self.max_frame_time = max_frame_time
+        self.max_skipped_frames = max_skipped_frames
+        self.clock = clock
+
+        # Simulated time not consumed by a step yet
+        self.accumulator = 0.0
+        self.last = None
+        self.frame_start = None
+        self.skipped_frames = 0
+
+    def advance(self) -> int:
+        """
+        Starts a frame and accumulates the real time elapsed since the previous one
+
+        Returns:
+            int: Number of simulation steps to run this frame
+        """
+        now = self.clock()
+        if self.last is None:
+            # The first frame shows the initial state
+            self.last = now
+        elapsed = min(now - self.last, self.max_frame_time)
+        (self.last, self.frame_start) = (now, now)
+
+        self.accumulator += elapsed * self.speed
+        steps = int(self.accumulator / self.step_duration)
+        self.accumulator -= steps * self.step_duration
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        """
+        Returns:
+            float: Position of the frame between the last two simulation steps, in [0, 1)
+        """
+        return min(self.accumulator / self.step_duration, 1.0)
+
+    def should_render(self) -> bool:
+        """
+        Skips the rendering of frames that already took longer than a frame,
+        at most max_skipped_frames in a row
+
+        Returns:
+            bool: True if the frame should be rendered
+        """
+        late = self.clock() - self.frame_start > self.frame_duration
+        if late and self.skipped_frames < self.max_skipped_frames:
+            self.skipped_frames += 1
+            return False
+        self.skipped_frames = 0
+        return True
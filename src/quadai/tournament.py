@@ -0,0 +1,226 @@
+"""
+2D Quadcopter AI by Alexandre Sajus
+
+More information at:
+https://github.com/AlexandreSajus/Quadcopter-AI
+
+This is a tournament runner ranking controllers over many balloon matches
+(lineup x seed) matches are distributed over a process pool (see match.py),
+each worker loads the models once and reuses them for all its matches
+
+Example:
+python -m quadai.tournament --lineup PID,SAC --lineup PID,NumpySAC --seeds 1000
+Players are given as NAME or NAME:MODEL_PATH, e.g. SAC:models/sac_model_v1_3330000_steps.zip
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+
+import numpy as np
+
+from quadai.match import run_match
+from quadai.numpy_policy import load_actor
+from quadai.player import PIDPlayer, SACPlayer, NumpySACPlayer, load_model
+
+PLAYER_CLASSES = {
+    "PID": PIDPlayer,
+    "SAC": SACPlayer,
+    "NumpySAC": NumpySACPlayer,
+}
+
+
+def make_player(spec: str):
+    """
+    Creates a player from its specification
+
+    Args:
+        spec (str): NAME or NAME:MODEL_PATH, NAME being a key of PLAYER_CLASSES
+
+    Returns:
+        Player: A new player
+    """
+    (name, _, model_path) = spec.partition(":")
+    if name not in PLAYER_CLASSES:
+        raise ValueError(
+            f"Unknown player {name}, expected one of {list(PLAYER_CLASSES)}"
+        )
+    if model_path:
+        return PLAYER_CLASSES[name](model_path)
+    return PLAYER_CLASSES[name]()
+
+
+def init_worker(lineups: list) -> None:
+    """
+    Loads every model used by the lineups once per worker process
+
+    Args:
+        lineups (list): Lineups of the tournament, lists of player specifications
+    """
+    # One process per core, intra-op threads would oversubscribe the cores
+    os.environ["OMP_NUM_THREADS"] = "1"
+    for spec in {spec for lineup in lineups for spec in lineup}:
+        player = make_player(spec)
+        if isinstance(player, NumpySACPlayer):
+            load_actor(player.path)
+        elif isinstance(player, SACPlayer):
+            import torch
+
+            torch.set_num_threads(1)
+            load_model(player.path)
+
+
+def play(task: tuple) -> tuple:
+    """
+    Runs one match of the tournament
+
+    Args:
+        task (tuple): (lineup_index, lineup, seed, time_limit)
+
+    Returns:
+        tuple: (lineup_index, seed, scores, deaths)
+    """
+    (lineup_index, lineup, seed, time_limit) = task
+    # SACPlayer samples its actions with torch, seed it for reproducible matches
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+    results = run_match([make_player(spec) for spec in lineup], seed, time_limit)
+    return (
+        lineup_index,
+        seed,
+        [result["score"] for result in results],
+        [result["deaths"] for result in results],
+    )
+
+
+def summarize(lineup: list, scores: np.ndarray, deaths: np.ndarray) -> dict:
+    """
+    Aggregates the matches of a lineup
+
+    Args:
+        lineup (list): Player specifications
+        scores (np.ndarray): The (n_matches, n_players) scores
+        deaths (np.ndarray): The (n_matches, n_players) deaths
+
+    Returns:
+        dict: Mean score, 95% confidence interval, mean deaths and win rate per player
+    """
+    n_matches = len(scores)
+    # Ties share the win
+    best = scores == scores.max(axis=1, keepdims=True)
+    wins = (best / best.sum(axis=1, keepdims=True)).sum(axis=0)
+    players = []
+    for index, spec in enumerate(lineup):
+        std = scores[:, index].std(ddof=1) if n_matches > 1 else 0.0
+        half_width = 1.96 * std / sqrt(n_matches)
+        mean = scores[:, index].mean()
+        players.append(
+            {
+                "player": spec,
+                "mean_score": float(mean),
+                "ci95": [float(mean - half_width), float(mean + half_width)],
+                "mean_deaths": float(deaths[:, index].mean()),
+                "win_rate": float(wins[index] / n_matches),
+            }
+        )
+    return {"lineup": list(lineup), "matches": n_matches, "players": players}
+
+
+def run_tournament(
+    lineups: list,
+    seeds,
+    time_limit: float = 100,
+    workers: int = None,
+    chunksize: int = 4,
+) -> list:
+    """
+    Runs every lineup on every seed over a process pool
+
+    Args:
+        lineups (list): Lists of player specifications, e.g. [["PID", "SAC"]]
+        seeds (iterable): Seeds of the matches, the same for every lineup
+        time_limit (float): Duration of the matches in seconds
+        workers (int): Number of processes, all the cores by default
+        chunksize (int): Matches sent to a worker at once
+
+    Returns:
+        list: Summary of each lineup, see summarize
+    """
+    lineups = [list(lineup) for lineup in lineups]
+    seeds = list(seeds)
+    tasks = [
+        (lineup_index, lineup, seed, time_limit)
+        for lineup_index, lineup in enumerate(lineups)
+        for seed in seeds
+    ]
+    scores = [np.zeros((len(seeds), len(lineup))) for lineup in lineups]
+    deaths = [np.zeros((len(seeds), len(lineup))) for lineup in lineups]
+    seed_rows = {seed: row for row, seed in enumerate(seeds)}
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(lineups,)
+    ) as executor:
+        for lineup_index, seed, match_scores, match_deaths in executor.map(
+            play, tasks, chunksize=chunksize
+        ):
+            scores[lineup_index][seed_rows[seed]] = match_scores
+            deaths[lineup_index][seed_rows[seed]] = match_deaths
+
+    return [
+        summarize(lineup, scores[index], deaths[index])
+        for index, lineup in enumerate(lineups)
+    ]
+
+
+def print_summaries(summaries: list) -> None:
+    for summary in summaries:
+        print("")
+        print(f"Lineup {' vs '.join(summary['lineup'])} ({summary['matches']} matches)")
+        for player in summary["players"]:
+            print(
+                f"  {player['player']:<40}"
+                f" score {player['mean_score']:6.2f}"
+                f" [{player['ci95'][0]:6.2f}, {player['ci95'][1]:6.2f}]"
+                f"  deaths {player['mean_deaths']:5.2f}"
+                f"  win rate {player['win_rate']:6.1%}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a balloon tournament")
+    parser.add_argument(
+        "--lineup",
+        action="append",
+        required=True,
+        help="Comma separated players, e.g. PID,SAC (can be repeated)",
+    )
+    parser.add_argument("--seeds", type=int, default=100, help="Matches per lineup")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write the summaries as JSON")
+    args = parser.parse_args()
+
+    lineups = [lineup.split(",") for lineup in args.lineup]
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    start = time.perf_counter()
+    summaries = run_tournament(lineups, seeds, args.time_limit, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print_summaries(summaries)
+    n_matches = len(lineups) * len(seeds)
+    print("")
+    print(
+        f"{n_matches} matches in {elapsed:.1f} s ({n_matches / elapsed:.1f} matches/s)"
+    )
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(summaries, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()